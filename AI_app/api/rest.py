@@ -1,9 +1,10 @@
 # ai_app/api/rest.py
 from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from pydantic import ValidationError
 
-from AI_app.llm.generator import PromptRequest, generate_action  # PromptRequest, ActionResponse 가정
+from common.jsonutil import ORJSONResponse, dumps_str
+from AI_app.llm.generator import PromptRequest, generate_action, stream_action  # PromptRequest, ActionResponse 가정
 import logging
 
 log = logging.getLogger(__name__)
@@ -33,4 +34,19 @@ async def ai_rest(req: PromptRequest):
 
     payload = res.model_dump() if hasattr(res, "model_dump") else res
     log.info("[AI][REST] ⇒ code=%s, len=%s, err=%s", getattr(res, "code", None), getattr(res, "promptLen", None), getattr(res, "error", None))
-    return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+    return ORJSONResponse(content=payload, status_code=status.HTTP_200_OK)
+
+@rest_router.post("/ai/command/stream")
+async def ai_rest_stream(req: PromptRequest):
+    """SSE: 제어 코드가 한 줄 완성될 때마다 `line` 이벤트, 마지막에 ActionResponse 를 담은 `done` 이벤트."""
+    log.info("[AI][SSE] ⇐ user=%s stage=%s prompt=%r", req.userId, req.stageId, req.prompt)
+
+    async def body():
+        async for item in stream_action(req):
+            if isinstance(item, str):
+                yield f"event: line\ndata: {dumps_str({'line': item})}\n\n"
+            else:
+                log.info("[AI][SSE] ⇒ code=%s, len=%s, err=%s", item.code, item.promptLen, item.error)
+                yield f"event: done\ndata: {item.model_dump_json()}\n\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
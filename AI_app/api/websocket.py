@@ -1,6 +1,7 @@
 # ai_app/api/websocket.py
 from fastapi import APIRouter, WebSocket
-from AI_app.llm.generator import PromptRequest, generate_action
+from common.jsonutil import send_json
+from AI_app.llm.generator import PromptRequest, generate_action, stream_action
 
 ws_router = APIRouter()
 
@@ -14,11 +15,19 @@ async def ai_ws(ws: WebSocket):
             print(f"[AI] ⇐ user={req.userId} stage={req.stageId!s} prompt={req.prompt!r}")
 
         except ValueError as e:
-            await ws.send_json({"error": f"입력 오류: {e}"})
+            await send_json(ws, {"error": f"입력 오류: {e}"})
             continue
 
         # ② LLM 호출 → ActionResponse
-        res = await generate_action(req)
+        if req.stream:
+            # 줄이 완성될 때마다 {"line": ...}, 마지막 메시지는 ActionResponse 그대로
+            async for item in stream_action(req):
+                if isinstance(item, str):
+                    await send_json(ws, {"line": item})
+                else:
+                    res = item
+        else:
+            res = await generate_action(req)
         await ws.send_text(res.model_dump_json())
 
         print(f"[AI] ⇒ data={res.code}, len={res.promptLen}, err={res.error}")
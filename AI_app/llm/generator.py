@@ -1,7 +1,7 @@
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, TextStreamer
 from pydantic import BaseModel
-from typing import Optional
+from typing import AsyncIterator, Optional, Union
 import asyncio
 
 
@@ -10,6 +10,7 @@ class PromptRequest(BaseModel):
     userId: str
     stageId: Optional[str] = None
     prompt: str
+    stream: bool = False      # WebSocket 에서 줄 단위 스트리밍을 받을지
 
 
 class ActionResponse(BaseModel):
@@ -96,7 +97,7 @@ SYSTEM_PROMPT = (
     "[예시 종료]\n"
 )
 
-async def generate_action(req: PromptRequest) -> ActionResponse:
+def _generate(req: PromptRequest, streamer: Optional[TextStreamer] = None) -> ActionResponse:
     try:
         messages = [
             { "role": "system", "content": SYSTEM_PROMPT},
@@ -121,6 +122,7 @@ async def generate_action(req: PromptRequest) -> ActionResponse:
             input_ids,
             attention_mask=(input_ids != tokenizer.pad_token_id),  # 마스크 지정
             max_new_tokens=768,
+            streamer=streamer,
             eos_token_id=terminators,
             pad_token_id=tokenizer.pad_token_id,                   # pad_token_id 명시
             do_sample=True,
@@ -144,6 +146,42 @@ async def generate_action(req: PromptRequest) -> ActionResponse:
             promptLen=len(req.prompt),
             error=str(e)
         )
+
+async def generate_action(req: PromptRequest) -> ActionResponse:
+    return _generate(req)
+
+class _LineStreamer(TextStreamer):
+    """생성 스레드에서 디코딩된 텍스트를 받아, 줄이 완성될 때마다
+    이벤트 루프의 asyncio.Queue 로 넘긴다 (TextIteratorStreamer 의 async 판)."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue = queue
+        self.pending = ""
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        self.pending += text
+        *lines, self.pending = self.pending.split("\n")
+        if stream_end:
+            lines.append(self.pending)
+            self.pending = ""
+        for line in lines:
+            if line.strip():
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, line.strip())
+
+async def stream_action(req: PromptRequest) -> AsyncIterator[Union[str, ActionResponse]]:
+    """완성된 제어 코드 줄(str)을 하나씩 내보내고, 마지막에 전체 ActionResponse 를 내보낸다."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    streamer = _LineStreamer(loop, queue)
+
+    # generate 는 별도 스레드에서 돌리고, 이벤트 루프는 줄이 올 때마다 깨어난다
+    fut = loop.run_in_executor(None, _generate, req, streamer)
+    fut.add_done_callback(lambda _: queue.put_nowait(None))
+
+    while (line := await queue.get()) is not None:
+        yield line
+    yield await fut
     
 if __name__=="__main__":
     promptTest = [
@@ -3,6 +3,7 @@ from fastapi import FastAPI
 #from AI_app.api.websocket import ws_router
 from AI_app.api.rest import rest_router
 from AI_app.config import settings
+from common.jsonutil import ORJSONResponse
 from logging.config import dictConfig
 
 dictConfig({
@@ -23,7 +24,7 @@ dictConfig({
 })
 
 def create_app() -> FastAPI:
-    app = FastAPI()
+    app = FastAPI(default_response_class=ORJSONResponse)
     #app.include_router(ws_router)
     app.include_router(rest_router)
 
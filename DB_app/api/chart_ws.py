@@ -6,6 +6,7 @@ from sqlalchemy import select, desc
 from DB_app.db.session  import async_session
 from DB_app.db.models   import RunLogORM
 from DB_app.realtime    import broadcaster
+from common.jsonutil    import send_json
 
 chart_router = APIRouter()
 
@@ -31,17 +32,17 @@ async def chart_stream(ws: WebSocket):
     ]
 
     # ③ 스냅샷 전송
-    await ws.send_json({"type": "snapshot", "rows": snapshot})
+    await send_json(ws, {"type": "snapshot", "rows": snapshot})
 
     # ④ 스냅샷을 읽는 동안 도착했을 수도 있는 메시지 먼저 비우기
     while not queue.empty():
-        payload = await queue.get_nowait()
-        await ws.send_json(jsonable_encoder(payload))
+        data = queue.get_nowait()
+        await ws.send_text(data)
 
     # ⑤ 이후에는 실시간 메시지를 그대로 중계
     try:
         while True:
-            payload = await queue.get()             # {id, stage, tokens, clear_time, ...}
-            await ws.send_json(jsonable_encoder(payload))
+            data = await queue.get()                # publish 때 한 번 직렬화한 JSON 문자열
+            await ws.send_text(data)
     except WebSocketDisconnect:
         pass
\ No newline at end of file
@@ -1,6 +1,5 @@
 # DB_app/api/rest.py
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel, ValidationError, field_validator, conint
 from sqlalchemy import select, tuple_
 from sqlalchemy.exc import SQLAlchemyError
@@ -9,6 +8,7 @@ import logging
 from datetime import datetime, timezone
 from DB_app.db.session import async_session
 from DB_app.db.models import UserORM, StageORM, UserStageProgressORM, RunLogORM
+from common.jsonutil import ORJSONResponse
 
 rest_router = APIRouter()
 log = logging.getLogger(__name__)
@@ -306,7 +306,7 @@ async def post_run_log(payload: RunLogIn):
                 "time_top10": time_top10,      # 클리어 시간 부문 Top 10 (profile_image 포함)
             },
         }
-        return JSONResponse(status_code=200, content=resp)
+        return ORJSONResponse(status_code=200, content=resp)
 
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=f"invalid payload: {e.errors()}")
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from DB_app.config import settings
+from common.jsonutil import ORJSONResponse
 from DB_app.db.session import init_db, dispose_db
 from DB_app.api.chart_ws import chart_router
 from DB_app.api.rest import rest_router
@@ -23,7 +24,7 @@ dictConfig({
 })
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Game API")
+    app = FastAPI(title="Game API", default_response_class=ORJSONResponse)
 
     # 라우터 등록
     app.include_router(rest_router)   # ← REST (/users, /progress/{id}, /clear)
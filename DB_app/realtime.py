@@ -1,13 +1,19 @@
 import asyncio
 
+from common.jsonutil import dumps_str
+
 class Broadcaster:
-    """단일 프로세스용 간단 pub/sub (필요 시 Redis로 대체)."""
+    """단일 프로세스용 간단 pub/sub (필요 시 Redis로 대체).
+
+    메시지는 publish 때 한 번만 JSON 문자열로 만들어 모든 구독자 큐에 같은 문자열을 넣는다.
+    """
     def __init__(self):
         self.subscribers: list[asyncio.Queue] = []
 
     async def publish(self, msg: dict):
+        data = dumps_str(msg)
         for q in self.subscribers:
-            await q.put(msg)
+            await q.put(data)
 
     async def subscribe(self) -> asyncio.Queue:
         q: asyncio.Queue = asyncio.Queue(maxsize=100)
@@ -0,0 +1,41 @@
+import logging
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from common.jsonutil import send_json
+from Merge_app.llm.batcher import InferenceQueueFull
+from Merge_app.llm.generator import PromptRequest, generate_action, stream_action
+
+ai_ws_router = APIRouter()
+log = logging.getLogger(__name__)
+
+@ai_ws_router.websocket("/ws")
+async def ai_ws(ws: WebSocket):
+    await ws.accept()
+
+    try:
+        async for raw in ws.iter_text():
+            try:
+                req = PromptRequest.model_validate_json(raw)
+                log.info("[AI][WS] ⇐ user=%s stage=%s prompt=%r", req.userId, req.stageId, req.prompt)
+            except ValueError as e:
+                await send_json(ws, {"error": f"입력 오류: {e}"})
+                continue
+
+            try:
+                if req.stream:
+                    # 줄이 완성될 때마다 {"line": ...}, 마지막 메시지는 ActionResponse 그대로
+                    async for item in stream_action(req):
+                        if isinstance(item, str):
+                            await send_json(ws, {"line": item})
+                        else:
+                            res = item
+                else:
+                    res = await generate_action(req)
+            except InferenceQueueFull:
+                await send_json(ws, {"error": "AI 서버가 혼잡합니다. 잠시 후 다시 시도하세요."})
+                continue
+
+            await ws.send_text(res.model_dump_json())
+            log.info("[AI][WS] ⇒ code=%s, len=%s, err=%s", res.code, res.promptLen, res.error)
+    except WebSocketDisconnect:
+        pass
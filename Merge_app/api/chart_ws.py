@@ -1,47 +1,68 @@
 import asyncio
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from fastapi.encoders import jsonable_encoder
 from sqlalchemy import select, desc
 
 from Merge_app.db.session  import async_session
 from Merge_app.db.models   import RunLogORM
-from Merge_app.realtime    import broadcaster
+from Merge_app.realtime    import broadcaster, recent_run_logs
 
 chart_router = APIRouter()
 
-@chart_router.websocket("/chart")
-async def chart_stream(ws: WebSocket):
-    await ws.accept()
-
-    # ① 실시간 구독을 가장 먼저 열어 둔다
-    queue = await broadcaster.subscribe()
-
-    # ② 그다음 DB에서 최근 100개를 읽어 온다
+async def load_recent_run_logs():
+    """시작 시 한 번: 최근 기록으로 /chart 스냅샷 버퍼를 채운다 (publish 와 같은 이벤트 모양)."""
     async with async_session() as s:
         q = (
             select(RunLogORM)
-            .order_by(desc(RunLogORM.created_at))
-            .limit(100)
+            .order_by(desc(RunLogORM.cleared_at), desc(RunLogORM.record_id))
+            .limit(recent_run_logs.rows.maxlen)
         )
         rows = (await s.execute(q)).scalars().all()
 
-    snapshot = [
-        jsonable_encoder(r, exclude={"_sa_instance_state"})
+    recent_run_logs.fill([
+        {
+            "type": "run_log",
+            "record_id": r.record_id,
+            "user_id": r.user_id,
+            "stage_code": r.stage_code,
+            "prompt_length": r.prompt_length,
+            "clear_time_ms": r.clear_time_ms,
+            "cleared_at": r.cleared_at.isoformat(),
+        }
         for r in rows[::-1]          # 오래된 → 최신
-    ]
+    ])
+
+@chart_router.websocket("/chart")
+async def chart_stream(ws: WebSocket):
+    await ws.accept()
 
-    # ③ 스냅샷 전송
-    await ws.send_json({"type": "snapshot", "rows": snapshot})
+    # ① 구독과 스냅샷을 await 없이 연달아 잡는다
+    #    → 스냅샷 이후의 이벤트는 모두 큐에 있고, 겹치는 이벤트도 없다
+    queue = await broadcaster.subscribe(types=frozenset({"run_log"}))   # 캐시 무효화 등 내부 이벤트는 받지 않는다
+    snapshot = recent_run_logs.snapshot()
 
-    # ④ 스냅샷을 읽는 동안 도착했을 수도 있는 메시지 먼저 비우기
-    while not queue.empty():
-        payload = await queue.get_nowait()
-        await ws.send_json(jsonable_encoder(payload))
+    async def send_loop():
+        # ② 메모리에 직렬화해 둔 스냅샷 전송 (DB 조회 없음)
+        await ws.send_text(snapshot)
+        # ③ 이후에는 실시간 메시지를 그대로 중계
+        while True:
+            data = await queue.get()                # broadcaster 가 이벤트당 한 번 직렬화한 JSON 문자열
+            await ws.send_text(data)
+
+    async def receive_loop():
+        # 클라이언트가 보내는 것은 없다. 이벤트가 없어도 끊김을 바로 알기 위해 읽고 있는다
+        while (await ws.receive())["type"] != "websocket.disconnect":
+            pass
 
-    # ⑤ 이후에는 실시간 메시지를 그대로 중계
+    # 어느 쪽이든 먼저 끝나면(끊김, 전송 실패) 바로 구독을 풀고 나머지를 멈춘다
+    tasks = [asyncio.create_task(send_loop()), asyncio.create_task(receive_loop())]
     try:
-        while True:
-            payload = await queue.get()             # {id, stage, tokens, clear_time, ...}
-            await ws.send_json(jsonable_encoder(payload))
-    except WebSocketDisconnect:
-        pass
\ No newline at end of file
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        broadcaster.unsubscribe(queue)
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
+            try:
+                await t
+            except (asyncio.CancelledError, WebSocketDisconnect):
+                pass
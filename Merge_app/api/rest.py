@@ -1,15 +1,30 @@
-from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, ValidationError, field_validator, conint
-from sqlalchemy import select, tuple_
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError, field_validator, conint, conlist
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.sql import func
 import logging
 
 from datetime import datetime, timezone
-from Merge_app.db.session import async_session
+from Merge_app.db.session import async_session, engine, run_log_writer
 from Merge_app.db.models import UserORM, StageORM, UserStageProgressORM, RunLogORM
-from Merge_app.llm.generator import PromptRequest, generate_action
+from Merge_app.db.ranking import fetch_ranking, fetch_stage_ranks, fetch_leaderboards
+from Merge_app.db.ingest import RunLogRow, BestRecord, copy_run_logs, best_per_user_stage, upsert_best_progress
+from Merge_app.db.stages import stage_registry
+from Merge_app.db.stage_stats import fetch_stage_stats
+from Merge_app.db.history import InvalidCursor, decode_cursor, open_run_history
+from Merge_app.db.progress import fetch_progress
+from Merge_app.config import settings
+from common.jsonutil import ORJSONResponse, dumps_str
+from Merge_app.leaderboard import leaderboard_index
+from Merge_app.leaderboard_cache import leaderboard_cache
+from Merge_app.progress_cache import progress_cache
+from Merge_app.realtime import broadcaster, recent_run_logs
+from Merge_app.llm.generator import (
+    PromptRequest, generate_action, stream_action, batcher, response_cache, fastpath_stats,
+)
+from Merge_app.llm.batcher import InferenceQueueFull
 
 
 rest_router = APIRouter()
@@ -24,16 +39,28 @@ async def create_user(req: CreateUserReq, request: Request):
     client_ip = request.client.host if request.client else "unknown"
     log.info("[AI][REST] ⇐ user_id=%s from=%s", req.user_id, client_ip)
 
-    created = False
+    # 없으면 만들고, 있으면 건드리지 않는다 (동시 생성에도 안전).
+    # DO NOTHING 은 기존 행에 새 버전을 쓰지 않는다. RETURNING 이 비면 이미 있던 유저라 한 번 더 읽는다.
+    stmt = (
+        insert(UserORM)
+        .values(user_id=req.user_id, profile_image=(req.profile_image or 0))
+        .on_conflict_do_nothing(index_elements=[UserORM.user_id])
+        .returning(UserORM.profile_image)
+    )
+
     async with async_session() as s, s.begin():
-        user = await s.get(UserORM, req.user_id)
-        if not user:
-            user = UserORM(user_id=req.user_id, profile_image=(req.profile_image or 0))
-            s.add(user)
-            created = True
+        profile_image = (await s.execute(stmt)).scalar_one_or_none()
+        created = profile_image is not None
+        if not created:
+            profile_image = (await s.execute(
+                select(UserORM.profile_image).where(UserORM.user_id == req.user_id)
+            )).scalar_one()
+
+    if created:
+        await publish_profile(req.user_id, profile_image)
 
     # DB에 있는 실제 값을 반환
-    return {"user_id": req.user_id, "created": created, "profile_image": user.profile_image}
+    return {"user_id": req.user_id, "created": created, "profile_image": profile_image}
 
 class UpdateProfileImageReq(BaseModel):
     profile_image: conint(ge=0, le=2)  # 0~2만 허용
@@ -48,6 +75,9 @@ async def update_profile_image(user_id: str, body: UpdateProfileImageReq):
         # 프로필 이미지 변경
         user.profile_image = body.profile_image
 
+    await publish_profile(user_id, body.profile_image)     # 리더보드 인덱스/캐시 (다른 워커 포함)
+    await progress_cache.changed(user_id, patch=lambda p: p.update(profile_image=body.profile_image))
+
     return {
         "ok": True,
         "user_id": user_id,
@@ -56,42 +86,47 @@ async def update_profile_image(user_id: str, body: UpdateProfileImageReq):
 
 @rest_router.get("/progress/{user_id}")
 async def get_progress(user_id: str):
-    async with async_session() as s:
-        # 1) 유저 조회 (없으면 404)
-        user = await s.get(UserORM, user_id)
-        if not user:
+    # 직렬화된 응답 캐시 (기록/프로필 변경 시 갱신, Merge_app/progress_cache.py)
+    if progress_cache.enabled:
+        body = await progress_cache.get(user_id)
+        if body is None:
             raise HTTPException(status_code=404, detail="User not found")
+        return Response(content=body, media_type="application/json")
 
-        # 2) 진행 리스트 조회(기존대로)
-        rows = (await s.execute(
-            select(
-                StageORM.code,
-                UserStageProgressORM.unlocked,
-                UserStageProgressORM.cleared,
-                UserStageProgressORM.prompt_length,
-                UserStageProgressORM.clear_time_ms,
-                UserStageProgressORM.cleared_at,
-            )
-            .join(UserStageProgressORM, UserStageProgressORM.stage_id == StageORM.stage_id)
-            .where(UserStageProgressORM.user_id == user_id)
-            .order_by(StageORM.code)
-        )).all()
-
-    # 3) 프로필 번호를 응답에 포함
-    return {
-        "user_id": user_id,
-        "profile_image": user.profile_image,  # ← 추가
-        "stages": [
-            {
-                "code": r[0],
-                "unlocked": r[1],
-                "cleared": r[2],
-                "prompt_length": r[3],
-                "clear_time_ms": r[4],
-                "cleared_at": (r[5].isoformat() if r[5] else None),
-            } for r in rows
-        ],
-    }
+    # 유저 + 진행 리스트를 한 문장으로 (행이 없으면 유저 없음)
+    async with async_session() as s:
+        progress = await fetch_progress(s, user_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return progress
+
+async def publish_run_logs(record_ids: list[int], rows: list[RunLogRow]):
+    """커밋된 run_logs 를 /chart 구독자에게 알린다."""
+    for record_id, row in zip(record_ids, rows):
+        await broadcaster.publish({
+            "type": "run_log",
+            "record_id": record_id,
+            "user_id": row.user_id,
+            "stage_code": row.stage_code,
+            "prompt_length": row.prompt_length,
+            "clear_time_ms": row.clear_time_ms,
+            "cleared_at": row.cleared_at.isoformat(),
+        })
+
+async def publish_best(rows):
+    """커밋된 진행행(upsert_best_progress 결과)을 알린다 → 리더보드 인덱스/캐시 (다른 워커 포함)."""
+    for p in rows:
+        await broadcaster.publish({
+            "type": "best",
+            "stage_id": p.stage_id,
+            "user_id": p.user_id,
+            "prompt_length": p.prompt_length,
+            "clear_time_ms": p.clear_time_ms,
+            "cleared_at": p.cleared_at.isoformat() if p.cleared_at else None,
+        })
+
+async def publish_profile(user_id: str, profile_image: int):
+    await broadcaster.publish({"type": "profile", "user_id": user_id, "profile_image": profile_image})
 
 class RunLogIn(BaseModel):
     """스테이지 종료 후 결과(로그) 수집용 페이로드"""
@@ -111,204 +146,81 @@ class RunLogIn(BaseModel):
     @field_validator("stage_code")
     @classmethod
     def valid_code(cls, v: str) -> str:
-        import re
-        if not re.fullmatch(r"[A-E][1-5]", v):
+        if v not in stage_registry:
             raise ValueError("stage_code must be A1..E5")
         return v
     
+def _use_index() -> bool:
+    """순위를 메모리 인덱스로 계산할지 (켜져 있고 DB 와 맞춰져 있을 때만)."""
+    return settings.leaderboard_index and leaderboard_index.warmed
+
 @rest_router.post("/run-logs")
 async def post_run_log(payload: RunLogIn):
     try:
-        rank_clear_pct = 100.0
-        rank_length_pct = 100.0
-        rank_clear = 1
-        rank_length = 1
-        total_time = 1
-        total_length = 1
-
         async with async_session() as s, s.begin():
-            # 스테이지 조회
-            stage = (await s.execute(
-                select(StageORM).where(StageORM.code == payload.stage_code)
-            )).scalars().first()
+            # 스테이지 조회 (시작 시 로드한 레지스트리)
+            stage = stage_registry.by_code(payload.stage_code)
             if not stage:
                 raise HTTPException(status_code=400, detail="unknown stage_code")
 
-            # 진행행 조회(없으면 생성)
-            prog = await s.get(UserStageProgressORM, (payload.user_id, stage.stage_id))
-            if not prog:
-                prog = UserStageProgressORM(
-                    user_id=payload.user_id,
-                    stage_id=stage.stage_id,
-                    unlocked=True
-                )
-                s.add(prog)
-
-            # 클리어 처리/개선 여부 판정
-            prog.unlocked = True
-            prog.cleared = True
-
             new_time = int(payload.clear_time_ms)
             new_length = int(payload.prompt_length)
-
-            improved_time = (prog.clear_time_ms is None) or (new_time < prog.clear_time_ms)
-            improved_length = (prog.prompt_length is None) or (new_length < prog.prompt_length)
-
-            if improved_time:
-                prog.clear_time_ms = new_time
-            if improved_length:
-                prog.prompt_length = new_length
-            if improved_time or improved_length:
-                prog.cleared_at = datetime.now(timezone.utc)
-
-            # 러닝 로그 적재
-            s.add(RunLogORM(
+            now = datetime.now(timezone.utc)
+
+            # 클리어 처리 + 지표별 최고 기록 병합을 한 문장으로 (INSERT ... ON CONFLICT DO UPDATE)
+            # 같은 유저가 동시에 두 번 보내도 PK 충돌 없이 둘 다 반영된다. 병합된 행을 돌려받는다.
+            prog = (await upsert_best_progress(s, [
+                BestRecord(payload.user_id, stage.stage_id, new_length, new_time, now)
+            ]))[0]
+
+            # 러닝 로그 적재 (write-behind 면 커밋 후 큐에 넣고 뒤에서 모아서 쓴다)
+            row = RunLogRow(payload.user_id, payload.stage_code, new_length, new_time, now)
+            if not settings.run_log_write_behind:
+                run_log = RunLogORM(**row._asdict())
+                s.add(run_log)
+                await s.flush()
+
+            # 순위/비율 + 두 부문 Top 10 (profile_image 포함) 을 한 번에 조회
+            rank_args = dict(
+                stage_id=stage.stage_id,
                 user_id=payload.user_id,
-                stage_code=payload.stage_code,
-                prompt_length=new_length,
-                clear_time_ms=new_time,
-            ))
-            await s.flush()
-
-            # --- clear_time_ms 기준 랭킹/비율 ---
-            # 내가 이번에 달성한 기록(new_time)과 비교해 '더 빠른' 기록 수 (본인 제외)
-            faster_time = await s.scalar(
-                select(func.count()).select_from(UserStageProgressORM).where(
-                    UserStageProgressORM.stage_id == stage.stage_id,
-                    UserStageProgressORM.cleared.is_(True),
-                    UserStageProgressORM.clear_time_ms.isnot(None),
-                    tuple_(UserStageProgressORM.clear_time_ms,
-                        UserStageProgressORM.cleared_at) < (prog.clear_time_ms, prog.cleared_at),
-                    UserStageProgressORM.user_id != payload.user_id,
-                )
-            ) or 0
-
-            # '시간 기록을 가진 유저'수 (본인 제외)
-            others_time_total = await s.scalar(
-                select(func.count()).select_from(UserStageProgressORM).where(
-                    UserStageProgressORM.stage_id == stage.stage_id,
-                    UserStageProgressORM.cleared.is_(True),
-                    UserStageProgressORM.clear_time_ms.isnot(None),
-                    UserStageProgressORM.user_id != payload.user_id,
-                )
-            ) or 0
-
-            # 총 비교 인원 = 다른 사람 + 나(이번 기록)
-            total_time = others_time_total + 1
-            rank_clear = faster_time + 1
-            rank_clear_pct = round((rank_clear / total_time) * 100.0, 2)
-
-            # --- prompt_length 기준 랭킹/비율 ---
-            # 내가 이번에 사용한 프롬프트 길이(new_length)보다 '더 짧은' 기록 수 (본인 제외)
-            shorter_len = await s.scalar(
-                select(func.count()).select_from(UserStageProgressORM).where(
-                    UserStageProgressORM.stage_id == stage.stage_id,
-                    UserStageProgressORM.cleared.is_(True),
-                    UserStageProgressORM.prompt_length.isnot(None),
-                    tuple_(UserStageProgressORM.prompt_length,
-                        UserStageProgressORM.cleared_at) < (prog.prompt_length, prog.cleared_at),
-                    UserStageProgressORM.user_id != payload.user_id,
-                )
-            ) or 0
-
-            # '프롬프트 길이 기록을 가진 유저'수 (본인 제외)
-            others_len_total = await s.scalar(
-                select(func.count()).select_from(UserStageProgressORM).where(
-                    UserStageProgressORM.stage_id == stage.stage_id,
-                    UserStageProgressORM.cleared.is_(True),
-                    UserStageProgressORM.prompt_length.isnot(None),
-                    UserStageProgressORM.user_id != payload.user_id,
-                )
-            ) or 0
-
-            total_length = others_len_total + 1
-            rank_length = shorter_len + 1
-            rank_length_pct = round((rank_length / total_length) * 100.0, 2)
-
-            # === 리더보드: 두 부문 Top 10 (profile_image 포함) ===
-            # 프롬프트 길이 부문: prompt_length ASC, 동률 cleared_at ASC
-            prompt_rows = (await s.execute(
-                select(
-                    UserStageProgressORM.user_id,
-                    UserStageProgressORM.prompt_length,
-                    UserStageProgressORM.clear_time_ms,
-                    UserStageProgressORM.cleared_at,
-                    UserORM.profile_image,  # JOIN으로 가져오기
-                )
-                .join(UserORM, UserStageProgressORM.user_id == UserORM.user_id)
-                .where(
-                    UserStageProgressORM.stage_id == stage.stage_id,
-                    UserStageProgressORM.cleared.is_(True),
-                    UserStageProgressORM.prompt_length.isnot(None),
-                    UserStageProgressORM.cleared_at.isnot(None),  # tie-breaker 안정성
-                )
-                .order_by(
-                    UserStageProgressORM.prompt_length.asc(),
-                    UserStageProgressORM.cleared_at.asc(),
-                )
-                .limit(10)
-            )).all()
-
-            prompt_top10 = [
-                {
-                    "user_id": r.user_id,
-                    "prompt_length": int(r.prompt_length) if r.prompt_length is not None else None,
-                    "clear_time_ms": int(r.clear_time_ms) if r.clear_time_ms is not None else None,
-                    "profile_image": int(r.profile_image) if r.profile_image is not None else None,
-                }
-                for r in prompt_rows
-            ]
-
-            # 클리어 시간 부문: clear_time_ms ASC, 동률 cleared_at ASC
-            time_rows = (await s.execute(
-                select(
-                    UserStageProgressORM.user_id,
-                    UserStageProgressORM.clear_time_ms,
-                    UserStageProgressORM.prompt_length,
-                    UserStageProgressORM.cleared_at,
-                    UserORM.profile_image,  # JOIN으로 가져오기
-                )
-                .join(UserORM, UserStageProgressORM.user_id == UserORM.user_id)
-                .where(
-                    UserStageProgressORM.stage_id == stage.stage_id,
-                    UserStageProgressORM.cleared.is_(True),
-                    UserStageProgressORM.clear_time_ms.isnot(None),
-                    UserStageProgressORM.cleared_at.isnot(None),  # tie-breaker 안정성
-                )
-                .order_by(
-                    UserStageProgressORM.clear_time_ms.asc(),
-                    UserStageProgressORM.cleared_at.asc(),
-                )
-                .limit(10)
-            )).all()
-
-            time_top10 = [
-                {
-                    "user_id": r.user_id,
-                    "prompt_length": int(r.prompt_length) if r.prompt_length is not None else None,
-                    "clear_time_ms": int(r.clear_time_ms) if r.clear_time_ms is not None else None,
-                    "profile_image": int(r.profile_image) if r.profile_image is not None else None,
-                }
-                for r in time_rows
-            ]
+                clear_time_ms=prog.clear_time_ms,
+                prompt_length=prog.prompt_length,
+                cleared_at=prog.cleared_at,
+            )
+            ranking = None if _use_index() else await fetch_ranking(s, **rank_args)
+
+        # 커밋된 행을 알리면 인덱스 리스너가 (옛 행이 아니면) 반영한다. 그 뒤 메모리에서 순위 계산
+        await publish_best([prog])
+        if ranking is None:
+            if _use_index():
+                ranking = leaderboard_index.ranking(stage.stage_id, payload.user_id)
+            else:       # 그 사이 인덱스가 낡았다 (이벤트 유실 → 다시 읽는 중)
+                async with async_session() as s:
+                    ranking = await fetch_ranking(s, **rank_args)
+
+        # 커밋 후 /chart 구독자에게 알림 (구독자를 기다리지 않는다)
+        # write-behind 면 record_id 가 정해지는 flush 뒤에 run_log_writer 가 알린다
+        if settings.run_log_write_behind:
+            await run_log_writer.put(row)
+        else:
+            await publish_run_logs([run_log.record_id], [row])
+        await progress_cache.changed(payload.user_id)
 
         # 게임 결과창에서 바로 사용할 응답 (WebSocket과 동일 키 유지)
         resp = {
             "ack": True,
             "user_id": payload.user_id,
             "stage": payload.stage_code,
-            "rank_clear_time_percent": rank_clear_pct,
-            "rank_tokens_percent": rank_length_pct,
-            "rank_clear_time": rank_clear,
-            "rank_tokens": rank_length,
-            "total_records": total_time,
+            "rank_clear_time_percent": ranking["rank_clear_time_percent"],
+            "rank_tokens_percent": ranking["rank_tokens_percent"],
+            "rank_clear_time": ranking["rank_clear_time"],
+            "rank_tokens": ranking["rank_tokens"],
+            "total_records": ranking["total_records"],
             "received_text": "ok",
-            "leaderboards": {
-                "prompt_top10": prompt_top10,  # 프롬프트 길이 부문 Top 10 (profile_image 포함)
-                "time_top10": time_top10,      # 클리어 시간 부문 Top 10 (profile_image 포함)
-            },
+            "leaderboards": ranking["leaderboards"],  # prompt_top10 / time_top10 (profile_image 포함)
         }
-        return JSONResponse(status_code=200, content=resp)
+        return ORJSONResponse(status_code=200, content=resp)
 
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=f"invalid payload: {e.errors()}")
@@ -321,15 +233,188 @@ async def post_run_log(payload: RunLogIn):
         log.exception("[REST] unexpected")
         raise HTTPException(status_code=500, detail=str(e))
     
+class RunLogBatchIn(BaseModel):
+    """오프라인 동안 쌓인 기록을 한 번에 올릴 때"""
+    items: conlist(RunLogIn, min_length=1, max_length=settings.run_log_batch_max)
+
+_RANK_KEYS = ("rank_clear_time_percent", "rank_tokens_percent", "rank_clear_time", "rank_tokens", "total_records")
+
+@rest_router.post("/run-logs/batch")
+async def post_run_logs_batch(payload: RunLogBatchIn):
+    """/run-logs 를 여러 건 한 번에. 왕복 수는 기록 수와 무관하다.
+
+    run_logs 는 COPY, 진행행은 (user, stage) 별 최고 기록으로 한 문장 upsert,
+    순위는 영향받은 스테이지마다 한 번씩(윈도 함수) 계산한다. 한 배치 안의 같은
+    (user, stage) 기록은 모두 배치 반영 후의 최고 기록 기준 순위를 받는다.
+    """
+    now = datetime.now(timezone.utc)
+    items = payload.items
+    stages = {it.stage_code: stage_registry.by_code(it.stage_code) for it in items}
+    if not all(stages.values()):
+        raise HTTPException(status_code=400, detail="unknown stage_code")
+
+    try:
+        async with async_session() as s, s.begin():
+            rows = [
+                RunLogRow(it.user_id, it.stage_code, int(it.prompt_length), int(it.clear_time_ms), now)
+                for it in items
+            ]
+            record_ids = await copy_run_logs(s, rows)
+            progress = await upsert_best_progress(s, best_per_user_stage(
+                BestRecord(it.user_id, stages[it.stage_code].stage_id,
+                           int(it.prompt_length), int(it.clear_time_ms), now)
+                for it in items
+            ))
+            pairs = [(p.stage_id, p.user_id) for p in progress]
+            stage_ids = {p.stage_id for p in progress}
+
+            ranks = boards = None
+            if not _use_index():
+                ranks = await fetch_stage_ranks(s, pairs)
+                boards = await fetch_leaderboards(s, stage_ids)
+
+        await publish_best(progress)
+        if ranks is None and not _use_index():      # 그 사이 인덱스가 낡았다 (이벤트 유실 → 다시 읽는 중)
+            async with async_session() as s:
+                ranks = await fetch_stage_ranks(s, pairs)
+                boards = await fetch_leaderboards(s, stage_ids)
+        elif ranks is None:
+            ranks = {}
+            for stage_id, user_id in pairs:
+                ranking = leaderboard_index.ranking(stage_id, user_id)
+                ranks[(stage_id, user_id)] = {k: ranking[k] for k in _RANK_KEYS}
+            boards = {
+                stage_id: {"prompt_top10": leaderboard_index.top(stage_id, "prompt"),
+                           "time_top10": leaderboard_index.top(stage_id, "time")}
+                for stage_id in stage_ids
+            }
+
+        await publish_run_logs(record_ids, rows)
+        for user_id in {p.user_id for p in progress}:
+            await progress_cache.changed(user_id, reload=False)
+
+        resp = {
+            "ack": True,
+            "count": len(items),
+            "results": [
+                {
+                    "user_id": it.user_id,
+                    "stage": it.stage_code,
+                    **ranks[(stages[it.stage_code].stage_id, it.user_id)],
+                }
+                for it in items
+            ],
+            "leaderboards": {code: boards[stage.stage_id] for code, stage in stages.items()},
+        }
+        return ORJSONResponse(status_code=200, content=resp)
+
+    except SQLAlchemyError:
+        log.exception("[REST][DB] error")
+        raise HTTPException(status_code=500, detail="db_error")
+    except Exception as e:
+        # COPY 는 asyncpg 를 직접 쓰므로 드라이버 예외가 그대로 올라온다
+        log.exception("[REST] unexpected")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@rest_router.get("/stages/{stage_code}/stats")
+async def get_stage_stats(stage_code: str):
+    """결과 화면용 스테이지 기록 분포 (stage_stats 히스토그램, p10/p50/p90 는 구간 보간 추정치)."""
+    stage = stage_registry.by_code(stage_code)
+    if stage is None:
+        raise HTTPException(status_code=404, detail="Stage not found")
+    async with async_session() as s:
+        stats = await fetch_stage_stats(s, stage.stage_id)
+    return {"stage_code": stage_code, **stats}
+
+async def _history_response(where, cursor: str | None, limit: int) -> StreamingResponse:
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    try:
+        # 쿼리와 첫 행은 응답 전에 읽는다 (여기서 실패하면 200 대신 500)
+        body = await open_run_history(where, position, limit)
+    except Exception:
+        # 서버 측 커서 fetch 오류는 SQLAlchemy 로 감싸지지 않고 드라이버 예외로 올라온다
+        log.exception("[REST][DB] error")
+        raise HTTPException(status_code=500, detail="db_error")
+    return StreamingResponse(body, media_type="application/json")
+
+@rest_router.get("/users/{user_id}/runs")
+async def get_user_runs(
+    user_id: str,
+    cursor: str | None = None,
+    limit: int = Query(settings.run_history_page_size, ge=1, le=settings.run_history_page_max),
+):
+    """유저의 run_logs 이력 (최신순). 다음 페이지는 응답의 next_cursor 를 cursor 로 넘긴다."""
+    async with async_session() as s:
+        if await s.get(UserORM, user_id) is None:
+            raise HTTPException(status_code=404, detail="User not found")
+    return await _history_response(RunLogORM.user_id == user_id, cursor, limit)
+
+@rest_router.get("/stages/{stage_code}/runs")
+async def get_stage_runs(
+    stage_code: str,
+    cursor: str | None = None,
+    limit: int = Query(settings.run_history_page_size, ge=1, le=settings.run_history_page_max),
+):
+    """스테이지의 run_logs 이력 (최신순). 페이지 방식은 /users/{user_id}/runs 와 같다."""
+    if stage_registry.by_code(stage_code) is None:
+        raise HTTPException(status_code=404, detail="Stage not found")
+    return await _history_response(RunLogORM.stage_code == stage_code, cursor, limit)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+@rest_router.get("/leaderboards/{stage_code}")
+async def get_leaderboard(
+    stage_code: str,
+    request: Request,
+    metric: str = Query("time", pattern="^(time|prompt)$"),
+    limit: int = Query(10, ge=1, le=settings.leaderboard_cache_limit),
+):
+    """스테이지 한 부문의 Top N (기록 제출 없이 조회). 캐시된 스냅샷 + ETag/304."""
+    stage = stage_registry.by_code(stage_code)
+    if stage is None:
+        raise HTTPException(status_code=404, detail="Stage not found")
+
+    etag, body = await leaderboard_cache.get(stage.stage_id, stage_code, metric, limit)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.leaderboard_max_age_s}"}
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @rest_router.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
+@rest_router.get("/metrics")
+async def metrics():
+    return {
+        "llm_batch": batcher.stats(),
+        "llm_cache": response_cache.stats(),
+        "llm_fastpath": fastpath_stats(),
+        "leaderboard_index": leaderboard_index.stats(),
+        "leaderboard_cache": leaderboard_cache.stats(),
+        "progress_cache": {"enabled": progress_cache.enabled, **progress_cache.stats()},
+        "broadcast": broadcaster.stats(),
+        "chart_snapshot": recent_run_logs.stats(),
+        "run_log_writer": {"enabled": settings.run_log_write_behind, **run_log_writer.stats()},
+        "db_pool": engine.pool.stats(),
+    }
+
 @rest_router.post("/ai/command")
 async def ai_rest(req: PromptRequest):
     log.info("[AI][REST] ⇐ user=%s stage=%s prompt=%r", req.userId, req.stageId, req.prompt)
     try:
-        res = await generate_action(req)  # generate_action 이 async 임을 가정
+        res = await generate_action(req)  # 추론 스레드의 결과 future 를 기다린다
+    except InferenceQueueFull as e:
+        log.warning("[AI][REST] busy: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI 서버가 혼잡합니다. 잠시 후 다시 시도하세요."
+        )
     except ValidationError as e:
         # generate_action 내부에서 모델 검증 오류가 났을 때
         raise HTTPException(
@@ -345,4 +430,33 @@ async def ai_rest(req: PromptRequest):
 
     payload = res.model_dump() if hasattr(res, "model_dump") else res
     log.info("[AI][REST] ⇒ code=%s, len=%s, err=%s", getattr(res, "code", None), getattr(res, "promptLen", None), getattr(res, "error", None))
-    return JSONResponse(content=payload, status_code=status.HTTP_200_OK)
+    return ORJSONResponse(content=payload, status_code=status.HTTP_200_OK)
+
+@rest_router.post("/ai/command/stream")
+async def ai_rest_stream(req: PromptRequest):
+    """SSE: 제어 코드가 한 줄 완성될 때마다 `line` 이벤트, 마지막에 ActionResponse 를 담은 `done` 이벤트."""
+    log.info("[AI][SSE] ⇐ user=%s stage=%s prompt=%r", req.userId, req.stageId, req.prompt)
+    events = stream_action(req)
+
+    # 대기열이 가득 찼으면 스트림을 열기 전에 503 으로 돌려보낸다
+    try:
+        first = await events.__anext__()
+    except InferenceQueueFull as e:
+        log.warning("[AI][SSE] busy: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI 서버가 혼잡합니다. 잠시 후 다시 시도하세요."
+        )
+
+    async def body():
+        item = first
+        while True:
+            if isinstance(item, str):
+                yield f"event: line\ndata: {dumps_str({'line': item})}\n\n"
+            else:
+                log.info("[AI][SSE] ⇒ code=%s, len=%s, err=%s", item.code, item.promptLen, item.error)
+                yield f"event: done\ndata: {item.model_dump_json()}\n\n"
+                return
+            item = await events.__anext__()
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
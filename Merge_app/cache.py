@@ -0,0 +1,101 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """항목 수 / 바이트 수 상한과 TTL 을 가진 프로세스 로컬 LRU 캐시.
+
+    이벤트 루프 스레드에서만 쓰는 것을 전제로 하며 락을 잡지 않는다.
+    sizeof 는 값 하나가 차지하는 대략적인 바이트 수를 돌려준다.
+    """
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 0,                 # 0 = 바이트 상한 없음
+        ttl_s: float = 0,                   # 0 = 만료 없음
+        sizeof: Callable[[Any], int] = lambda v: 0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.sizeof = sizeof
+
+        self._data: OrderedDict[Hashable, tuple[Any, float, int]] = OrderedDict()
+        self.bytes = 0
+
+        # 통계
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, _ = item
+        if expires_at and expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if not self.enabled:
+            return
+        size = self.sizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+        expires_at = time.monotonic() + self.ttl_s if self.ttl_s else 0.0
+        self._data[key] = (value, expires_at, size)
+        self.bytes += size
+
+        while len(self._data) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        if key not in self._data:
+            return None
+        return self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def _remove(self, key: Hashable) -> Any:
+        value, _, size = self._data.pop(key)
+        self.bytes -= size
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
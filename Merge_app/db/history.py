@@ -0,0 +1,112 @@
+"""run_logs 이력 조회 (GET /users/{user_id}/runs, GET /stages/{code}/runs).
+
+최신 → 오래된 순, (cleared_at, record_id) keyset 페이지네이션:
+
+    WHERE user_id = :u AND cleared_at <= :c AND (cleared_at, record_id) < (:c, :r)
+    ORDER BY cleared_at DESC, record_id DESC LIMIT :n + 1
+
+(user_id|stage_code, cleared_at DESC, record_id DESC) 인덱스를 커서 위치부터 n+1 행만
+읽으므로 몇 번째 페이지든 지연이 같다 (OFFSET 처럼 앞 행을 세지 않는다).
+`cleared_at <= :c` 는 같은 조건의 중복이지만 커서보다 새 월 파티션을 계획 단계에서 뺀다.
+한 행 더 읽어 다음 페이지가 있는지 알고, 행은 읽는 대로 JSON 조각으로 흘려보낸다.
+쿼리 실행과 첫 행 읽기는 응답(200)을 보내기 전에 끝내므로 그때의 DB 오류는 5xx 가 된다.
+"""
+import base64
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select, tuple_
+
+from Merge_app.db.models import RunLogORM
+from Merge_app.db.session import async_session
+from common.jsonutil import dumps
+
+log = logging.getLogger(__name__)
+
+R = RunLogORM
+
+Cursor = tuple[datetime, int]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(cleared_at: datetime, record_id: int) -> str:
+    raw = f"{cleared_at.isoformat()}|{record_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cleared_at, record_id = raw.split("|")
+        ts = datetime.fromisoformat(cleared_at)
+        if ts.tzinfo is None:
+            raise ValueError("naive timestamp")
+        return ts, int(record_id)
+    except ValueError as e:     # binascii.Error / UnicodeDecodeError 도 ValueError
+        raise InvalidCursor(cursor) from e
+
+
+def run_history_stmt(where, cursor: Optional[Cursor], limit: int):
+    stmt = select(R.record_id, R.user_id, R.stage_code, R.prompt_length, R.clear_time_ms, R.cleared_at).where(where)
+    if cursor is not None:
+        cleared_at, record_id = cursor
+        stmt = stmt.where(R.cleared_at <= cleared_at,
+                          tuple_(R.cleared_at, R.record_id) < tuple_(cleared_at, record_id))
+    return stmt.order_by(R.cleared_at.desc(), R.record_id.desc()).limit(limit + 1)
+
+
+def _row(r) -> dict:
+    return {
+        "record_id": r.record_id,
+        "user_id": r.user_id,
+        "stage_code": r.stage_code,
+        "prompt_length": r.prompt_length,
+        "clear_time_ms": r.clear_time_ms,
+        "cleared_at": r.cleared_at.isoformat(),
+    }
+
+
+async def open_run_history(where, cursor: Optional[Cursor], limit: int) -> AsyncIterator[bytes]:
+    """쿼리를 실행해 첫 행까지 읽고, {"items": [...], "next_cursor": ...} 조각 이터레이터를 돌려준다.
+
+    여기까지의 오류는 호출자에게 그대로 올라간다. 조각을 흘리는 도중의 오류는 이미 200 을
+    보낸 뒤라 로그만 남기고 JSON 을 닫는다 (next_cursor 는 null, "error": "db_error").
+    """
+    s = async_session()
+    try:
+        rows = await s.stream(run_history_stmt(where, cursor, limit))
+        first = await rows.fetchone()
+    except BaseException:
+        await s.close()
+        raise
+    return _chunks(s, rows, first, limit)
+
+
+async def _chunks(s, rows, first, limit: int) -> AsyncIterator[bytes]:
+    yield b'{"items":['
+    last, sent, more, failed = None, 0, False, False
+    try:
+        if first is not None:
+            yield dumps(_row(first))
+            last, sent = first, 1
+            async for r in rows:
+                if sent == limit:
+                    more = True
+                    break
+                yield b"," + dumps(_row(r))
+                last, sent = r, sent + 1
+    except Exception:
+        log.exception("[DB] run history stream failed after %d rows", sent)
+        failed = True
+    finally:
+        await rows.close()
+        await s.close()
+    if failed:
+        yield b'],"next_cursor":null,"error":"db_error"}'
+        return
+    next_cursor = encode_cursor(last.cleared_at, last.record_id) if more else None
+    yield b'],"next_cursor":' + dumps(next_cursor) + b"}"
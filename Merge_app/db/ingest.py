@@ -0,0 +1,229 @@
+"""run_logs / user_stage_progress 대량 적재 (POST /run-logs/batch).
+
+    copy_run_logs         record_id 를 시퀀스에서 미리 받고 COPY 한 번으로 적재
+    upsert_best_progress  (user, stage) 마다 최고 기록을 INSERT ... ON CONFLICT 한 문장으로 반영
+    RunLogWriter          /run-logs 의 run_logs 적재를 모아서 뒤에서 쓰는 write-behind 버퍼
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, NamedTuple, Optional
+
+from sqlalchemy import case, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Merge_app.db.models import RunLogORM, UserStageProgressORM
+
+log = logging.getLogger(__name__)
+
+P = UserStageProgressORM
+_RUN_LOGS = RunLogORM.__table__
+
+
+class RunLogRow(NamedTuple):
+    user_id: str
+    stage_code: str
+    prompt_length: int
+    clear_time_ms: int
+    cleared_at: datetime
+
+
+class BestRecord(NamedTuple):
+    user_id: str
+    stage_id: int
+    prompt_length: int
+    clear_time_ms: int
+    cleared_at: datetime
+
+
+_NEXT_IDS = text(
+    "SELECT nextval(pg_get_serial_sequence(:table, 'record_id')) "
+    "FROM generate_series(1, :n)"
+)
+
+
+async def copy_run_logs(s: AsyncSession, rows: list[RunLogRow]) -> list[int]:
+    """rows 를 세션 트랜잭션 안에서 COPY 로 적재하고 record_id 를 순서대로 돌려준다."""
+    if not rows:
+        return []
+    ids = (await s.execute(_NEXT_IDS, {
+        "table": f"{_RUN_LOGS.schema}.{_RUN_LOGS.name}",
+        "n": len(rows),
+    })).scalars().all()
+
+    conn = await s.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        _RUN_LOGS.name,
+        schema_name=_RUN_LOGS.schema,
+        columns=["record_id", *RunLogRow._fields],
+        records=[(record_id, *row) for record_id, row in zip(ids, rows)],
+    )
+    return ids
+
+
+def best_per_user_stage(records: Iterable[BestRecord]) -> list[BestRecord]:
+    """같은 (user, stage) 의 여러 기록을 지표별 최솟값 하나로 접는다 (ON CONFLICT 는 키 중복 불가).
+
+    (stage_id, user_id) 순으로 돌려준다. 겹치는 행을 가진 배치들이 같은 순서로 행을 잠가야
+    서로 기다리다 교착하지 않는다 (트리거가 잠그는 다음 스테이지 행도 뒤쪽이라 순서가 유지된다).
+    """
+    best: dict[tuple[str, int], BestRecord] = {}
+    for r in records:
+        key = (r.user_id, r.stage_id)
+        cur = best.get(key)
+        if cur is None:
+            best[key] = r
+        else:
+            best[key] = cur._replace(
+                prompt_length=min(cur.prompt_length, r.prompt_length),
+                clear_time_ms=min(cur.clear_time_ms, r.clear_time_ms),
+                cleared_at=max(cur.cleared_at, r.cleared_at),
+            )
+    return sorted(best.values(), key=lambda r: (r.stage_id, r.user_id))
+
+
+async def upsert_best_progress(s: AsyncSession, records: list[BestRecord]):
+    """클리어 처리 + 지표별 최고 기록 유지. 하나라도 개선되면 cleared_at 갱신.
+
+    /run-logs 의 판정과 같다. 반영된 (user_id, stage_id, prompt_length, clear_time_ms, cleared_at) 행을 돌려준다.
+    """
+    if not records:
+        return []
+    stmt = insert(P).values([
+        {**r._asdict(), "unlocked": True, "cleared": True} for r in records
+    ])
+    new = stmt.excluded
+    improved = (
+        P.clear_time_ms.is_(None) | (new.clear_time_ms < P.clear_time_ms)
+        | P.prompt_length.is_(None) | (new.prompt_length < P.prompt_length)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[P.user_id, P.stage_id],
+        set_={
+            "unlocked": True,
+            "cleared": True,
+            "clear_time_ms": func.least(P.clear_time_ms, new.clear_time_ms),   # LEAST 는 NULL 을 무시
+            "prompt_length": func.least(P.prompt_length, new.prompt_length),
+            "cleared_at": case((improved, new.cleared_at), else_=P.cleared_at),
+        },
+    ).returning(P.user_id, P.stage_id, P.prompt_length, P.clear_time_ms, P.cleared_at)
+    return (await s.execute(stmt)).all()
+
+
+class RunLogWriter:
+    """run_logs 행을 큐에 받아 flush_ms 또는 flush_rows 마다 COPY 한 번으로 쓴다.
+
+    /run-logs 응답은 run_logs 에 의존하지 않으므로 적재를 요청 트랜잭션에서 뺀다
+    (진행행 upsert 는 그대로 요청 안에서 동기). 큐가 가득 차면 put 이 기다린다.
+    on_flush(record_ids, rows) 는 커밋 후 호출된다 (/chart 알림 등).
+    close() 는 남은 행을 모두 쓰고 끝낸다.
+    """
+    def __init__(
+        self,
+        session_factory,
+        flush_ms: float = 50,
+        flush_rows: int = 500,
+        max_queue: int = 10000,
+        on_flush: Optional[Callable[[list[int], list[RunLogRow]], Awaitable[None]]] = None,
+    ):
+        self.session_factory = session_factory
+        self.flush_s = max(0.0, flush_ms) / 1000.0
+        self.flush_rows = max(1, flush_rows)
+        self.max_queue = max(0, max_queue)
+        self.on_flush = on_flush
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 통계
+        self.flushes = 0
+        self.rows = 0
+        self.failed = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def put(self, row: RunLogRow):
+        self._ensure_started()
+        await self._queue.put(row)
+
+    async def _collect(self) -> tuple[list[RunLogRow], bool]:
+        """(모은 행, 종료 신호를 받았는가)."""
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = loop.time() + self.flush_s
+
+        while len(batch) < self.flush_rows:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if row is None:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    async def _flush(self, batch: list[RunLogRow]):
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as s, s.begin():
+                record_ids = await copy_run_logs(s, batch)
+        except Exception:
+            self.failed += len(batch)
+            log.exception("[DB] run_logs flush failed, %d rows dropped", len(batch))
+            return
+
+        self.flushes += 1
+        self.rows += len(batch)
+        self.last_flush_rows = len(batch)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000.0
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+
+        if self.on_flush is not None:
+            try:
+                await self.on_flush(record_ids, batch)
+            except Exception:
+                log.exception("[DB] run_logs on_flush failed")
+
+    async def _loop(self):
+        while True:
+            batch, stop = await self._collect()
+            if batch:
+                await self._flush(batch)
+            if stop:
+                return
+
+    async def close(self):
+        """남은 행을 모두 쓰고 워커를 끝낸다."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "failed": self.failed,
+            "avg_flush_rows": round(self.rows / self.flushes, 2) if self.flushes else 0.0,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
@@ -0,0 +1,136 @@
+"""스키마 변경 이력.
+
+init_db 가 create_all 다음에 아직 적용되지 않은 버전만 순서대로 적용하고
+schema_migrations 에 기록한다. 새 DB 는 create_all 이 models.py 대로 만들고,
+기존 DB 는 여기 SQL 로 따라온다. 그래서 변경은 항상 세 곳에 같이 넣는다:
+
+    1) MIGRATIONS 끝에 (버전, 설명, [단계 ...])  - 여러 번 돌아도 안전하게 (IF NOT EXISTS)
+    2) models.py (__table_args__ 등)
+    3) setup.sql
+
+단계는 SQL 문자열이거나, SQL 만으로 쓰기 번거로운 경우 async 함수(conn) 이다.
+"""
+from typing import Awaitable, Callable, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from Merge_app.db.models import Base, RunLogORM
+from Merge_app.db.partitions import ensure_default_partition, ensure_partitions
+from Merge_app.db import stage_stats
+
+SCHEMA = Base.metadata.schema
+
+Step = Union[str, Callable[[AsyncConnection], Awaitable[None]]]
+
+# 여러 워커가 동시에 시작해도 한 곳만 적용하도록 (임의의 고정 키)
+_LOCK_KEY = 0x6461_6C67
+
+
+async def _partition_run_logs(conn: AsyncConnection):
+    """기존 일반 테이블 run_logs 를 월별 파티션 테이블로 옮긴다 (이미 파티션 테이블이면 그대로).
+
+    다운타임이 필요하다. apply_migrations 의 한 트랜잭션 안에서 옛 테이블 이름을 바꾸고
+    (ACCESS EXCLUSIVE) 모든 행을 복사하므로, 끝날 때까지 run_logs 쓰기/읽기가 모두 막히고
+    init_db 가 끝나지 않아 앱도 뜨지 않는다. 다른 워커는 마이그레이션 잠금에서 기다린다.
+    복사 시간은 행 수에 비례한다 (로컬 Postgres 16, 인덱스 6개: 100만 행에 약 15초).
+    나눠 복사하면 그 사이 들어온 기록을 따로 맞춰야 해서 한 번에 옮긴다. 기록이 많으면
+    앱을 내리고 점검 시간에 한 프로세스로 먼저 띄워 이 단계를 끝낼 것 (README 참고).
+    """
+    kind = await conn.scalar(text(
+        "SELECT c.relkind::text FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = :schema AND c.relname = 'run_logs'"
+    ), {"schema": SCHEMA})
+    if kind != "r":
+        return
+
+    old = "run_logs_unpartitioned"
+    await conn.execute(text(f"ALTER TABLE {SCHEMA}.run_logs RENAME TO {old}"))
+
+    # 새 테이블과 이름이 겹치는 시퀀스/인덱스(PK 포함)는 옛 테이블 쪽 이름을 바꿔 둔다
+    seq = await conn.scalar(text(f"SELECT pg_get_serial_sequence('{SCHEMA}.{old}', 'record_id')"))
+    if seq:
+        await conn.execute(text(f"ALTER SEQUENCE {seq} RENAME TO {old}_record_id_seq"))
+    indexes = (await conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = :schema AND tablename = :table"
+    ), {"schema": SCHEMA, "table": old})).scalars().all()
+    for name in indexes:
+        await conn.execute(text(f'ALTER INDEX {SCHEMA}."{name}" RENAME TO "{old}_{name}"'))
+
+    await conn.run_sync(RunLogORM.__table__.create)
+    since = await conn.scalar(text(f"SELECT min(cleared_at) FROM {SCHEMA}.{old}"))
+    await ensure_partitions(conn, ahead=0, since=since.date() if since else None)
+    await ensure_default_partition(conn)        # 이번 달 뒤의 기록(시계가 앞선 서버)도 받는다
+
+    cols = "record_id, user_id, stage_code, prompt_length, clear_time_ms, cleared_at"
+    await conn.execute(text(f"INSERT INTO {SCHEMA}.run_logs ({cols}) SELECT {cols} FROM {SCHEMA}.{old}"))
+    await conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{SCHEMA}.run_logs', 'record_id'), "
+        f"COALESCE((SELECT max(record_id) FROM {SCHEMA}.run_logs), 0) + 1, false)"
+    ))
+    await conn.execute(text(f"DROP TABLE {SCHEMA}.{old}"))
+
+
+MIGRATIONS: list[tuple[int, str, list[Step]]] = [
+    (1, "user_stage_progress ranking partial indexes", [
+        # 순위 카운트 = (stage_id, metric, cleared_at) 범위의 index-only scan,
+        # Top 10 = 같은 순서의 인덱스 스캔 + LIMIT. user_id 는 동률 정렬과 index-only 를 위해 키 끝에 둔다.
+        f"CREATE INDEX IF NOT EXISTS idx_progress_rank_time ON {SCHEMA}.user_stage_progress "
+        f"(stage_id, clear_time_ms, cleared_at, user_id) WHERE cleared AND clear_time_ms IS NOT NULL",
+        f"CREATE INDEX IF NOT EXISTS idx_progress_rank_length ON {SCHEMA}.user_stage_progress "
+        f"(stage_id, prompt_length, cleared_at, user_id) WHERE cleared AND prompt_length IS NOT NULL",
+        f"ANALYZE {SCHEMA}.user_stage_progress",
+    ]),
+    (2, "run_logs monthly range partitions on cleared_at", [
+        _partition_run_logs,
+    ]),
+    (3, "stage_stats histograms maintained by trigger", [
+        # stage_stats 테이블은 create_all 이 만든다
+        *stage_stats.DDL,
+        stage_stats.rebuild_stage_stats,
+    ]),
+    (4, "run_logs keyset indexes for run history", [
+        # 파티션 테이블 부모에 만들면 각 파티션에도 만들어진다 (CONCURRENTLY 불가 - 점검 시간에)
+        f"CREATE INDEX IF NOT EXISTS idx_runlogs_user_recent ON {SCHEMA}.run_logs "
+        f"(user_id, cleared_at DESC, record_id DESC)",
+        f"CREATE INDEX IF NOT EXISTS idx_runlogs_stage_recent ON {SCHEMA}.run_logs "
+        f"(stage_code, cleared_at DESC, record_id DESC)",
+    ]),
+    (5, "stage_stats deltas appended by trigger and folded periodically", [
+        # stage_stats_delta 테이블은 create_all 이 만든다. 트리거 함수만 바꾸고 한 번 다시 센다
+        *stage_stats.DDL,
+        stage_stats.rebuild_stage_stats,
+    ]),
+    (6, "run_logs default partition", [
+        # 파티션이 없는 달의 기록을 잃지 않게 받아 두고, ensure_partitions 가 그 달 파티션으로 옮긴다
+        ensure_default_partition,
+    ]),
+]
+
+
+async def apply_migrations(conn: AsyncConnection) -> list[int]:
+    """conn 의 트랜잭션 안에서 밀린 마이그레이션을 적용하고, 적용한 버전 목록을 돌려준다."""
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA}.schema_migrations ("
+        "  version    INT PRIMARY KEY,"
+        "  name       TEXT NOT NULL,"
+        "  applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    ))
+    done = set((await conn.execute(text(f"SELECT version FROM {SCHEMA}.schema_migrations"))).scalars())
+
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if version in done:
+            continue
+        for step in statements:
+            if isinstance(step, str):
+                await conn.execute(text(step))
+            else:
+                await step(conn)
+        await conn.execute(
+            text(f"INSERT INTO {SCHEMA}.schema_migrations (version, name) VALUES (:v, :n)"),
+            {"v": version, "n": name},
+        )
+        applied.append(version)
+    return applied
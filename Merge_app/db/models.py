@@ -4,8 +4,9 @@ from datetime import datetime
 from typing import Optional
 
 from sqlalchemy import (
-    String, Integer, BigInteger, Boolean, DateTime, ForeignKey, MetaData, text
+    String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Index, MetaData, text
 )
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -61,15 +62,68 @@ class UserStageProgressORM(Base):
     user = relationship("UserORM", back_populates="progresses")
     stage = relationship("StageORM", back_populates="progresses")
 
+    # 랭킹 쿼리용 부분 인덱스 (migrations.py v1, setup.sql 과 같게 유지)
+    __table_args__ = (
+        Index("idx_progress_rank_time", "stage_id", "clear_time_ms", "cleared_at", "user_id",
+              postgresql_where=text("cleared AND clear_time_ms IS NOT NULL")),
+        Index("idx_progress_rank_length", "stage_id", "prompt_length", "cleared_at", "user_id",
+              postgresql_where=text("cleared AND prompt_length IS NOT NULL")),
+    )
+
+# stage_stats --------------------------------------------------
+
+class StageStatsORM(Base):
+    """스테이지별 최고 기록 히스토그램 (Merge_app/db/stage_stats.py 의 구간 경계 기준).
+
+    user_stage_progress 트리거(stage_stats_apply)가 남긴 stage_stats_delta 를 주기적으로 합친다.
+    hist[i] = i 번째 구간(width_bucket = i - 1)에 든 클리어 기록 수 (합친 시점까지).
+    """
+    __tablename__ = "stage_stats"
+
+    stage_id: Mapped[int] = mapped_column(ForeignKey("stages.stage_id", ondelete="CASCADE"), primary_key=True)
+    time_hist:   Mapped[list[int]] = mapped_column(ARRAY(BigInteger), nullable=False)
+    length_hist: Mapped[list[int]] = mapped_column(ARRAY(BigInteger), nullable=False)
+    updated_at:  Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class StageStatsDeltaORM(Base):
+    """stage_stats 에 아직 합치지 않은 증감 (트리거가 INSERT 만 하고, fold_stage_stats 가 지운다).
+
+    m = 't' (clear_time_ms) / 'l' (prompt_length), i = hist 배열 위치, n = 증감.
+    """
+    __tablename__ = "stage_stats_delta"
+    __table_args__ = (
+        Index("idx_stage_stats_delta_stage", "stage_id", "m", "i"),
+    )
+
+    delta_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    stage_id: Mapped[int] = mapped_column(ForeignKey("stages.stage_id", ondelete="CASCADE"), nullable=False)
+    m: Mapped[str] = mapped_column(String(1), nullable=False)
+    i: Mapped[int] = mapped_column(Integer, nullable=False)
+    n: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
 # run_logs -----------------------------------------------------
 
 class RunLogORM(Base):
+    """cleared_at 기준 월별 RANGE 파티션 테이블 (파티션 생성/보관은 Merge_app/db/partitions.py).
+
+    파티션 키가 PK 에 들어가야 하므로 PK 는 (record_id, cleared_at).
+    """
     __tablename__ = "run_logs"
 
-    record_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    record_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_id:   Mapped[str] = mapped_column(String(64), ForeignKey("users.user_id", ondelete="CASCADE"), index=True)
     stage_code: Mapped[str] = mapped_column(String(8), ForeignKey("stages.code"), index=True)
 
     prompt_length: Mapped[int] = mapped_column(Integer, nullable=False)
     clear_time_ms: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    cleared_at:    Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
+    cleared_at:    Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True,
+                                                    server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_runlogs_cleared_at", "cleared_at"),
+        # 이력 API keyset 페이지네이션 (Merge_app/db/history.py)
+        Index("idx_runlogs_user_recent", "user_id", cleared_at.desc(), record_id.desc()),
+        Index("idx_runlogs_stage_recent", "stage_code", cleared_at.desc(), record_id.desc()),
+        {"postgresql_partition_by": "RANGE (cleared_at)"},
+    )
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""run_logs 월별 파티션 관리.
+
+    run_logs_YYYYMM  = FOR VALUES FROM ('YYYY-MM-01 UTC') TO (다음 달 1일 UTC)
+
+    run_logs_default = DEFAULT (월 파티션 범위 밖의 행: 시계가 어긋난 서버, 점검이 밀린 달 등)
+
+ensure_default_partition  DEFAULT 파티션을 만든다 (migrations v2 / v6)
+ensure_partitions   이번 달 ~ ahead 개월 뒤까지 없는 파티션을 만든다 (init_db, 주기 작업)
+                    DEFAULT 에 그 달 행이 있으면 새 파티션으로 옮겨 붙인다
+apply_retention     keep_months 보다 오래된 파티션을 detach(보관) 하거나 drop 한다
+maintenance_loop    위 둘을 interval_s 마다 돌리는 백그라운드 작업
+
+DEFAULT 가 없으면 파티션이 없는 달의 INSERT 가 실패해 기록을 잃는다. 대신 새 파티션을 만들 때마다
+DEFAULT 를 검사하므로, 평소 비어 있어야 싸다 (행이 남아 있으면 경고 로그를 남긴다).
+DEFAULT 는 월 파티션이 아니라서 보관 기간 적용 대상이 아니다.
+여러 워커가 동시에 돌아도 advisory lock 으로 한 곳만 DDL 을 실행한다.
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from Merge_app.db.models import RunLogORM
+
+log = logging.getLogger(__name__)
+
+_TABLE = RunLogORM.__table__
+SCHEMA = _TABLE.schema
+PARENT = _TABLE.name
+
+DEFAULT_PARTITION = f"{PARENT}_default"
+_COLS = ", ".join(c.name for c in _TABLE.columns)
+
+_LOCK_KEY = 0x6461_6C70
+_NAME_RE = re.compile(rf"^{PARENT}_(\d{{4}})(\d{{2}})$")
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.year * 12 + (d.month - 1) + n, 12)
+    return date(y, m + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month.year:04d}{month.month:02d}"
+
+
+def _this_month() -> date:
+    return month_start(datetime.now(timezone.utc).date())
+
+
+async def _lock(conn: AsyncConnection):
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+
+
+async def existing_partitions(conn: AsyncConnection) -> dict[date, str]:
+    """run_logs 에 붙어 있는 월 파티션 {월 시작일: 테이블 이름}."""
+    rows = (await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE n.nspname = :schema AND p.relname = :parent"
+    ), {"schema": SCHEMA, "parent": PARENT})).scalars().all()
+
+    out = {}
+    for name in rows:
+        m = _NAME_RE.match(name)
+        if m:
+            out[date(int(m.group(1)), int(m.group(2)), 1)] = name
+    return out
+
+
+async def ensure_default_partition(conn: AsyncConnection):
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA}.{DEFAULT_PARTITION} PARTITION OF {SCHEMA}.{PARENT} DEFAULT"
+    ))
+
+
+async def _has_default(conn: AsyncConnection) -> bool:
+    return await conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"),
+                             {"name": f"{SCHEMA}.{DEFAULT_PARTITION}"})
+
+
+async def _create_partition(conn: AsyncConnection, month: date, has_default: bool) -> int:
+    """month 파티션을 만들고, DEFAULT 에 있던 그 달 행을 옮긴다. 옮긴 행 수를 돌려준다."""
+    name = partition_name(month)
+    lo, hi = f"'{month.isoformat()} 00:00:00+00'", f"'{add_months(month, 1).isoformat()} 00:00:00+00'"
+    bounds = f"FOR VALUES FROM ({lo}) TO ({hi})"
+    in_month = f"cleared_at >= {lo} AND cleared_at < {hi}"
+
+    if not has_default or not await conn.scalar(text(
+            f"SELECT EXISTS (SELECT 1 FROM {SCHEMA}.{DEFAULT_PARTITION} WHERE {in_month})")):
+        await conn.execute(text(f'CREATE TABLE IF NOT EXISTS {SCHEMA}."{name}" PARTITION OF {SCHEMA}.{PARENT} {bounds}'))
+        return 0
+
+    # DEFAULT 에 그 달 행이 있으면 PARTITION OF 가 실패한다: 따로 만든 테이블로 옮긴 뒤 붙인다
+    await conn.execute(text(f'CREATE TABLE {SCHEMA}."{name}" (LIKE {SCHEMA}.{PARENT} INCLUDING DEFAULTS)'))
+    moved = (await conn.execute(text(
+        f"WITH moved AS (DELETE FROM {SCHEMA}.{DEFAULT_PARTITION} WHERE {in_month} RETURNING {_COLS}) "
+        f'INSERT INTO {SCHEMA}."{name}" ({_COLS}) SELECT {_COLS} FROM moved'
+    ))).rowcount
+    await conn.execute(text(f'ALTER TABLE {SCHEMA}.{PARENT} ATTACH PARTITION {SCHEMA}."{name}" {bounds}'))
+    return moved
+
+
+async def ensure_partitions(conn: AsyncConnection, ahead: int, since: Optional[date] = None) -> list[str]:
+    """since(기본: 이번 달) ~ 이번 달 + ahead 개월 파티션을 만든다. 만든 이름 목록을 돌려준다."""
+    await _lock(conn)
+    have = await existing_partitions(conn)
+    has_default = await _has_default(conn)
+
+    created = []
+    month = month_start(since) if since else _this_month()
+    last = add_months(_this_month(), max(0, ahead))
+    while month <= last:
+        if month not in have:
+            moved = await _create_partition(conn, month, has_default)
+            if moved:
+                log.warning("[DB] moved %d run_logs rows from %s to %s", moved, DEFAULT_PARTITION, partition_name(month))
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+
+    if has_default:
+        left, first, last_at = (await conn.execute(text(
+            f"SELECT count(*), min(cleared_at), max(cleared_at) FROM {SCHEMA}.{DEFAULT_PARTITION}"))).one()
+        if left:
+            log.warning("[DB] %s holds %d run_logs rows outside the monthly partitions (%s ~ %s)",
+                        DEFAULT_PARTITION, left, first, last_at)
+    return created
+
+
+async def apply_retention(conn: AsyncConnection, keep_months: int, mode: str = "detach") -> list[str]:
+    """이번 달 포함 keep_months 개월보다 오래된 파티션을 detach 또는 drop 한다.
+
+    detach 한 테이블(run_logs_YYYYMM)은 그대로 남으므로 보관/덤프 후 직접 지우면 된다.
+    keep_months <= 0 이면 아무것도 하지 않는다.
+    """
+    if keep_months <= 0:
+        return []
+    if mode not in ("detach", "drop"):
+        raise ValueError(f"unknown retention mode: {mode!r}")
+
+    await _lock(conn)
+    oldest_kept = add_months(_this_month(), -(keep_months - 1))
+    removed = []
+    for month, name in sorted((await existing_partitions(conn)).items()):
+        if month >= oldest_kept:
+            continue
+        await conn.execute(text(f'ALTER TABLE {SCHEMA}.{PARENT} DETACH PARTITION {SCHEMA}."{name}"'))
+        if mode == "drop":
+            await conn.execute(text(f'DROP TABLE {SCHEMA}."{name}"'))
+        removed.append(name)
+    return removed
+
+
+async def maintenance_loop(engine: AsyncEngine, ahead: int, keep_months: int, mode: str, interval_s: float):
+    """interval_s 마다 앞으로 쓸 파티션을 만들고 보관 기간을 적용한다."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            async with engine.begin() as conn:
+                created = await ensure_partitions(conn, ahead)
+                removed = await apply_retention(conn, keep_months, mode)
+            if created or removed:
+                log.info("[DB] run_logs partitions created=%s %s=%s", created, mode, removed)
+        except Exception:
+            log.exception("[DB] run_logs partition maintenance failed")
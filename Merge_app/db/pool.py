@@ -0,0 +1,150 @@
+"""커넥션 풀 통계와 유휴 커넥션 핑.
+
+PoolMeter 는 엔진 풀의 공개 이벤트(sqlalchemy.event)에 붙는다:
+    connect  새 DBAPI 커넥션 수
+    checkin  돌려받은 시각을 커넥션 record.info 에 남긴다
+    checkout 꺼낸 수, 그리고 ping_idle_s 보다 오래 쉬었던 커넥션이면 핑
+체크아웃 대기 시간 / 대기 중인 요청 수 / 타임아웃은 이벤트가 없어서 MeteredAsyncPool 이
+공개 메서드 Pool.connect() (엔진이 커넥션을 빌릴 때 부르는 곳, 비었으면 여기서 기다린다)를 감싸 잰다.
+이벤트 리스너는 dispose 뒤 새로 만든 풀에도 그대로 따라가고, meter 는 recreate 가 넘긴다.
+
+ping_idle_s > 0 이면 그보다 오래 쉬었던 커넥션만 꺼낼 때 핑을 보낸다 (pre_ping=idle).
+pool_pre_ping=True 는 체크아웃마다 왕복 하나를 더 쓰지만, 바쁠 때는 방금 돌려받은 커넥션이
+대부분이라 핑이 필요 없다. 핑이 실패하면 DisconnectionError 로 풀에 알려
+풀이 그 커넥션을 버리고 새로 연결해 돌려준다.
+"""
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+def _pct(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+class PoolMeter:
+    def __init__(self, engine: AsyncEngine, max_overflow: int, ping_idle_s: float = 0.0):
+        self.engine = engine
+        self.max_overflow = max_overflow
+        self.ping_idle_s = ping_idle_s
+        self.waiters = 0
+
+        # 통계
+        self.connects = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.max_waiters = 0
+        self.wait_ms_total = 0.0
+        self.max_wait_ms = 0.0
+        self.recent_wait_ms: deque[float] = deque(maxlen=1024)
+        self.idle_pings = 0
+        self.ping_failures = 0
+
+    def attach(self):
+        pool = self.engine.sync_engine.pool
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        if isinstance(pool, MeteredAsyncPool):
+            pool.meter = self
+
+    def _on_connect(self, dbapi_connection, record):
+        self.connects += 1
+
+    def _on_checkin(self, dbapi_connection, record):
+        record.info["checked_in_at"] = time.monotonic()
+
+    def _on_checkout(self, dbapi_connection, record, proxy):
+        self.checkouts += 1
+        if self.ping_idle_s <= 0:
+            return
+        idle = time.monotonic() - record.info.pop("checked_in_at", time.monotonic())
+        if idle <= self.ping_idle_s:
+            return
+        self.idle_pings += 1
+        try:
+            self.engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            self.ping_failures += 1
+            # 풀이 이 커넥션을 버리고 새로 연결해 다시 체크아웃한다
+            raise exc.DisconnectionError(f"idle connection ping failed: {e}") from e
+
+    def waited(self, started: float, timed_out: bool):
+        waited = (time.perf_counter() - started) * 1000.0
+        self.waits += 1
+        self.wait_ms_total += waited
+        self.max_wait_ms = max(self.max_wait_ms, waited)
+        self.recent_wait_ms.append(waited)
+        if timed_out:
+            self.timeouts += 1
+
+    def reset_stats(self):
+        self.connects = self.checkouts = self.waits = self.timeouts = self.max_waiters = 0
+        self.wait_ms_total = self.max_wait_ms = 0.0
+        self.recent_wait_ms.clear()
+        self.idle_pings = self.ping_failures = 0
+
+    def stats(self) -> dict:
+        pool = self.engine.sync_engine.pool
+        return {
+            "size": pool.size(),
+            "max_overflow": self.max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "waiters": self.waiters,
+            "max_waiters": self.max_waiters,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_ms_total / self.waits, 3) if self.waits else 0.0,
+            "p99_wait_ms": round(_pct(self.recent_wait_ms, 0.99), 3),
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "idle_pings": self.idle_pings,
+            "ping_failures": self.ping_failures,
+        }
+
+
+class MeteredAsyncPool(AsyncAdaptedQueuePool):
+    """Pool.connect() 에서 기다린 시간을 meter 에 남기는 풀 (meter 가 없으면 그대로)."""
+    meter: Optional[PoolMeter] = None
+
+    def connect(self):
+        meter = self.meter
+        if meter is None:
+            return super().connect()
+        meter.waiters += 1
+        meter.max_waiters = max(meter.max_waiters, meter.waiters)
+        started, timed_out = time.perf_counter(), False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            meter.waiters -= 1
+            meter.waited(started, timed_out)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.meter = self.meter
+        return pool
+
+    def reset_stats(self):
+        if self.meter is not None:
+            self.meter.reset_stats()
+
+    def stats(self) -> dict:
+        return self.meter.stats() if self.meter is not None else {}
+
+
+def meter_pool(engine: AsyncEngine, max_overflow: int, ping_idle_s: float = 0.0) -> PoolMeter:
+    meter = PoolMeter(engine, max_overflow, ping_idle_s)
+    meter.attach()
+    return meter
@@ -0,0 +1,58 @@
+"""GET /progress/{user_id} 조회.
+
+users 를 기준으로 진행행/스테이지를 LEFT JOIN 한 문장 하나로 읽는다:
+
+    0 행                → 유저 없음 (404)
+    code 가 NULL 인 1 행 → 유저는 있지만 진행행이 없음
+    그 외               → 스테이지마다 한 행 (code 순)
+
+문장은 모듈 수준에서 한 번 만들어 SQLAlchemy 컴파일 캐시와 asyncpg prepared
+statement 캐시(settings.db_prepared_statement_cache_size)를 그대로 탄다.
+"""
+from typing import Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Merge_app.db.models import StageORM, UserORM, UserStageProgressORM
+
+P = UserStageProgressORM
+
+PROGRESS_STMT = (
+    select(
+        UserORM.profile_image,
+        StageORM.code,
+        P.unlocked,
+        P.cleared,
+        P.prompt_length,
+        P.clear_time_ms,
+        P.cleared_at,
+    )
+    .select_from(UserORM)
+    .outerjoin(P, P.user_id == UserORM.user_id)
+    .outerjoin(StageORM, StageORM.stage_id == P.stage_id)
+    .where(UserORM.user_id == bindparam("user_id"))
+    .order_by(StageORM.code)
+)
+
+
+async def fetch_progress(s: AsyncSession, user_id: str) -> Optional[dict]:
+    """/progress 응답 본문. 유저가 없으면 None."""
+    rows = (await s.execute(PROGRESS_STMT, {"user_id": user_id})).all()
+    if not rows:
+        return None
+    return {
+        "user_id": user_id,
+        "profile_image": rows[0].profile_image,
+        "stages": [
+            {
+                "code": r.code,
+                "unlocked": r.unlocked,
+                "cleared": r.cleared,
+                "prompt_length": r.prompt_length,
+                "clear_time_ms": r.clear_time_ms,
+                "cleared_at": r.cleared_at.isoformat() if r.cleared_at else None,
+            }
+            for r in rows if r.code is not None
+        ],
+    }
@@ -0,0 +1,281 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, literal, select, true, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from Merge_app.db.models import StageStatsORM, UserORM, UserStageProgressORM
+from Merge_app.db.stage_stats import LENGTH_EDGES, TIME_EDGES_MS, bucket, bucket_floor, live_hist
+
+P = UserStageProgressORM
+
+# 조건은 `cleared` 그대로 쓴다 (`cleared IS true` 로 쓰면 부분 인덱스
+# WHERE cleared AND ... 에 매칭되지 않아 순차 스캔이 된다).
+
+_stage_id = bindparam("stage_id")
+_user_id = bindparam("user_id")
+_time = bindparam("clear_time_ms")
+_length = bindparam("prompt_length")
+_cleared_at = bindparam("cleared_at")
+_time_floor = bindparam("time_floor")
+_length_floor = bindparam("length_floor")
+
+
+def _count(metric, *extra):
+    # 해당 스테이지에서 metric 기록을 가진 다른 유저 수 (+ 추가 조건)
+    return (
+        select(func.count())
+        .select_from(P)
+        .where(
+            P.stage_id == _stage_id,
+            P.cleared,
+            metric.isnot(None),
+            P.user_id != _user_id,
+            *extra,
+        )
+        .scalar_subquery()
+    )
+
+
+def _top10(board: str, metric):
+    # 동률은 cleared_at 이 빠른 쪽이 위 (그래도 같으면 user_id 순 - 메모리 인덱스와 같은 순서)
+    order = (metric.asc(), P.cleared_at.asc(), P.user_id.asc())
+    return (
+        select(
+            literal(board).label("board"),
+            P.user_id,
+            P.prompt_length,
+            P.clear_time_ms,
+            UserORM.profile_image,
+            func.row_number().over(order_by=order).label("pos"),
+        )
+        .join(UserORM, P.user_id == UserORM.user_id)
+        .where(
+            P.stage_id == _stage_id,
+            P.cleared,
+            metric.isnot(None),
+            P.cleared_at.isnot(None),  # tie-breaker 안정성
+        )
+        .order_by(*order)
+        .limit(10)
+    )
+
+
+# 랭킹 4개 카운트 + 두 부문 Top 10 을 한 번의 왕복으로 가져온다.
+#   WITH me AS (SELECT (count..) AS faster_time, ...)
+#   SELECT me.*, top.* FROM me LEFT JOIN ((top10 prompt) UNION ALL (top10 time)) top ON true
+# 카운트는 (stage_id, metric, cleared_at) 정렬과 같은 모양이라 인덱스 범위 스캔으로 끝난다.
+_me = select(
+    _count(P.clear_time_ms, tuple_(P.clear_time_ms, P.cleared_at) < tuple_(_time, _cleared_at)).label("faster_time"),
+    _count(P.clear_time_ms).label("others_time"),
+    _count(P.prompt_length, tuple_(P.prompt_length, P.cleared_at) < tuple_(_length, _cleared_at)).label("shorter_length"),
+    _count(P.prompt_length).label("others_length"),
+).cte("me")
+
+_top = union_all(
+    _top10("prompt", P.prompt_length),
+    _top10("time", P.clear_time_ms),
+).subquery("top")
+
+RANKING_STMT = (
+    select(_me, _top)
+    .select_from(_me.outerjoin(_top, true()))
+    .order_by(_top.c.board, _top.c.pos)
+)
+
+# stage_stats 히스토그램을 쓰는 판 (기본 경로).
+# 앞선 기록 수 = 내 구간보다 아래 구간 합(파이썬, O(구간 수)) + 내 구간 안의 정확한 카운트.
+# 구간 안 카운트는 (stage_id, metric) 이 [구간 하한, 내 기록) 인 인덱스 범위만 읽는다.
+# 히스토그램은 stage_stats 행 + 아직 합치지 않은 stage_stats_delta (같은 트랜잭션의 내 기록 포함).
+# 통계 행이 없으면 결과가 0행이고, 그때는 RANKING_STMT 로 전부 센다.
+_me_hist = select(
+    live_hist(StageStatsORM.time_hist, "t", StageStatsORM.stage_id).label("time_hist"),
+    live_hist(StageStatsORM.length_hist, "l", StageStatsORM.stage_id).label("length_hist"),
+    _count(
+        P.clear_time_ms, P.clear_time_ms >= _time_floor,
+        tuple_(P.clear_time_ms, P.cleared_at) < tuple_(_time, _cleared_at),
+    ).label("faster_in_bucket"),
+    _count(
+        P.prompt_length, P.prompt_length >= _length_floor,
+        tuple_(P.prompt_length, P.cleared_at) < tuple_(_length, _cleared_at),
+    ).label("shorter_in_bucket"),
+).where(StageStatsORM.stage_id == _stage_id).cte("me")
+
+HIST_RANKING_STMT = (
+    select(_me_hist, _top)
+    .select_from(_me_hist.outerjoin(_top, true()))
+    .order_by(_top.c.board, _top.c.pos)
+)
+
+
+async def fetch_top(s: AsyncSession, stage_id: int, board: str, limit: int) -> list[dict]:
+    """한 부문(board: time / prompt) 상위 limit 개 (Top 10 과 같은 순서/모양)."""
+    metric = P.clear_time_ms if board == "time" else P.prompt_length
+    rows = (await s.execute(_top10(board, metric).limit(limit), {"stage_id": stage_id})).all()
+    return [_entry(r) for r in rows]
+
+
+def _leaderboards(rows) -> dict:
+    return {
+        "prompt_top10": [_entry(r) for r in rows if r.board == "prompt"],
+        "time_top10": [_entry(r) for r in rows if r.board == "time"],
+    }
+
+
+def _entry(r) -> dict:
+    return {
+        "user_id": r.user_id,
+        "prompt_length": int(r.prompt_length) if r.prompt_length is not None else None,
+        "clear_time_ms": int(r.clear_time_ms) if r.clear_time_ms is not None else None,
+        "profile_image": int(r.profile_image) if r.profile_image is not None else None,
+    }
+
+
+async def fetch_ranking(
+    s: AsyncSession,
+    stage_id: int,
+    user_id: str,
+    clear_time_ms: int,
+    prompt_length: int,
+    cleared_at: datetime,
+) -> dict:
+    """내 최고 기록 기준 순위/비율과 두 부문 Top 10.
+
+    반환 키는 /run-logs 응답에 그대로 쓰인다. 내 기록이 user_stage_progress 에
+    먼저 반영되어 있어야 한다 (히스토그램 합에 내가 포함된다).
+    """
+    tb = bucket(TIME_EDGES_MS, clear_time_ms)
+    lb = bucket(LENGTH_EDGES, prompt_length)
+    params = {
+        "stage_id": stage_id,
+        "user_id": user_id,
+        "clear_time_ms": clear_time_ms,
+        "prompt_length": prompt_length,
+        "cleared_at": cleared_at,
+    }
+    rows = (await s.execute(HIST_RANKING_STMT, {
+        **params,
+        "time_floor": bucket_floor(TIME_EDGES_MS, tb),
+        "length_floor": bucket_floor(LENGTH_EDGES, lb),
+    })).all()
+
+    if rows:
+        head = rows[0]
+        ranks = _ranks(
+            rank_clear=sum(head.time_hist[:tb]) + head.faster_in_bucket + 1,
+            total_time=sum(head.time_hist),
+            rank_length=sum(head.length_hist[:lb]) + head.shorter_in_bucket + 1,
+            total_length=sum(head.length_hist),
+        )
+        return {**ranks, "leaderboards": _leaderboards(rows)}
+
+    # stage_stats 행이 없으면 (트리거 적용 전 DB 등) 전부 센다
+    return await fetch_ranking_by_count(s, params)
+
+
+async def fetch_ranking_by_count(s: AsyncSession, params: dict) -> dict:
+    """fetch_ranking 의 대체 경로: 네 카운트를 모두 인덱스로 센다 (params 는 RANKING_STMT 인자)."""
+    rows = (await s.execute(RANKING_STMT, params)).all()
+    head = rows[0]
+    # 총 비교 인원 = 다른 사람 + 나(이번 기록)
+    return {
+        **_ranks(
+            rank_clear=(head.faster_time or 0) + 1,
+            total_time=(head.others_time or 0) + 1,
+            rank_length=(head.shorter_length or 0) + 1,
+            total_length=(head.others_length or 0) + 1,
+        ),
+        "leaderboards": _leaderboards(rows),
+    }
+
+
+def _ranks(rank_clear: int, total_time: int, rank_length: int, total_length: int) -> dict:
+    return {
+        "rank_clear_time_percent": round((rank_clear / total_time) * 100.0, 2),
+        "rank_tokens_percent": round((rank_length / total_length) * 100.0, 2),
+        "rank_clear_time": rank_clear,
+        "rank_tokens": rank_length,
+        "total_records": total_time,
+    }
+
+
+# ── 여러 스테이지/유저를 한 번에 (POST /run-logs/batch) ───────────────
+
+async def fetch_stage_ranks(
+    s: AsyncSession,
+    pairs: list[tuple[int, str]],
+) -> dict[tuple[int, str], dict]:
+    """(stage_id, user_id) 들의 순위/비율을 스테이지별 윈도 함수 한 문장으로 계산한다.
+
+    rank() 는 (metric, cleared_at) 이 엄격히 앞선 행 수 + 1 이라 fetch_ranking 과 값이 같다.
+    NULL 은 뒤로 보내 (v, NULL) 행이 같은 v 의 내 기록을 앞지르지 않게 한다.
+    """
+    if not pairs:
+        return {}
+
+    def rank(metric):
+        return func.rank().over(
+            partition_by=P.stage_id,
+            order_by=(metric.asc().nulls_last(), P.cleared_at.asc().nulls_last()),
+        )
+
+    ranked = (
+        select(
+            P.stage_id,
+            P.user_id,
+            rank(P.clear_time_ms).label("rank_time"),
+            func.count(P.clear_time_ms).over(partition_by=P.stage_id).label("total_time"),
+            rank(P.prompt_length).label("rank_length"),
+            func.count(P.prompt_length).over(partition_by=P.stage_id).label("total_length"),
+        )
+        .where(P.stage_id.in_({stage_id for stage_id, _ in pairs}), P.cleared)
+        .subquery()
+    )
+    rows = (await s.execute(
+        select(ranked).where(tuple_(ranked.c.stage_id, ranked.c.user_id).in_(pairs))
+    )).all()
+
+    return {
+        (r.stage_id, r.user_id): _ranks(r.rank_time, r.total_time, r.rank_length, r.total_length)
+        for r in rows
+    }
+
+
+def _top10_per_stage(board: str, metric, stage_ids):
+    ranked = (
+        select(
+            literal(board).label("board"),
+            P.stage_id,
+            P.user_id,
+            P.prompt_length,
+            P.clear_time_ms,
+            UserORM.profile_image,
+            func.row_number().over(
+                partition_by=P.stage_id, order_by=(metric.asc(), P.cleared_at.asc(), P.user_id.asc())
+            ).label("pos"),
+        )
+        .join(UserORM, P.user_id == UserORM.user_id)
+        .where(
+            P.stage_id.in_(stage_ids),
+            P.cleared,
+            metric.isnot(None),
+            P.cleared_at.isnot(None),
+        )
+        .subquery()
+    )
+    return select(ranked).where(ranked.c.pos <= 10)
+
+
+async def fetch_leaderboards(s: AsyncSession, stage_ids: set[int]) -> dict[int, dict]:
+    """스테이지마다 두 부문 Top 10 (fetch_ranking 의 leaderboards 와 같은 모양)."""
+    out = {stage_id: {"prompt_top10": [], "time_top10": []} for stage_id in stage_ids}
+    if not stage_ids:
+        return out
+    top = union_all(
+        _top10_per_stage("prompt", P.prompt_length, stage_ids),
+        _top10_per_stage("time", P.clear_time_ms, stage_ids),
+    ).subquery()
+    rows = (await s.execute(select(top).order_by(top.c.board, top.c.stage_id, top.c.pos))).all()
+    for r in rows:
+        out[r.stage_id][f"{r.board}_top10"].append(_entry(r))
+    return out
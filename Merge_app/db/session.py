@@ -1,44 +1,99 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy import select
 from Merge_app.config import settings
 from Merge_app.db.models import Base, StageORM
+from Merge_app.db.ingest import RunLogWriter
+from Merge_app.db.migrations import apply_migrations
+from Merge_app.db.partitions import ensure_partitions, apply_retention
+from Merge_app.db.pool import MeteredAsyncPool, meter_pool
+from Merge_app.db.stages import STAGE_GROUPS, STAGES_PER_GROUP, STAGE_CODES, load_stage_registry
 
-engine = create_async_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    connect_args={
-        "server_settings": {
-            "search_path": "gameapp,public"
-        }
-    },
-)
+log = logging.getLogger(__name__)
+
+def make_engine(
+    url: str = settings.database_url,
+    pool_size: int = settings.db_pool_size,
+    max_overflow: int = settings.db_pool_max_overflow,
+    pool_timeout_s: float = settings.db_pool_timeout_s,
+    pre_ping: str = settings.db_pool_pre_ping,
+) -> AsyncEngine:
+    """앱 엔진 설정 그대로 만든다 (bench 에서 풀 크기만 바꿔 보려고 함수로 둔다)."""
+    eng = create_async_engine(
+        url,
+        poolclass=MeteredAsyncPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout_s,
+        pool_recycle=settings.db_pool_recycle_s,
+        pool_pre_ping=pre_ping == "always",
+        # 모듈 수준 문장(RANKING_STMT, PROGRESS_STMT 등)은 한 번 컴파일한 SQL 을 재사용하고,
+        # 같은 SQL 은 커넥션마다 한 번만 prepare 된다
+        query_cache_size=settings.db_query_cache_size,
+        connect_args={
+            "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+            "server_settings": {
+                "search_path": "gameapp,public"
+            }
+        },
+    )
+    meter_pool(eng, max_overflow, ping_idle_s=settings.db_pool_ping_idle_s if pre_ping == "idle" else 0.0)
+    return eng
+
+engine = make_engine()
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
+# settings.run_log_write_behind 일 때 /run-logs 의 run_logs 적재를 모아서 쓴다
+run_log_writer = RunLogWriter(
+    async_session,
+    flush_ms=settings.run_log_flush_ms,
+    flush_rows=settings.run_log_flush_rows,
+    max_queue=settings.run_log_queue_size,
+)
+
 async def init_db():
-    # 테이블 생성
+    # 테이블 생성 + 밀린 스키마 변경 적용 (Merge_app/db/migrations.py)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await apply_migrations(conn)
+        # run_logs 는 파티션이 있어야 INSERT 된다: 이번 달 ~ 앞으로 쓸 달까지 미리 만든다
+        await ensure_partitions(conn, settings.run_log_partitions_ahead)
+        await apply_retention(conn, settings.run_log_retention_months, settings.run_log_retention_mode)
 
     # 스테이지 시드 (A1~A5, B1~B5, ... E1~E5)
     async with async_session() as session, session.begin():
         exists = (await session.execute(select(StageORM).limit(1))).scalars().first()
         if not exists:
-            groups = ["A", "B", "C", "D", "E"]
-            stages = []
-
-            for g in groups:
-                for i in range(1, 6):
-                    stages.append(StageORM(code=f"{g}{i}"))
+            stages = [StageORM(code=code) for code in STAGE_CODES]
             session.add_all(stages)
             await session.flush()  # stage_id 채우기
 
             # next_stage_id 연결
             code_to_obj = {st.code: st for st in stages}
-            for g in groups:
-                for i in range(1, 5):  # g1→g2, g2→g3, ...
+            for g in STAGE_GROUPS:
+                for i in range(1, STAGES_PER_GROUP):  # g1→g2, g2→g3, ...
                     cur = code_to_obj[f"{g}{i}"]
                     nxt = code_to_obj[f"{g}{i+1}"]
                     cur.next_stage_id = nxt.stage_id
 
+    # 스테이지는 시드 후 바뀌지 않으므로 메모리에 올려 두고 요청마다 재조회하지 않는다
+    async with async_session() as session:
+        await load_stage_registry(session)
+
+async def warm_pool(eng: AsyncEngine = engine, n: int = settings.db_pool_size):
+    """n 개를 동시에 연결했다가 돌려줘 풀을 채운다 (첫 요청들이 연결 수립을 기다리지 않게)."""
+    conns = await asyncio.gather(*(eng.connect() for _ in range(n)), return_exceptions=True)
+    errors = [c for c in conns if isinstance(c, BaseException)]
+    for c in conns:
+        if not isinstance(c, BaseException):
+            await c.close()
+    if errors:
+        # 못 채운 만큼은 요청이 올 때 연결한다 (max_connections 부족 등)
+        log.warning("[DB] pool warm-up: %d/%d connections failed: %s", len(errors), n, errors[0])
+    eng.pool.reset_stats()      # 예열 중 연결 수립 시간은 체크아웃 대기 통계에서 뺀다
+
 async def dispose_db():
+    # 아직 쓰지 않은 run_logs 를 먼저 내려쓴다
+    await run_log_writer.close()
     await engine.dispose()
\ No newline at end of file
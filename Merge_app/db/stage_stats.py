@@ -0,0 +1,258 @@
+"""스테이지별 기록 히스토그램 (stage_stats).
+
+구간 경계는 고정이다. width_bucket(v, EDGES) 와 bisect_right(EDGES, v) 가 같은 값
+(0 ~ len(EDGES))을 주고, 그 값 + 1 이 배열 위치(1부터)다.
+
+    순위 = (내 구간보다 아래 구간 합) + (내 구간 안에서 나보다 앞선 기록 수, 정확히 셈) + 1
+    전체 = 구간 합
+
+앞쪽은 O(구간 수), 뒤쪽은 구간 하나 범위의 인덱스 스캔이라 스테이지 기록 수와 무관하다.
+
+user_stage_progress 문장 단위 트리거는 stage_stats 행을 직접 고치지 않고 증감을
+stage_stats_delta 에 INSERT 만 한다. 스테이지마다 행이 하나뿐이라 요청 트랜잭션 안에서 UPDATE 하면
+같은 스테이지 제출이 그 행 잠금에 줄을 서고, 스테이지 순서가 다른 배치끼리는 교착도 난다.
+fold_stage_stats 가 주기적으로 증감을 stage_stats 에 합치고, 읽는 쪽은 stage_stats_live 로
+아직 합치지 않은 증감까지 더해 본다 (같은 문장 안이라 합치는 중이어도 둘 중 한쪽에만 보인다).
+경계를 바꾸면 새 마이그레이션에서 함수를 다시 만들고 rebuild 해야 한다 (setup.sql 도 같이).
+"""
+import asyncio
+import logging
+from bisect import bisect_right
+from typing import Optional, Sequence
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from Merge_app.db.models import Base, StageStatsORM
+
+log = logging.getLogger(__name__)
+
+SCHEMA = Base.metadata.schema
+
+TIME_EDGES_MS: tuple[int, ...] = (
+    1000, 2000, 3000, 4000, 5000, 6000, 8000, 10000, 12000, 15000,
+    20000, 25000, 30000, 40000, 50000, 60000, 75000, 90000, 120000, 150000,
+    180000, 240000, 300000, 420000, 600000, 900000, 1200000, 1800000, 3600000,
+)
+LENGTH_EDGES: tuple[int, ...] = (*range(2, 41), 45, 50, 60, 70, 80, 100, 150, 200)
+
+
+def bucket(edges: Sequence[int], value: int) -> int:
+    """width_bucket(value, edges) 와 같은 0 ~ len(edges)."""
+    return bisect_right(edges, value)
+
+
+def bucket_floor(edges: Sequence[int], b: int) -> int:
+    """b 번 구간의 하한 (0 번 구간은 0 - 기록은 음수가 없다)."""
+    return edges[b - 1] if b > 0 else 0
+
+
+def _array(edges: Sequence[int], pg_type: str) -> str:
+    return "'{" + ",".join(map(str, edges)) + "}'::" + pg_type
+
+
+_TIME = _array(TIME_EDGES_MS, "bigint[]")
+_LENGTH = _array(LENGTH_EDGES, "int[]")
+
+_ZEROS = (
+    f"array_fill(0::bigint, ARRAY[{len(TIME_EDGES_MS) + 1}]), "
+    f"array_fill(0::bigint, ARRAY[{len(LENGTH_EDGES) + 1}])"
+)
+
+# 전이 테이블(old_rows/new_rows)의 행 변화를 (stage_id, 지표 t/l, 배열 위치) 별 증감으로 모아
+# stage_stats_delta 에 덧붙인다 (다른 트랜잭션과 잠글 행이 없다).
+_DELTAS = """
+        SELECT stage_id, 't' AS m, {schema}.stage_stats_time_bucket(clear_time_ms) AS i, {sign} AS n
+        FROM {table} WHERE cleared AND clear_time_ms IS NOT NULL
+        UNION ALL
+        SELECT stage_id, 'l', {schema}.stage_stats_length_bucket(prompt_length), {sign}
+        FROM {table} WHERE cleared AND prompt_length IS NOT NULL"""
+
+_APPLY = """
+    INSERT INTO {schema}.stage_stats_delta (stage_id, m, i, n)
+    SELECT stage_id, m, i, sum(n) FROM ({deltas}
+    ) x GROUP BY 1, 2, 3 HAVING sum(n) <> 0;"""
+
+_ENSURE_ROWS = """
+    INSERT INTO {schema}.stage_stats (stage_id, time_hist, length_hist)
+    SELECT DISTINCT stage_id, {zeros} FROM new_rows WHERE cleared
+    ON CONFLICT (stage_id) DO NOTHING;"""
+
+
+def _apply(*sources: tuple[str, int]) -> str:
+    deltas = "\n        UNION ALL".join(_DELTAS.format(schema=SCHEMA, table=t, sign=n) for t, n in sources)
+    return _APPLY.format(schema=SCHEMA, deltas=deltas)
+
+
+_ensure = _ENSURE_ROWS.format(schema=SCHEMA, zeros=_ZEROS)
+
+# hist 배열 + 아직 합치지 않은 증감 (STABLE 이라 부른 문장과 같은 스냅샷을 본다)
+_LIVE = """
+  SELECT array_agg(h.v + COALESCE(d.n, 0) ORDER BY h.i)
+  FROM unnest(hist) WITH ORDINALITY h(v, i)
+  LEFT JOIN (SELECT i, sum(n) AS n FROM {schema}.stage_stats_delta
+             WHERE stage_id = sid AND m = metric GROUP BY i) d ON d.i = h.i
+"""
+
+# 마이그레이션에서 실행 (setup.sql 에 같은 내용).
+# 문장 단위 트리거 + 전이 테이블: 한 문장이 여러 행을 바꿔도 스테이지/지표/구간마다 증감 행은 하나다.
+# 이벤트마다 쓸 수 있는 전이 테이블이 달라 트리거를 셋으로 나눈다.
+DDL: list[str] = [
+    f"CREATE OR REPLACE FUNCTION {SCHEMA}.stage_stats_time_bucket(v BIGINT) RETURNS INT "
+    f"LANGUAGE sql IMMUTABLE AS $$ SELECT width_bucket(v, {_TIME}) + 1 $$",
+    f"CREATE OR REPLACE FUNCTION {SCHEMA}.stage_stats_length_bucket(v INT) RETURNS INT "
+    f"LANGUAGE sql IMMUTABLE AS $$ SELECT width_bucket(v, {_LENGTH}) + 1 $$",
+    f"CREATE OR REPLACE FUNCTION {SCHEMA}.stage_stats_live(hist BIGINT[], sid INT, metric TEXT) "
+    f"RETURNS BIGINT[] LANGUAGE sql STABLE AS $${_LIVE.format(schema=SCHEMA)}$$",
+    f"""CREATE OR REPLACE FUNCTION {SCHEMA}.stage_stats_apply() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN{_ensure}{_apply(("new_rows", 1))}
+  ELSIF TG_OP = 'UPDATE' THEN{_ensure}{_apply(("old_rows", -1), ("new_rows", 1))}
+  ELSE{_apply(("old_rows", -1))}
+  END IF;
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql""",
+    *[f"DROP TRIGGER IF EXISTS trg_stage_stats_{op} ON {SCHEMA}.user_stage_progress"
+      for op in ("ins", "upd", "del")],
+    f"CREATE TRIGGER trg_stage_stats_ins AFTER INSERT ON {SCHEMA}.user_stage_progress\n"
+    f"REFERENCING NEW TABLE AS new_rows\n"
+    f"FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.stage_stats_apply()",
+    f"CREATE TRIGGER trg_stage_stats_upd AFTER UPDATE ON {SCHEMA}.user_stage_progress\n"
+    f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows\n"
+    f"FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.stage_stats_apply()",
+    f"CREATE TRIGGER trg_stage_stats_del AFTER DELETE ON {SCHEMA}.user_stage_progress\n"
+    f"REFERENCING OLD TABLE AS old_rows\n"
+    f"FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.stage_stats_apply()",
+]
+
+
+def _hist_sql(column: str, bucket_fn: str, n: int) -> str:
+    return (
+        f"(SELECT array_agg(COALESCE(c.n, 0) ORDER BY b.i) FROM generate_series(1, {n}) b(i) "
+        f" LEFT JOIN (SELECT {SCHEMA}.{bucket_fn}(p.{column}) AS i, count(*) AS n "
+        f"            FROM {SCHEMA}.user_stage_progress p "
+        f"            WHERE p.stage_id = s.stage_id AND p.cleared AND p.{column} IS NOT NULL GROUP BY 1) c "
+        f" ON c.i = b.i)"
+    )
+
+
+# 스테이지마다 (stage_id, time_hist, length_hist) 를 처음부터 센다
+HIST_SELECT_SQL = f"""
+SELECT s.stage_id,
+       {_hist_sql("clear_time_ms", "stage_stats_time_bucket", len(TIME_EDGES_MS) + 1)} AS time_hist,
+       {_hist_sql("prompt_length", "stage_stats_length_bucket", len(LENGTH_EDGES) + 1)} AS length_hist
+FROM {SCHEMA}.stages s
+"""
+
+REBUILD_SQL = f"""
+INSERT INTO {SCHEMA}.stage_stats (stage_id, time_hist, length_hist)
+{HIST_SELECT_SQL}
+ON CONFLICT (stage_id) DO UPDATE
+SET time_hist = EXCLUDED.time_hist, length_hist = EXCLUDED.length_hist, updated_at = now()
+"""
+
+
+async def rebuild_stage_stats(conn: AsyncConnection):
+    """user_stage_progress 전체에서 히스토그램을 다시 만든다 (마이그레이션/복구용).
+
+    세는 동안 기록 쓰기를 막고 쌓인 증감을 버린다 (트랜잭션이 끝날 때까지).
+    """
+    await conn.execute(text(f"LOCK TABLE {SCHEMA}.user_stage_progress IN SHARE MODE"))
+    await conn.execute(text(f"DELETE FROM {SCHEMA}.stage_stats_delta"))
+    await conn.execute(text(REBUILD_SQL))
+
+
+def _add(column: str, m: str) -> str:
+    return (
+        f"(SELECT array_agg(h.v + COALESCE(d.n, 0) ORDER BY h.i) "
+        f" FROM unnest(st.{column}) WITH ORDINALITY h(v, i) "
+        f" LEFT JOIN d ON d.stage_id = st.stage_id AND d.m = '{m}' AND d.i = h.i)"
+    )
+
+
+# 쌓인 증감을 지우면서 스테이지 행마다 UPDATE 한 번으로 더한다.
+# 통계 행이 없는 스테이지의 증감은 남겨 둔다 (트리거가 행을 먼저 만들기 때문에 보통은 없다).
+FOLD_SQL = f"""
+WITH moved AS (
+  DELETE FROM {SCHEMA}.stage_stats_delta
+  WHERE stage_id IN (SELECT stage_id FROM {SCHEMA}.stage_stats)
+  RETURNING stage_id, m, i, n
+), d AS (
+  SELECT stage_id, m, i, sum(n) AS n FROM moved GROUP BY 1, 2, 3
+)
+UPDATE {SCHEMA}.stage_stats st
+SET time_hist = {_add("time_hist", "t")},
+    length_hist = {_add("length_hist", "l")},
+    updated_at = now()
+WHERE st.stage_id IN (SELECT stage_id FROM d)
+"""
+
+
+async def fold_stage_stats(conn: AsyncConnection) -> int:
+    """stage_stats_delta 를 stage_stats 에 합치고, 갱신한 스테이지 수를 돌려준다.
+
+    여러 워커가 동시에 돌려도 DELETE 가 행을 나눠 가지므로 두 번 더해지지 않는다.
+    """
+    return (await conn.execute(text(FOLD_SQL))).rowcount
+
+
+async def fold_loop(engine: AsyncEngine, interval_s: float):
+    """interval_s 마다 fold_stage_stats."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            async with engine.begin() as conn:
+                await fold_stage_stats(conn)
+        except Exception:
+            log.exception("[DB] stage_stats fold failed")
+
+
+def live_hist(column, metric: str, stage_id):
+    """SELECT 용: 히스토그램 배열 + 아직 합치지 않은 증감."""
+    return getattr(func, SCHEMA).stage_stats_live(column, stage_id, metric)
+
+
+def _percentile(edges: Sequence[int], hist: Sequence[int], q: float) -> Optional[float]:
+    """구간 안은 고르게 퍼져 있다고 보고 보간한 q 분위수 (마지막 구간은 하한)."""
+    total = sum(hist)
+    if total == 0:
+        return None
+    target = q * total
+    seen = 0
+    for b, n in enumerate(hist):
+        if n and seen + n >= target:
+            lo = bucket_floor(edges, b)
+            if b >= len(edges):
+                return float(lo)
+            return round(lo + (edges[b] - lo) * (target - seen) / n, 2)
+        seen += n
+    return float(edges[-1])
+
+
+def _summary(edges: Sequence[int], hist: Sequence[int]) -> dict:
+    return {
+        "records": sum(hist),
+        "edges": list(edges),
+        "counts": list(hist),
+        "p10": _percentile(edges, hist, 0.10),
+        "p50": _percentile(edges, hist, 0.50),
+        "p90": _percentile(edges, hist, 0.90),
+    }
+
+
+async def fetch_stage_stats(s: AsyncSession, stage_id: int) -> dict:
+    """GET /stages/{code}/stats 응답 본문 (stage 키 제외). 기록이 없는 스테이지는 0 히스토그램."""
+    row = (await s.execute(
+        select(
+            live_hist(StageStatsORM.time_hist, "t", StageStatsORM.stage_id).label("time_hist"),
+            live_hist(StageStatsORM.length_hist, "l", StageStatsORM.stage_id).label("length_hist"),
+            StageStatsORM.updated_at,
+        ).where(StageStatsORM.stage_id == stage_id)
+    )).first()
+    time_hist = row.time_hist if row else [0] * (len(TIME_EDGES_MS) + 1)
+    length_hist = row.length_hist if row else [0] * (len(LENGTH_EDGES) + 1)
+    return {
+        "clear_time_ms": _summary(TIME_EDGES_MS, time_hist),
+        "prompt_length": _summary(LENGTH_EDGES, length_hist),
+        "updated_at": row.updated_at.isoformat() if row else None,
+    }
@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Merge_app.db.models import StageORM
+
+# A1~A5, B1~B5, ... E1~E5 (그룹 안에서 g1→g2→...→g5 로 이어진다)
+STAGE_GROUPS = ("A", "B", "C", "D", "E")
+STAGES_PER_GROUP = 5
+STAGE_CODES = tuple(f"{g}{i}" for g in STAGE_GROUPS for i in range(1, STAGES_PER_GROUP + 1))
+
+
+@dataclass(frozen=True)
+class Stage:
+    stage_id: int
+    code: str
+    next_stage_id: Optional[int]
+
+
+class StageRegistry:
+    """stages 테이블의 불변 스냅샷. init_db 에서 한 번 채우고 요청마다 DB 대신 쓴다."""
+    def __init__(self):
+        self._by_code: Mapping[str, Stage] = MappingProxyType({})
+        self._by_id: Mapping[int, Stage] = MappingProxyType({})
+
+    def replace(self, stages: Iterable[Stage]):
+        stages = list(stages)
+        self._by_code = MappingProxyType({st.code: st for st in stages})
+        self._by_id = MappingProxyType({st.stage_id: st for st in stages})
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._by_code)
+
+    def by_code(self, code: str) -> Optional[Stage]:
+        return self._by_code.get(code)
+
+    def by_id(self, stage_id: int) -> Optional[Stage]:
+        return self._by_id.get(stage_id)
+
+    def __contains__(self, code: str) -> bool:
+        # 로드 전(앱 시작 전 검증 등)에는 시드 목록으로 판단
+        return code in self._by_code if self._by_code else code in STAGE_CODES
+
+    def __iter__(self):
+        return iter(self._by_code.values())
+
+
+stage_registry = StageRegistry()
+
+
+async def load_stage_registry(session: AsyncSession):
+    rows = (await session.execute(
+        select(StageORM.stage_id, StageORM.code, StageORM.next_stage_id)
+    )).all()
+    stage_registry.replace(Stage(r.stage_id, r.code, r.next_stage_id) for r in rows)
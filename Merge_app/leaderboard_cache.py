@@ -0,0 +1,173 @@
+"""GET /leaderboards/{stage_code} 용 스테이지별 Top N 스냅샷 캐시.
+
+(stage_id, metric) 마다 상위 max_limit 개를 한 번 읽어 두고, limit 별 응답 본문과
+ETag(본문 해시)를 만들어 둔다. ETag 가 내용 해시라 워커/재시작과 무관하게 같은
+Top N 이면 같은 값이 나오고, 클라이언트/프록시는 If-None-Match 로 304 를 받는다.
+
+무효화는 broadcaster 의 best 이벤트로 한다. user_stage_progress upsert 를 커밋한 곳이
+커밋된 최고 기록으로 바로 보낸다 (postgres 백엔드면 다른 워커 기록도 온다).
+run_log 이벤트는 run_log_write_behind 면 flush 뒤에야 나오고, 실패하면 나오지 않으므로 쓰지 않는다.
+그 기록이 Top N 에 들 수 있을 때만 지운다:
+    스냅샷이 max_limit 개보다 적다 / 유저가 이미 스냅샷에 있다 / 값이 N 번째 값 이하
+프로필 이미지 변경은 profile 이벤트로 그 유저가 든 스냅샷만 지운다.
+broadcaster 가 이벤트를 잃었을 수 있다고 알리면(gap) 스냅샷을 전부 지운다.
+ttl_s 는 그래도 알 수 없이 놓친 이벤트(다른 워커가 NOTIFY 를 끝내 못 보냄 등)로 낡은 스냅샷이 남는 시간의 상한이다.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Optional
+
+from Merge_app.config import settings
+from Merge_app.db.ranking import fetch_top
+from Merge_app.db.session import async_session
+from common.jsonutil import dumps
+from Merge_app.leaderboard import leaderboard_index
+from Merge_app.realtime import broadcaster
+
+METRICS = {"time": "clear_time_ms", "prompt": "prompt_length"}
+
+_Key = tuple[int, str]      # (stage_id, metric)
+
+
+class _Snapshot:
+    __slots__ = ("entries", "users", "loaded_at", "bodies")
+
+    def __init__(self, entries: list[dict]):
+        self.entries = entries
+        self.users = {e["user_id"] for e in entries}
+        self.loaded_at = time.monotonic()
+        self.bodies: dict[int, tuple[str, bytes]] = {}      # limit → (etag, body)
+
+
+class LeaderboardCache:
+    def __init__(self, max_limit: int = 100, ttl_s: float = 60):
+        self.max_limit = max_limit
+        self.ttl_s = ttl_s
+        self._snapshots: dict[_Key, _Snapshot] = {}
+        self._versions: dict[_Key, int] = {}                # 무효화마다 +1 (읽는 중 무효화 감지)
+        self._loading: dict[_Key, asyncio.Future] = {}
+
+        # 통계
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.skipped_events = 0
+
+    async def _load(self, stage_id: int, metric: str) -> list[dict]:
+        if settings.leaderboard_index and leaderboard_index.warmed:
+            return leaderboard_index.top(stage_id, metric, self.max_limit)
+        async with async_session() as s:
+            return await fetch_top(s, stage_id, metric, self.max_limit)
+
+    async def _snapshot(self, stage_id: int, metric: str) -> _Snapshot:
+        key = (stage_id, metric)
+        snap = self._snapshots.get(key)
+        if snap is not None and (not self.ttl_s or time.monotonic() - snap.loaded_at < self.ttl_s):
+            self.hits += 1
+            return snap
+        self.misses += 1
+
+        # 같은 키의 동시 미스는 한 번만 읽는다
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._loading[key] = fut
+        version = self._versions.get(key, 0)
+        try:
+            snap = _Snapshot(await self._load(stage_id, metric))
+            self.loads += 1
+            # 읽는 동안 무효화됐으면 이번 응답에는 쓰되 저장하지 않는다
+            if self._versions.get(key, 0) == version:
+                self._snapshots[key] = snap
+            fut.set_result(snap)
+            return snap
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()     # 기다리는 쪽이 없어도 경고가 남지 않게
+            raise
+        finally:
+            del self._loading[key]
+
+    async def get(self, stage_id: int, stage_code: str, metric: str, limit: int) -> tuple[str, bytes]:
+        """(ETag, JSON 본문)."""
+        snap = await self._snapshot(stage_id, metric)
+        cached = snap.bodies.get(limit)
+        if cached is None:
+            body = dumps({
+                "stage_code": stage_code,
+                "metric": metric,
+                "limit": limit,
+                "entries": snap.entries[:limit],
+            })
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            cached = snap.bodies[limit] = (etag, body)
+        return cached
+
+    def invalidate(self, stage_id: int, metric: str):
+        key = (stage_id, metric)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        if self._snapshots.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def _may_enter(self, snap: _Snapshot, metric: str, user_id: str, value: Optional[int]) -> bool:
+        if user_id in snap.users or len(snap.entries) < self.max_limit:
+            return True
+        last = snap.entries[-1][METRICS[metric]]
+        return value is not None and last is not None and value <= last
+
+    def on_event(self, msg: dict, data: str):
+        """broadcaster 리스너: 새 최고 기록이 Top N 을 바꿀 수 있는 스테이지/지표만 지운다."""
+        kind = msg.get("type")
+        if kind == "profile":
+            self.on_profile_image(msg.get("user_id"))
+            return
+        if kind != "best":
+            return
+        stage_id = msg.get("stage_id")
+        for metric, field in METRICS.items():
+            key = (stage_id, metric)
+            if key in self._loading:
+                # 읽는 중인 스냅샷은 이 기록 전 상태일 수 있으니 저장하지 않게 한다
+                self._versions[key] = self._versions.get(key, 0) + 1
+            snap = self._snapshots.get(key)
+            if snap is None:
+                continue
+            if self._may_enter(snap, metric, msg.get("user_id"), msg.get(field)):
+                self.invalidate(stage_id, metric)
+            else:
+                self.skipped_events += 1
+
+    def on_profile_image(self, user_id: str):
+        """프로필 변경: 그 유저가 든 스냅샷만 지운다."""
+        for (stage_id, metric), snap in list(self._snapshots.items()):
+            if user_id in snap.users:
+                self.invalidate(stage_id, metric)
+
+    def on_gap(self):
+        """broadcaster gap 리스너: 놓친 이벤트가 있을 수 있으니 읽는 중인 것까지 전부 버린다."""
+        for key in set(self._snapshots) | set(self._loading):
+            self.invalidate(*key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "snapshots": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "skipped_events": self.skipped_events,
+        }
+
+
+leaderboard_cache = LeaderboardCache(
+    max_limit=settings.leaderboard_cache_limit,
+    ttl_s=settings.leaderboard_cache_ttl_s,
+)
+broadcaster.add_listener(leaderboard_cache.on_event)
+broadcaster.add_gap_listener(leaderboard_cache.on_gap)
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Optional
+
+
+class InferenceQueueFull(RuntimeError):
+    """대기열이 가득 차 요청을 더 받을 수 없을 때."""
+
+
+class SchedulerClosed(RuntimeError):
+    """스케줄러가 닫혀 대기 중이던 요청을 처리하지 못했을 때."""
+
+
+def _fail(entries, exc: BaseException):
+    for _, fut in entries:
+        if not fut.done():
+            fut.set_exception(exc)
+
+
+class _Alone:
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+
+
+class BatchScheduler:
+    """동시에 들어온 요청을 최대 max_wait_ms / max_batch_size 만큼 모아
+    run_batch 한 번으로 처리하고, 각 호출자에게 자기 결과를 돌려준다.
+
+    run_batch 는 요청 리스트를 받아 같은 순서의 결과 리스트를 반환해야 한다.
+    executor 를 주면 run_batch 는 그 executor 에서 돌고, 이벤트 루프는
+    결과 future 만 기다린다. max_queue 를 넘는 대기 요청은 InferenceQueueFull.
+    묶을 수 없는 작업(스트리밍 생성)은 submit_alone 으로 같은 대기열에 넣는다.
+    같은 상한을 받고, 차례가 오면 배치 대신 혼자 돈다.
+    """
+    def __init__(
+        self,
+        run_batch: Callable[[list[Any]], list[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10,
+        executor: Optional[Executor] = None,
+        max_queue: int = 0,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self.max_queue = max(0, max_queue)     # 0 = 무제한
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._held: Optional[tuple[Any, asyncio.Future]] = None    # 배치를 모으다 꺼낸 단독 작업
+
+        # 통계
+        self.batches = 0
+        self.requests = 0
+        self.alone = 0
+        self.rejected = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+
+    def _ensure_started(self):
+        # 이벤트 루프 안에서 처음 호출될 때 워커 태스크를 띄운다
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._held = None
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def _enqueue(self, item: Any) -> asyncio.Future:
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, fut))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise InferenceQueueFull(f"inference queue full ({self.max_queue})")
+        return fut
+
+    async def submit(self, item: Any) -> Any:
+        return await self._enqueue(item)
+
+    def submit_alone(self, fn: Callable[[], Any]) -> asyncio.Future:
+        """fn() 을 배치로 묶지 않고 혼자 (executor 에서) 돌린다. 결과 future 를 바로 돌려준다.
+
+        대기열이 가득 차면 여기서 InferenceQueueFull. 차례가 오기 전에 future 를 취소하면 돌리지 않는다.
+        """
+        return self._enqueue(_Alone(fn))
+
+    async def _collect(self) -> list[tuple[Any, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        first, self._held = self._held or await self._queue.get(), None
+        batch = [first]
+        deadline = loop.time() + self.max_wait
+
+        while not isinstance(first[0], _Alone) and len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if isinstance(entry[0], _Alone):
+                self._held = entry      # 다음 차례에 혼자 돈다
+                break
+            batch.append(entry)
+
+        # 기다리다 취소된 요청은 모델에 넣지 않는다
+        return [(item, fut) for item, fut in batch if not fut.done()]
+
+    async def _call(self, fn: Callable, *args) -> Any:
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _loop(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            # 어떤 경로로 빠져나가든 이 배치의 future 는 모두 끝나 있어야 한다 (호출자가 영원히 기다리지 않게)
+            try:
+                await self._run(batch)
+            except Exception as e:
+                _fail(batch, e)
+            except BaseException:
+                _fail(batch, SchedulerClosed("inference scheduler stopped"))
+                raise
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future]]):
+        if isinstance(batch[0][0], _Alone):
+            (alone, fut), = batch
+            res = await self._call(alone.fn)
+            self.alone += 1
+            if not fut.done():
+                fut.set_result(res)
+            return
+
+        started = time.perf_counter()
+        results = await self._call(self.run_batch, [item for item, _ in batch])
+        # 결과 수가 요청 수와 다르면 하나도 채우지 않고 배치 전체를 실패시킨다
+        done = list(zip(batch, results, strict=True))
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.last_batch_size = len(batch)
+        self.last_batch_ms = (time.perf_counter() - started) * 1000.0
+
+        for (_, fut), res in done:
+            if not fut.done():
+                fut.set_result(res)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 아직 차례가 오지 않은 요청도 실패로 끝낸다
+        pending = [self._held] if self._held is not None else []
+        self._held = None
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        _fail(pending, SchedulerClosed("inference scheduler closed"))
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "alone": self.alone,
+            "rejected": self.rejected,
+            "queue_depth": (self._queue.qsize() if self._queue is not None else 0) + (self._held is not None),
+            "max_queue": self.max_queue,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+        }
@@ -0,0 +1,129 @@
+"""LLM 경로 벤치마크.
+
+GPU 없이 측정하려면 소형 CPU 모델을 지정한다:
+    llm_model_id=sshleifer/tiny-gpt2 llm_device=cpu llm_dtype=float32 llm_max_new_tokens=32 \
+        python -m Merge_app.llm.bench batch
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from Merge_app.llm.batcher import BatchScheduler
+from Merge_app.llm import generator
+from Merge_app.llm.generator import PromptRequest, generate_action, generate_batch
+
+PROMPTS = [
+    "오른쪽으로 세칸 가",
+    "우로 삼보 후 줍기해.",
+    "왼쪽으로 세칸 가고 주운다음에 뒤로 두칸 가고 내려놓아",
+    "아래로 세칸 가고 부품을 주워",
+    "앞이 낭떠러지면 뒤로 두칸가고 그렇지 않으면 오른쪽으로 세칸 가",
+]
+
+
+def _pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def _run_batch_point(clients: int, max_batch_size: int, max_wait_ms: float) -> dict:
+    scheduler = BatchScheduler(generate_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    latencies: list[float] = []
+
+    async def one(i: int):
+        req = PromptRequest(userId=f"bench{i}", prompt=PROMPTS[i % len(PROMPTS)])
+        t0 = time.perf_counter()
+        await scheduler.submit(req)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    await scheduler.close()
+
+    return {
+        "max_batch_size": max_batch_size,
+        "req_per_s": round(clients / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p99_ms": round(_pct(latencies, 0.99), 1),
+        "avg_batch": scheduler.stats()["avg_batch_size"],
+    }
+
+
+def bench_batch(args):
+    """동시 요청 수는 고정하고 max_batch_size 를 바꿔 가며 처리량/지연 곡선을 그린다."""
+    for size in args.sizes:
+        point = asyncio.run(_run_batch_point(args.clients, size, args.max_wait_ms))
+        print(point)
+
+
+def bench_ttft(args):
+    """SYSTEM_PROMPT 프리픽스 캐시 유무에 따른 time-to-first-token (새 토큰 1개 생성 시간)."""
+    if generator.prefix_cache is None:
+        raise SystemExit("llm_prefix_cache=False 로 로드됨 - 비교하려면 켜고 실행")
+
+    print(f"prefix tokens: {len(generator.prefix_ids)}")
+    for size in args.sizes:
+        reqs = [PromptRequest(userId="bench", prompt=PROMPTS[i % len(PROMPTS)]) for i in range(size)]
+        for use_cache in (False, True):
+            generate_batch(reqs, use_prefix_cache=use_cache, max_new_tokens=1)     # warm-up
+            samples = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                generate_batch(reqs, use_prefix_cache=use_cache, max_new_tokens=1)
+                samples.append((time.perf_counter() - t0) * 1000.0)
+            print({
+                "batch": size,
+                "prefix_cache": use_cache,
+                "ttft_p50_ms": round(statistics.median(samples), 2),
+                "ttft_min_ms": round(min(samples), 2),
+            })
+
+
+def bench_cache(args):
+    """같은 명령을 반복했을 때 첫 요청(모델)과 캐시 적중 요청의 지연 비교."""
+    async def run():
+        for prompt in PROMPTS:
+            req = PromptRequest(userId="bench", prompt=prompt)
+            t0 = time.perf_counter()
+            await generate_action(req)
+            miss_ms = (time.perf_counter() - t0) * 1000.0
+
+            samples = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                await generate_action(PromptRequest(userId="bench", prompt=f" {prompt}!"))
+                samples.append((time.perf_counter() - t0) * 1e6)
+            print({"prompt": prompt, "miss_ms": round(miss_ms, 1), "hit_p50_us": round(statistics.median(samples), 1)})
+        print(generator.response_cache.stats())
+        await generator.close_generator()
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("batch", help="배치 크기별 처리량/지연")
+    p.add_argument("--clients", type=int, default=30)
+    p.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    p.add_argument("--max-wait-ms", type=float, default=10)
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("ttft", help="프리픽스 KV-cache 유무별 TTFT")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1, 8])
+    p.add_argument("--repeat", type=int, default=10)
+    p.set_defaults(func=bench_ttft)
+
+    p = sub.add_parser("cache", help="응답 캐시 적중 지연")
+    p.add_argument("--repeat", type=int, default=1000)
+    p.set_defaults(func=bench_cache)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""LLM 을 거치지 않는 규칙 기반 한국어 명령 파서.
+
+"오른쪽으로 3칸가", "부품을 주워" 처럼 SYSTEM_PROMPT 의 함수표에 그대로
+대응하는 명령만 처리한다. 문장의 모든 부분을 설명할 수 있을 때(확신)만
+제어 코드를 돌려주고, 애매하면 None 을 돌려 모델에 맡긴다.
+"""
+import re
+from typing import Optional
+
+# 방향 → (이동 함수, search 번호). 긴 표현이 먼저 매칭되도록 정렬해서 쓴다.
+_DIRECTIONS = {
+    "f": (1, ["앞", "아래", "전방", "앞쪽", "아래쪽", "아랫방향", "아래방향", "하단"]),
+    "b": (2, ["뒤", "위", "후방", "뒤쪽", "위쪽", "윗방향", "위방향", "상단"]),
+    "l": (3, ["왼쪽", "왼방향", "왼 방향", "좌방향", "좌 방향", "좌측", "좌"]),
+    "r": (4, ["오른쪽", "오른방향", "오른 방향", "우방향", "우 방향", "우측", "우"]),
+}
+_DIR_OF = {word: d for d, (_, words) in _DIRECTIONS.items() for word in words}
+_DIR_RE = "|".join(sorted(map(re.escape, _DIR_OF), key=len, reverse=True))
+
+_NUMERALS = {
+    "한": 1, "하나": 1, "일": 1,
+    "두": 2, "둘": 2, "이": 2,
+    "세": 3, "셋": 3, "삼": 3,
+    "네": 4, "넷": 4, "사": 4,
+    "다섯": 5, "오": 5,
+    "여섯": 6, "육": 6,
+    "일곱": 7, "칠": 7,
+    "여덟": 8, "팔": 8,
+    "아홉": 9, "구": 9,
+    "열": 10, "십": 10,
+}
+_NUM_RE = r"\d{1,2}|" + "|".join(sorted(_NUMERALS, key=len, reverse=True))
+
+_MOVE_RE = re.compile(
+    rf"(?P<dir>{_DIR_RE})\s*(?:으로|로)\s*(?P<num>{_NUM_RE})\s*(?:칸|번|보|걸음)"
+)
+_PICK_RE = re.compile(r"(?:부품을\s*)?(?:바닥에\s*있는\s*(?:걸|것을|거를|것)\s*)?(?:줍기|주워|주운|줍고|줍|들기|들어)")
+_DROP_RE = re.compile(r"(?:부품을\s*)?(?:바닥에\s*)?(?:내려\s*놓|내려놔|내리기|내려|놓기|놓아|놓고)")
+
+# 동작 사이를 잇는 말/어미. 동작을 모두 걷어낸 뒤 이것만 남아야 확신한다.
+_FILLER_RE = re.compile(
+    r"\s+|[.,!?~]|그리고|한\s*다음에?|간\s*다음에?|은\s*다음에?|다음에?|후에?|뒤에|"
+    r"이동하고|이동한|이동해|이동|움직이고|움직여|움직인|가고|간|가|"
+    r"실행하고|실행한|실행해|실행|하고|한|해라|해|하기|를|을|서|고|아|라|줘"
+)
+
+_COND_RE = re.compile(
+    rf"^\s*(?P<dir>{_DIR_RE})\s*(?:쪽)?(?:이|가)?\s*(?:절벽|낭떠러지)\s*(?:이)?면\s*"
+    r"(?P<then>.+?)\s*,?\s*(?:그렇지\s*않으면|그게\s*아니면|그것이\s*아니면|아니면)\s*(?P<else>.+?)\s*$"
+)
+
+
+def _number(word: str) -> Optional[int]:
+    if word.isdigit():
+        n = int(word)
+        return n if n > 0 else None
+    return _NUMERALS.get(word)
+
+
+def _parse_actions(text: str) -> Optional[list[str]]:
+    """동작 나열("...가고 주운 다음 ...") → 제어 코드 줄 목록. 확신이 없으면 None."""
+    found: list[tuple[int, int, str]] = []
+
+    for m in _MOVE_RE.finditer(text):
+        n = _number(m.group("num"))
+        if n is None:
+            return None
+        found.append((m.start(), m.end(), f"{_DIR_OF[m.group('dir')]}_move({n})"))
+
+    taken = [(s, e) for s, e, _ in found]
+    def free(m: re.Match) -> bool:
+        return all(m.end() <= s or m.start() >= e for s, e in taken)
+
+    for regex, code in ((_PICK_RE, "pick()"), (_DROP_RE, "drop()")):
+        for m in regex.finditer(text):
+            if free(m):
+                found.append((m.start(), m.end(), code))
+                taken.append((m.start(), m.end()))
+
+    if not found:
+        return None
+
+    found.sort()
+    rest, pos = [], 0
+    for s, e, _ in found:
+        rest.append(text[pos:s])
+        pos = e
+    rest.append(text[pos:])
+
+    if _FILLER_RE.sub("", "".join(rest)):
+        return None
+    return [code for _, _, code in found]
+
+
+def parse_command(prompt: str) -> Optional[str]:
+    """확신할 수 있으면 제어 코드를, 아니면 None 을 돌려준다."""
+    text = prompt.strip()
+    if not text:
+        return None
+
+    m = _COND_RE.match(text)
+    if m:
+        then_ = _parse_actions(m.group("then"))
+        else_ = _parse_actions(m.group("else"))
+        if then_ is None or else_ is None:
+            return None
+        k = _DIRECTIONS[_DIR_OF[m.group("dir")]][0]
+        return "\n".join([f"if(search({k})==1){{", *then_, "}", "else{", *else_, "}"])
+
+    if any(word in text for word in ("절벽", "낭떠러지", "만약", "아니면")):
+        return None
+
+    actions = _parse_actions(text)
+    return "\n".join(actions) if actions else None
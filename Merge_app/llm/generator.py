@@ -1,8 +1,19 @@
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, LogitsProcessorList, TextStreamer
 from pydantic import BaseModel
-from typing import Optional
+from typing import AsyncIterator, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import copy
+import hashlib
+import re
+import unicodedata
+
+from Merge_app.cache import LRUCache
+from Merge_app.config import settings
+from Merge_app.llm.batcher import BatchScheduler, InferenceQueueFull
+from Merge_app.llm.fastpath import parse_command
+from Merge_app.llm.grammar import ControlCodeLogitsProcessor
 
 
 # ── 요청/응답 스키마 ───────────────────────────────────
@@ -10,6 +21,7 @@ class PromptRequest(BaseModel):
     userId: str
     stageId: Optional[str] = None
     prompt: str
+    stream: bool = False      # WebSocket 에서 줄 단위 스트리밍을 받을지
 
 
 class ActionResponse(BaseModel):
@@ -18,15 +30,28 @@ class ActionResponse(BaseModel):
     error: Optional[str] = None  # 오류 메시지
 
 
-model_id = 'Bllossom/llama-3.2-Korean-Bllossom-3B'
+model_id = settings.llm_model_id
 
 tokenizer = AutoTokenizer.from_pretrained(model_id)
+tokenizer.padding_side = "left"         # 배치 생성은 왼쪽 패딩이어야 한다
+if tokenizer.pad_token is None:
+    tokenizer.pad_token = tokenizer.eos_token
+
 model = AutoModelForCausalLM.from_pretrained(
     model_id,
-    torch_dtype=torch.bfloat16,
-    device_map="cuda",
+    torch_dtype=getattr(torch, settings.llm_dtype),
+    device_map=settings.llm_device,
 )
 
+# 소형 테스트 모델에는 Llama-3 전용 토큰이 없을 수 있다
+terminators = [
+    tid for tid in (
+        tokenizer.convert_tokens_to_ids("<|end_of_text|>"),
+        tokenizer.convert_tokens_to_ids("<|eot_id|>"),
+    )
+    if tid is not None and tid != tokenizer.unk_token_id
+] or [tokenizer.eos_token_id]
+
 SYSTEM_PROMPT = (
     "너는 사용자의 명령을 제어 코드로 바꾸는 AI다.\n"
     "반드시 아래 이동 함수, 부품 조작 함수, 감지 함수만 사용하고 코드만 출력한다. 설명, 따옴표, 주석 금지.\n"
@@ -96,31 +121,96 @@ SYSTEM_PROMPT = (
     "[예시 종료]\n"
 )
 
-async def generate_action(req: PromptRequest) -> ActionResponse:
-    try:
-        messages = [
-            { "role": "system", "content": SYSTEM_PROMPT},
-            { "role": "user",   "content": req.prompt}
-        ]
+# 프롬프트가 바뀌면 캐시 키도 바뀌도록 내용 해시를 버전으로 쓴다
+SYSTEM_PROMPT_VERSION = hashlib.sha1(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
 
-        input_ids = tokenizer.apply_chat_template(
-            messages,
-            add_generation_prompt=True,
-            return_tensors="pt"
-        ).to(model.device)
+def build_input_ids(prompt: str) -> list[int]:
+    messages = [
+        { "role": "system", "content": SYSTEM_PROMPT},
+        { "role": "user",   "content": prompt}
+    ]
 
-        terminators = [
-            tokenizer.convert_tokens_to_ids("<|end_of_text|>"),
-            tokenizer.convert_tokens_to_ids("<|eot_id|>")
-        ]
+    if tokenizer.chat_template is None:
+        # 채팅 템플릿이 없는 (CPU 측정용) 소형 모델
+        text = f"{SYSTEM_PROMPT}\n입력: {prompt}\n출력:\n"
+        return tokenizer(text)["input_ids"]
+
+    return tokenizer.apply_chat_template(
+        messages,
+        add_generation_prompt=True,
+    )
+
+# ── SYSTEM_PROMPT 프리픽스 KV-cache ──────────────────
+# 규칙/예시 부분은 모든 요청에서 동일하므로 모델 로드 시 한 번만 prefill 하고,
+# 요청마다 그 past_key_values 를 복사해 사용자 명령 부분만 prefill 한다.
+def _system_prefix_ids() -> list[int]:
+    # 서로 다른 두 명령의 공통 접두 토큰 = 템플릿 + SYSTEM_PROMPT 부분.
+    # 경계 토큰이 사용자 입력과 합쳐질 수 있으므로 마지막 토큰 하나는 빼 둔다.
+    a, b = build_input_ids("가"), build_input_ids("나")
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    return a[:max(0, n - 1)]
+
+@torch.no_grad()
+def _build_prefix_cache(ids: list[int]):
+    if not ids:
+        return None
+    out = model(torch.tensor([ids], device=model.device), use_cache=True)
+    return out.past_key_values
+
+prefix_ids = _system_prefix_ids()
+prefix_cache = _build_prefix_cache(prefix_ids) if settings.llm_prefix_cache else None
+
+def _prefix_cache_for(batch_size: int):
+    # generate 가 캐시를 덮어쓰므로 요청마다 복사본을 배치 크기만큼 늘려 쓴다
+    cache = copy.deepcopy(prefix_cache)
+    if batch_size > 1:
+        cache.batch_repeat_interleave(batch_size)
+    return cache
+
+def _prepare_batch(reqs: list[PromptRequest], use_prefix_cache: bool) -> dict:
+    ids = [build_input_ids(r.prompt) for r in reqs]
+    n = len(prefix_ids)
 
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
+    if not (use_prefix_cache and prefix_cache is not None and all(i[:n] == prefix_ids for i in ids)):
+        return dict(tokenizer.pad({"input_ids": ids}, padding=True, return_tensors="pt").to(model.device))
+
+    # [공통 프리픽스][패딩][사용자 부분] : 캐시된 프리픽스 뒤쪽에서 왼쪽 패딩한다.
+    # position_ids 는 attention_mask 누적합으로 계산되므로 패딩이 가운데 있어도 맞다.
+    suffixes = [i[n:] for i in ids]
+    width = max(len(x) for x in suffixes)
+    pad = tokenizer.pad_token_id
+    input_ids = [prefix_ids + [pad] * (width - len(x)) + x for x in suffixes]
+    attention = [[1] * n + [0] * (width - len(x)) + [1] * len(x) for x in suffixes]
+    return {
+        "input_ids": torch.tensor(input_ids, device=model.device),
+        "attention_mask": torch.tensor(attention, device=model.device),
+        "past_key_values": _prefix_cache_for(len(reqs)),
+    }
+
+def generate_batch(
+    reqs: list[PromptRequest],
+    use_prefix_cache: bool = settings.llm_prefix_cache,
+    max_new_tokens: int = settings.llm_max_new_tokens,
+    constrained: bool = settings.llm_constrained,
+    streamer: Optional[TextStreamer] = None,
+) -> list[ActionResponse]:
+    """여러 요청을 왼쪽 패딩으로 묶어 한 번의 model.generate 로 처리한다 (블로킹).
+    streamer 는 요청이 하나일 때만 쓸 수 있다."""
+    try:
+        batch = _prepare_batch(reqs, use_prefix_cache)
+
+        # 제약 디코딩: 제어 코드 문법 밖의 토큰은 가리고, 프로그램이 끝나면 바로 EOS
+        processors = LogitsProcessorList()
+        if constrained:
+            processors.append(ControlCodeLogitsProcessor(tokenizer, terminators))
 
         outputs = model.generate(
-            input_ids,
-            attention_mask=(input_ids != tokenizer.pad_token_id),  # 마스크 지정
-            max_new_tokens=768,
+            **batch,                                               # input_ids + attention_mask (+ 프리픽스 캐시)
+            logits_processor=processors,
+            streamer=streamer,
+            max_new_tokens=max_new_tokens,
             eos_token_id=terminators,
             pad_token_id=tokenizer.pad_token_id,                   # pad_token_id 명시
             do_sample=True,
@@ -128,65 +218,159 @@ async def generate_action(req: PromptRequest) -> ActionResponse:
             top_p=1.0
         )
 
-        generated = tokenizer.decode(
-            outputs[0][input_ids.shape[-1]:],
-            skip_special_tokens=True
-        ).strip()
-
-        return ActionResponse(
-            code=generated,
-            promptLen=len(req.prompt)
-        )
+        width = batch["input_ids"].shape[-1]
+        return [
+            ActionResponse(
+                code=tokenizer.decode(out[width:], skip_special_tokens=True).strip(),
+                promptLen=len(r.prompt)
+            )
+            for r, out in zip(reqs, outputs)
+        ]
 
     except Exception as e:
-        return ActionResponse(
-            code="",
-            promptLen=len(req.prompt),
-            error=str(e)
-        )
+        return [
+            ActionResponse(code="", promptLen=len(r.prompt), error=str(e))
+            for r in reqs
+        ]
+
+# 토크나이즈/generate/decode 는 전부 이 전용 스레드에서 돈다.
+# torch 연산은 GIL 을 놓기 때문에 그동안 이벤트 루프(DB, /chart)는 계속 돈다.
+inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-infer")
+
+batcher = BatchScheduler(
+    generate_batch,
+    max_batch_size=settings.llm_max_batch_size,
+    max_wait_ms=settings.llm_max_wait_ms,
+    executor=inference_executor,
+    max_queue=settings.llm_queue_size,
+)
+
+# ── 응답 캐시 ───────────────────────────────────────
+# temperature=0.1 이라 같은 명령이면 사실상 같은 코드가 나온다.
+# 값은 생성된 code 문자열만 저장하고 promptLen 은 요청마다 다시 계산한다.
+response_cache = LRUCache(
+    max_entries=settings.llm_cache_entries,
+    max_bytes=settings.llm_cache_bytes,
+    ttl_s=settings.llm_cache_ttl_s,
+    sizeof=lambda code: len(code.encode("utf-8")),
+)
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    text = unicodedata.normalize("NFC", prompt).lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+def cache_key(prompt: str) -> tuple[str, str]:
+    return (SYSTEM_PROMPT_VERSION, normalize_prompt(prompt))
+
+# 규칙 기반 파서로 처리한 비율
+fastpath_counts = {"requests": 0, "served": 0}
+
+def fastpath_stats() -> dict:
+    total = fastpath_counts["requests"]
+    return {
+        **fastpath_counts,
+        "ratio": round(fastpath_counts["served"] / total, 4) if total else 0.0,
+    }
+
+def _quick_answer(req: PromptRequest) -> Optional[ActionResponse]:
+    """모델 없이 답할 수 있으면(규칙 파서, 응답 캐시) 바로 돌려준다."""
+    if settings.llm_fastpath:
+        fastpath_counts["requests"] += 1
+        code = parse_command(req.prompt)
+        if code is not None:
+            fastpath_counts["served"] += 1
+            return ActionResponse(code=code, promptLen=len(req.prompt))
+
+    code = response_cache.get(cache_key(req.prompt))
+    if code is not None:
+        return ActionResponse(code=code, promptLen=len(req.prompt))
+    return None
+
+def _remember(req: PromptRequest, res: ActionResponse):
+    if not res.error and res.code:
+        response_cache.put(cache_key(req.prompt), res.code)
+
+async def generate_action(req: PromptRequest) -> ActionResponse:
+    res = _quick_answer(req)
+    if res is not None:
+        return res
+
+    res = await batcher.submit(req)
+    _remember(req, res)
+    return res
+
+# ── 스트리밍 ────────────────────────────────────────
+class _LineStreamer(TextStreamer):
+    """추론 스레드에서 디코딩된 텍스트를 받아, 줄이 완성될 때마다
+    이벤트 루프의 asyncio.Queue 로 넘긴다 (TextIteratorStreamer 의 async 판)."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue = queue
+        self.pending = ""
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        self.pending += text
+        *lines, self.pending = self.pending.split("\n")
+        if stream_end:
+            lines.append(self.pending)
+            self.pending = ""
+        for line in lines:
+            if line.strip():
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, line.strip())
+
+async def stream_action(req: PromptRequest) -> AsyncIterator[Union[str, ActionResponse]]:
+    """완성된 제어 코드 줄(str)을 하나씩 내보내고, 마지막에 전체 ActionResponse 를 내보낸다."""
+    res = _quick_answer(req)
+    if res is None:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        streamer = _LineStreamer(loop, queue)
+
+        # 스트리밍도 배치 요청과 같은 대기열(llm_queue_size)에 들어간다. 가득 차면 InferenceQueueFull.
+        # 차례가 오면 배치로 묶지 않고 같은 추론 스레드에서 단건으로 돈다
+        fut = batcher.submit_alone(lambda: generate_batch([req], streamer=streamer)[0])
+        fut.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (line := await queue.get()) is not None:
+                yield line
+            res = await fut
+        finally:
+            fut.cancel()        # 끝까지 읽지 않고 나갔으면 아직 차례가 오지 않은 생성은 돌리지 않는다
+
+        _remember(req, res)
+    else:
+        for line in res.code.splitlines():
+            if line.strip():
+                yield line.strip()
+
+    yield res
+
+async def close_generator():
+    await batcher.close()
+    inference_executor.shutdown(wait=False, cancel_futures=True)
     
 if __name__=="__main__":
-    promptTest = [
-                 ("오른쪽으로 세칸 가", 1),
-                 ("오른쪽으로 세칸가", 1),
-                 ("오른쪽으로 3칸가", 1),
-                 ("오른쪽으로 세칸가고 부품을 주워", 2),
-                 ("오른 방향으로 세번 이동하고 바닥에 있는걸 주워", 2),
-                 ("우방향으로 세칸간 다음에 줍기를 실행해", 2),
-                 ("우로 삼보 이동한 다음에 주워", 2),
-                 ("우로 삼보 후 줍기해.", 2),
-                 ("왼쪽으로 세칸 가고 주운다음에 뒤로 두칸 가고 내려놓아", 3),
-                 ("왼쪽으로 세번 이동하고 줍기를 실행한 다음, 위로 두칸 가고 바닥에 내려놓아", 3),
-                 ("왼쪽으로 세칸 이동하고 부품을 주운 다음, 위로 두번 이동하고 부품을 내려놓아", 3),
-                 ("아래로 세칸 가고 부품을 주워", 4),
-                 ("아래방향으로 세번 이동하고 바닥에 있는 것을 주워", 4),
-                 ("앞으로 세번 가고 줍기를 해", 4),
-                 ("아래가 절벽이면 위로 두번 이동하고 그게 아니면 오른쪽으로 세번 이동해", 5),
-                 ("앞이 낭떠러지면 뒤로 두칸가고 그렇지 않으면 오른쪽으로 세칸 가", 5),
-                 ("아래가 낭떠러지면 뒤로 두칸가고 그렇지 않으면 우방향으로 세번 가", 5),
-                 ]
-    
-    ans = {
-        1 : "r_move(3)",
-        2 : "r_move(3)\npick()",
-        3 : "l_move(3)\npick()\nb_move(2)\ndrop()",
-        4 : "f_move(3)\npick()",
-        5 : "if(search(1)==1){\nb_move(2)\n}\nelse{\nr_move(3)\n}"
-    }
+    from Merge_app.llm.prompt_cases import ANSWERS, PROMPT_TESTS
 
     async def main():
         cnt = 0
 
-        for p in promptTest:
+        for p in PROMPT_TESTS:
             pr = PromptRequest(userId="user", stageId="1", prompt=p[0])
             ac = await generate_action(pr)
-            if(p[1] not in ans or ans[p[1]] != ac.code):
+            if(p[1] not in ANSWERS or ANSWERS[p[1]] != ac.code):
                 print("=================================")
                 print(f"{p[0]} ->")
                 print(ac.code)
                 print("=================================")
                 cnt += 1
 
-        print(f"Accuracy : {(len(promptTest) - cnt) / len(promptTest):.2f}")
+        print(f"Accuracy : {(len(PROMPT_TESTS) - cnt) / len(PROMPT_TESTS):.2f}")
+        print(f"Fast path : {fastpath_stats()['ratio']:.2f}")
 
     asyncio.run(main())
@@ -0,0 +1,212 @@
+"""제어 코드 언어 문법과 그 문법으로 디코딩을 제한하는 LogitsProcessor.
+
+언어:
+    f_move(N) / b_move(N) / l_move(N) / r_move(N)     (N = 1..99)
+    pick() / drop()
+    if(search(K)==0|1){ ... }  [else{ ... }]           (K = 1..4, != 도 허용)
+문장 사이에는 줄바꿈이 하나 이상 있어야 한다 (fastpath / SYSTEM_PROMPT 예시처럼 한 줄에 하나).
+들여쓰기 공백은 어디든 올 수 있지만 문장 안에는 공백이 들어갈 수 없다.
+if / else 블록에는 문장이 하나 이상 있어야 한다.
+
+torch / transformers 는 ControlCodeLogitsProcessor 를 부를 때만 필요하다 (문법 검사만 쓰는 곳은 없어도 된다).
+"""
+from functools import lru_cache
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+try:                        # 선택 의존성: 없으면 문법 검사만
+    import torch
+    from transformers import LogitsProcessor
+except ImportError:
+    torch = None
+    LogitsProcessor = object
+
+MAX_MOVE = 99
+MAX_DEPTH = 2           # if 중첩 허용 깊이
+
+_NEWLINE = "\r\n"
+_WHITESPACE = " \t" + _NEWLINE
+
+
+def _statements() -> dict[str, str]:
+    stmts: dict[str, str] = {}
+    for d in "fblr":
+        for n in range(1, MAX_MOVE + 1):
+            stmts[f"{d}_move({n})"] = "action"
+    stmts["pick()"] = "action"
+    stmts["drop()"] = "action"
+    for k in range(1, 5):
+        for op in ("==", "!="):
+            for v in "01":
+                stmts[f"if(search({k}){op}{v}){{"] = "if"
+    stmts["else{"] = "else"
+    stmts["}"] = "close"
+    return stmts
+
+# 완성된 문장 → 종류. 어떤 문장도 다른 문장의 접두가 아니다.
+STATEMENTS = _statements()
+
+# 문장 접두 → 이어서 완성될 수 있는 문장 종류들
+PREFIXES: dict[str, frozenset[str]] = {}
+for _stmt, _kind in STATEMENTS.items():
+    for _i in range(1, len(_stmt) + 1):
+        PREFIXES[_stmt[:_i]] = PREFIXES.get(_stmt[:_i], frozenset()) | {_kind}
+
+
+class State(NamedTuple):
+    partial: str = ""               # 아직 끝나지 않은 문장
+    stack: tuple[str, ...] = ()     # 열린 블록들 ("if" / "else")
+    can_else: bool = False          # 방금 if 블록이 닫혔는가
+    started: bool = False           # 문장이 하나라도 완성되었는가
+    need_newline: bool = False      # 문장이 끝난 뒤 아직 줄바꿈이 없었는가
+    empty_block: bool = False       # 가장 안쪽 블록이 방금 열려 아직 문장이 없는가
+
+INITIAL = State()
+
+
+def _kind_ok(kind: str, stack: tuple[str, ...], can_else: bool, empty_block: bool) -> bool:
+    if kind == "close":
+        return bool(stack) and not empty_block
+    if kind == "else":
+        return can_else
+    if kind == "if":
+        return len(stack) < MAX_DEPTH
+    return True
+
+
+@lru_cache(maxsize=1 << 16)
+def advance(state: State, text: str) -> Optional[State]:
+    """state 에서 text 를 이어 붙였을 때의 새 상태. 문법상 불가능하면 None."""
+    partial, stack, can_else, started, need_newline, empty_block = state
+    for ch in text:
+        if not partial and ch in _WHITESPACE:
+            if ch in _NEWLINE:
+                need_newline = False
+            continue
+        if need_newline:
+            return None
+        partial += ch
+        # 완성돼도 받을 수 없는 문장의 접두는 바로 막는다 (막다른 길로 들어가 EOS 로 끝나지 않게)
+        if not any(_kind_ok(k, stack, can_else, empty_block) for k in PREFIXES.get(partial, ())):
+            return None
+
+        kind = STATEMENTS.get(partial)
+        if kind is None:
+            continue
+
+        if kind == "close":
+            can_else = stack[-1] == "if"
+            stack = stack[:-1]
+        elif kind == "else":
+            stack = stack + ("else",)
+            can_else = False
+        elif kind == "if":
+            stack = stack + ("if",)
+            can_else = False
+        else:
+            can_else = False
+
+        # 블록을 열면 새 블록이 비고, 그 밖의 문장은 (닫힌 블록 포함) 바깥 블록을 채운다
+        empty_block = kind in ("if", "else")
+        started = True
+        need_newline = True
+        partial = ""
+    return State(partial, stack, can_else, started, need_newline, empty_block)
+
+
+def is_complete(state: State) -> bool:
+    return not state.partial and not state.stack and state.started
+
+
+def is_valid_program(code: str) -> bool:
+    state = advance(INITIAL, code)
+    return state is not None and is_complete(state)
+
+
+class ControlCodeLogitsProcessor(LogitsProcessor):
+    """문법상 이어질 수 없는 토큰을 -inf 로 가린다.
+
+    전체 어휘를 매 스텝 검사하지 않고, 점수 순으로 scan_limit 개까지만 보며
+    유효한 토큰 max_candidates 개를 찾으면 멈춘다 (temperature 0.1 이라 충분).
+    프로그램이 완성된 상태에서 모델이 문법 밖의 토큰을 가장 원하면 바로 EOS 로 끝낸다.
+    완성 전인데 scan_limit 안에 유효한 토큰이 없으면 나머지 어휘를 점수 순으로 더 본다
+    (한 글자 토큰이 있으면 언제나 이어 쓸 수 있다). 그래도 없을 때만 EOS.
+    """
+    def __init__(self, tokenizer, eos_token_ids: list[int], max_candidates: int = 8, scan_limit: int = 2048):
+        self.tokenizer = tokenizer
+        self.eos = frozenset(eos_token_ids)
+        self.max_candidates = max_candidates
+        self.scan_limit = scan_limit
+        self.states: Optional[list[Optional[State]]] = None
+        self._texts: dict[int, str] = {}
+
+    def _text(self, tok: int) -> str:
+        text = self._texts.get(tok)
+        if text is None:
+            text = self.tokenizer.decode([tok], skip_special_tokens=False)
+            self._texts[tok] = text
+        return text
+
+    def _valid(self, state: State, tok: int) -> bool:
+        if tok in self.eos:
+            return is_complete(state)
+        return advance(state, self._text(tok)) is not None
+
+    def begin(self, batch_size: int):
+        """새 generate 의 첫 스텝 (아직 만든 토큰이 없다)."""
+        self.states = [INITIAL] * batch_size
+
+    def step(self, last_tokens: list[int]):
+        """행마다 직전 스텝에서 고른 토큰으로 상태를 넘긴다."""
+        for row, tok in enumerate(last_tokens):
+            state = self.states[row]
+            if state is None:
+                continue
+            # EOS 를 낸 행은 끝. 이후 generate 가 pad 로 채운다.
+            self.states[row] = None if tok in self.eos else advance(state, self._text(tok))
+
+    def _pick(self, state: State, tokens: Iterable[int]) -> list[int]:
+        allowed = []
+        for tok in tokens:
+            if self._valid(state, tok):
+                allowed.append(tok)
+                if len(allowed) >= self.max_candidates:
+                    break
+        return allowed
+
+    def allowed(self, row: int, ranked: list[int], rest: Optional[Iterable[int]] = None) -> Optional[list[int]]:
+        """점수 순 토큰 ranked 중 row 가 낼 수 있는 것 (None 이면 가리지 않음).
+
+        rest 는 ranked 에 유효한 토큰이 없을 때 더 볼 토큰 (기본은 전체 어휘 id 순).
+        """
+        state = self.states[row]
+        if state is None:
+            return None
+        complete = is_complete(state)
+        if complete and not self._valid(state, ranked[0]):
+            return list(self.eos)
+        allowed = self._pick(state, ranked)
+        if not allowed and not complete:
+            # 모델이 원하는 토큰이 모두 문법 밖이어도 프로그램을 중간에 끊지 않는다
+            allowed = self._pick(state, range(len(self.tokenizer)) if rest is None else rest)
+        return allowed or list(self.eos)
+
+    @staticmethod
+    def _beyond(row_scores: "torch.FloatTensor", skip: int) -> Iterator[int]:
+        # scan_limit 밖의 토큰을 점수 순으로 (처음 꺼낼 때만 정렬한다)
+        yield from row_scores.argsort(descending=True)[skip:].tolist()
+
+    def __call__(self, input_ids: "torch.LongTensor", scores: "torch.FloatTensor") -> "torch.FloatTensor":
+        if self.states is None:
+            self.begin(input_ids.shape[0])
+        else:
+            self.step(input_ids[:, -1].tolist())
+
+        mask = torch.full_like(scores, float("-inf"))
+        order = scores.topk(min(self.scan_limit, scores.shape[-1]), dim=-1).indices.tolist()
+        for row, ranked in enumerate(order):
+            allowed = self.allowed(row, ranked, self._beyond(scores[row], len(ranked)))
+            if allowed is None:
+                mask[row] = 0
+            else:
+                mask[row, allowed] = 0
+        return scores + mask
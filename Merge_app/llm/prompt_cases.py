@@ -0,0 +1,32 @@
+"""명령 → 제어 코드 정답 세트 (generator 정확도 측정, fastpath 테스트가 함께 쓴다).
+
+PROMPT_TESTS 는 (명령, ANSWERS 키) 목록이다. 모델 없이 import 할 수 있다.
+"""
+
+PROMPT_TESTS = [
+    ("오른쪽으로 세칸 가", 1),
+    ("오른쪽으로 세칸가", 1),
+    ("오른쪽으로 3칸가", 1),
+    ("오른쪽으로 세칸가고 부품을 주워", 2),
+    ("오른 방향으로 세번 이동하고 바닥에 있는걸 주워", 2),
+    ("우방향으로 세칸간 다음에 줍기를 실행해", 2),
+    ("우로 삼보 이동한 다음에 주워", 2),
+    ("우로 삼보 후 줍기해.", 2),
+    ("왼쪽으로 세칸 가고 주운다음에 뒤로 두칸 가고 내려놓아", 3),
+    ("왼쪽으로 세번 이동하고 줍기를 실행한 다음, 위로 두칸 가고 바닥에 내려놓아", 3),
+    ("왼쪽으로 세칸 이동하고 부품을 주운 다음, 위로 두번 이동하고 부품을 내려놓아", 3),
+    ("아래로 세칸 가고 부품을 주워", 4),
+    ("아래방향으로 세번 이동하고 바닥에 있는 것을 주워", 4),
+    ("앞으로 세번 가고 줍기를 해", 4),
+    ("아래가 절벽이면 위로 두번 이동하고 그게 아니면 오른쪽으로 세번 이동해", 5),
+    ("앞이 낭떠러지면 뒤로 두칸가고 그렇지 않으면 오른쪽으로 세칸 가", 5),
+    ("아래가 낭떠러지면 뒤로 두칸가고 그렇지 않으면 우방향으로 세번 가", 5),
+]
+
+ANSWERS = {
+    1: "r_move(3)",
+    2: "r_move(3)\npick()",
+    3: "l_move(3)\npick()\nb_move(2)\ndrop()",
+    4: "f_move(3)\npick()",
+    5: "if(search(1)==1){\nb_move(2)\n}\nelse{\nr_move(3)\n}",
+}
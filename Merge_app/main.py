@@ -1,8 +1,16 @@
+import asyncio
 from fastapi import FastAPI
 from Merge_app.config import settings
-from Merge_app.db.session import init_db, dispose_db
-from Merge_app.api.chart_ws import chart_router
-from Merge_app.api.rest import rest_router
+from common.jsonutil import ORJSONResponse
+from Merge_app.db.session import init_db, dispose_db, run_log_writer, engine, warm_pool
+from Merge_app.db.partitions import maintenance_loop
+from Merge_app.db.stage_stats import fold_loop
+from Merge_app.api.chart_ws import chart_router, load_recent_run_logs
+from Merge_app.api.rest import rest_router, publish_run_logs
+from Merge_app.api.ai_ws import ai_ws_router
+from Merge_app.llm.generator import close_generator
+from Merge_app.leaderboard import leaderboard_index, rewarm_loop
+from Merge_app.realtime import broadcaster
 from logging.config import dictConfig
 
 dictConfig({
@@ -23,18 +31,46 @@ dictConfig({
 })
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Game API")
+    app = FastAPI(title="Game API", default_response_class=ORJSONResponse)
 
     # 라우터 등록
     app.include_router(rest_router)   # ← REST (/users, /progress/{id}, /clear)
     app.include_router(chart_router)  # (기존) /chart
+    app.include_router(ai_ws_router)  # /ws (AI 명령, 스트리밍 지원)
 
     @app.on_event("startup")
     async def startup():
         await init_db()
+        if settings.db_pool_warm:
+            await warm_pool()
+        await load_recent_run_logs()
+        await broadcaster.start()
+        app.state.leaderboard_task = None
+        if settings.leaderboard_index:
+            # LISTEN 을 시작한 뒤에 읽어야 읽는 동안 다른 워커가 커밋한 기록도 이벤트로 받는다
+            await leaderboard_index.warm()
+            if settings.leaderboard_rewarm_s > 0:
+                app.state.leaderboard_task = asyncio.create_task(
+                    rewarm_loop(leaderboard_index, settings.leaderboard_rewarm_s))
+        run_log_writer.on_flush = publish_run_logs
+        app.state.partition_task = asyncio.create_task(maintenance_loop(
+            engine,
+            ahead=settings.run_log_partitions_ahead,
+            keep_months=settings.run_log_retention_months,
+            mode=settings.run_log_retention_mode,
+            interval_s=settings.run_log_partition_check_s,
+        ))
+        app.state.stage_stats_task = asyncio.create_task(fold_loop(engine, settings.stage_stats_fold_s))
 
     @app.on_event("shutdown")
     async def shutdown():
+        app.state.partition_task.cancel()
+        app.state.stage_stats_task.cancel()
+        if app.state.leaderboard_task is not None:
+            app.state.leaderboard_task.cancel()
+        await close_generator()
+        await run_log_writer.close()    # 남은 run_logs 를 쓰고 알린 뒤 브로드캐스터를 닫는다
+        await broadcaster.stop()
         await dispose_db()
 
     return app
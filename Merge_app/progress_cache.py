@@ -0,0 +1,121 @@
+"""GET /progress/{user_id} 응답(직렬화된 JSON) 캐시.
+
+유저 진행은 그 유저의 /run-logs(+batch) 와 PATCH profile_image 가 성공할 때만 바뀐다.
+그 핸들러가 커밋 후 changed() 를 부르면:
+
+    1) {"type": "progress", "user_id"} 를 broadcaster 로 보낸다
+       → 모든 워커(postgres 백엔드면 다른 워커 포함)의 리스너가 그 유저 항목을 지운다
+    2) 이 프로세스에 캐시돼 있던 유저면 새 내용으로 다시 채운다 (write-through)
+       patch 가 있으면 캐시된 본문을 고쳐 쓰고, 없으면 DB 에서 다시 읽는다
+
+읽는 도중 무효화가 오면 그 결과는 응답에만 쓰고 캐시에 넣지 않는다.
+broadcaster 가 이벤트를 잃었을 수 있다고 알리면(gap) 캐시를 통째로 비운다.
+broadcast_backend=memory 면 다른 워커는 알 수 없으므로 기본은 꺼져 있고, 워커가 여럿(web_concurrency > 1)이면
+postgres 백엔드일 때만 켤 수 있다 (config.Settings 검사). 단일 프로세스는 memory 로도 켤 수 있다.
+"""
+from typing import Callable, Optional
+
+from Merge_app.cache import LRUCache
+from Merge_app.config import settings
+from Merge_app.db.progress import fetch_progress
+from Merge_app.db.session import async_session
+from common.jsonutil import dumps, loads
+from Merge_app.realtime import broadcaster
+
+
+class _Load:
+    __slots__ = ("stale",)
+
+    def __init__(self):
+        self.stale = False
+
+
+class ProgressCache:
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 0):
+        self.cache = LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=len)
+        self._loads: dict[str, list[_Load]] = {}
+
+        # 통계
+        self.invalidations = 0
+        self.write_throughs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.enabled
+
+    async def _load(self, user_id: str) -> Optional[bytes]:
+        load = _Load()
+        self._loads.setdefault(user_id, []).append(load)
+        try:
+            async with async_session() as s:
+                progress = await fetch_progress(s, user_id)
+        finally:
+            loads = self._loads[user_id]
+            loads.remove(load)
+            if not loads:
+                del self._loads[user_id]
+        if progress is None:
+            return None
+        body = dumps(progress)
+        if not load.stale:
+            self.cache.put(user_id, body)
+        return body
+
+    async def get(self, user_id: str) -> Optional[bytes]:
+        """직렬화된 /progress 본문. 유저가 없으면 None (없는 유저는 캐시하지 않는다)."""
+        body = self.cache.get(user_id)
+        if body is not None:
+            return body
+        return await self._load(user_id)
+
+    def invalidate(self, user_id: str):
+        if self.cache.pop(user_id) is not None:
+            self.invalidations += 1
+        for load in self._loads.get(user_id, ()):
+            load.stale = True
+
+    def on_event(self, msg: dict, data: str):
+        """broadcaster 리스너: progress 이벤트만 본다."""
+        if msg.get("type") == "progress":
+            self.invalidate(msg["user_id"])
+
+    def on_gap(self):
+        """broadcaster gap 리스너: 놓친 progress 이벤트가 있을 수 있으니 전부 버린다."""
+        self.invalidations += len(self.cache)
+        self.cache.clear()
+        for loads in self._loads.values():
+            for load in loads:
+                load.stale = True
+
+    async def changed(self, user_id: str, patch: Optional[Callable[[dict], None]] = None, reload: bool = True):
+        """user_id 의 진행이 커밋된 뒤 호출한다."""
+        if not self.enabled:
+            return
+        cached = self.cache.pop(user_id)
+        await broadcaster.publish({"type": "progress", "user_id": user_id})
+        if cached is None:
+            return
+        if patch is not None:
+            payload = loads(cached)
+            patch(payload)
+            self.cache.put(user_id, dumps(payload))
+        elif reload:
+            await self._load(user_id)
+        else:
+            return
+        self.write_throughs += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "invalidations": self.invalidations,
+            "write_throughs": self.write_throughs,
+        }
+
+
+progress_cache = ProgressCache(
+    max_entries=settings.progress_cache_entries,
+    max_bytes=settings.progress_cache_bytes,
+)
+broadcaster.add_listener(progress_cache.on_event)
+broadcaster.add_gap_listener(progress_cache.on_gap)
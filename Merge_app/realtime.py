@@ -1,17 +1,330 @@
 import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Callable
+
+from Merge_app.config import settings
+from common.jsonutil import dumps_str, loads
+
+log = logging.getLogger(__name__)
 
 class Broadcaster:
-    """단일 프로세스용 간단 pub/sub (필요 시 Redis로 대체)."""
-    def __init__(self):
-        self.subscribers: list[asyncio.Queue] = []
+    """단일 프로세스용 간단 pub/sub (필요 시 Redis로 대체).
+
+    publish 는 구독자를 기다리지 않는다. 구독자마다 크기 제한 큐를 두고
+    가득 차면 가장 오래된 메시지를 버리므로(drop-oldest) 느린 /chart 하나가
+    /run-logs 응답을 붙잡지 못한다.
+    이벤트는 fan-out 전에 한 번만 JSON 문자열로 만들고, 구독자 큐에는 그 문자열을 넣는다
+    (구독자 수와 무관하게 이벤트당 직렬화 1 회).
+    이벤트를 잃었을 수 있으면(다른 워커와의 연결이 끊겼다 붙음) gap 리스너를 부른다.
+    이벤트로 상태를 맞추는 쪽(캐시, 리더보드 인덱스)은 거기서 전부 버리거나 다시 읽는다.
+    """
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.subscribers: dict[asyncio.Queue, frozenset[str] | None] = {}     # 큐 → 받을 type (None 이면 전부)
+        self.listeners: list[Callable[[dict, str], None]] = []  # 모든 이벤트를 (dict, JSON 문자열)로 동기로 받는 훅 (캐시 갱신 등)
+        self.gap_listeners: list[Callable[[], None]] = []       # 이벤트 유실 가능성 알림 (인자 없음, 동기)
+
+        # 통계
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.gaps = 0
+        self.last_fanout_us = 0.0
+        self.max_fanout_us = 0.0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
 
     async def publish(self, msg: dict):
-        for q in self.subscribers:
-            await q.put(msg)
+        self._fanout(msg)
+
+    def add_listener(self, fn: Callable[[dict, str], None]):
+        self.listeners.append(fn)
+
+    def add_gap_listener(self, fn: Callable[[], None]):
+        self.gap_listeners.append(fn)
+
+    def _gap(self):
+        self.gaps += 1
+        for fn in self.gap_listeners:
+            try:
+                fn()
+            except Exception:
+                log.exception("[RT] gap listener failed")
+
+    def _fanout(self, msg: dict) -> str:
+        started = time.perf_counter()
+        data = dumps_str(msg)
+        for fn in self.listeners:
+            try:
+                fn(msg, data)
+            except Exception:
+                log.exception("[RT] listener failed")
+        kind = msg.get("type")
+        for q, types in self.subscribers.items():
+            if types is not None and kind not in types:
+                continue
+            if q.full():
+                q.get_nowait()          # 가장 오래된 것 버리기
+                self.dropped += 1
+            q.put_nowait(data)
+            self.delivered += 1
+        self.published += 1
 
-    async def subscribe(self) -> asyncio.Queue:
-        q: asyncio.Queue = asyncio.Queue(maxsize=100)
-        self.subscribers.append(q)
+        self.last_fanout_us = (time.perf_counter() - started) * 1e6
+        self.max_fanout_us = max(self.max_fanout_us, self.last_fanout_us)
+        return data
+
+    async def subscribe(self, types: frozenset[str] | None = None) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers[q] = types
         return q
 
-broadcaster = Broadcaster()
\ No newline at end of file
+    def unsubscribe(self, q: asyncio.Queue):
+        self.subscribers.pop(q, None)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "gaps": self.gaps,
+            "last_fanout_us": round(self.last_fanout_us, 1),
+            "max_fanout_us": round(self.max_fanout_us, 1),
+        }
+
+class PostgresBroadcaster(Broadcaster):
+    """여러 워커(uvicorn --workers N) 간 pub/sub. 이미 쓰는 Postgres 의 LISTEN/NOTIFY 사용.
+
+    publish 는 같은 프로세스 구독자에게 바로 fan-out 하고, 다른 워커로 보낼 이벤트는
+    flush_ms 동안 모아 NOTIFY 한 번({origin, events:[...]})으로 보낸다.
+    자기 자신이 보낸 NOTIFY 는 origin 으로 걸러낸다.
+    LISTEN 용으로 엔진 풀의 커넥션 하나를 앱 수명 동안 점유한다.
+    그 커넥션은 keepalive_s 마다 SELECT 1 로 확인하고, 끊겼으면 다시 연결해 LISTEN 한다
+    (보낼 이벤트가 없는 워커도 다른 워커의 이벤트를 계속 받도록). 끊겨 있던 동안 다른 워커가 보낸
+    이벤트는 잃으므로 다시 LISTEN 한 뒤 gap 리스너를 부른다 (그 뒤 이벤트는 받으니 그때 다시 읽으면 맞다).
+    NOTIFY 에 실패한 이벤트는 버리지 않고 max_pending 개까지 남겨 다시 연결한 뒤 보낸다.
+    """
+    # NOTIFY 페이로드 한도(8000 bytes)보다 조금 작게
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, engine, channel: str, flush_ms: float = 20, queue_size: int = 100,
+                 keepalive_s: float = 10, max_pending: int = 10000):
+        super().__init__(queue_size)
+        self.engine = engine
+        self.channel = channel
+        self.flush_s = flush_ms / 1000.0
+        self.keepalive_s = keepalive_s
+        self.max_pending = max_pending
+        self.origin = uuid.uuid4().hex[:12]
+
+        self._conn = None               # SQLAlchemy AsyncConnection (풀에서 빌린 것)
+        self._raw = None                # 그 안의 asyncpg 커넥션
+        self._pending: list[str] = []      # fan-out 때 만든 JSON 문자열 그대로
+        self._wake = asyncio.Event()
+        self._io = asyncio.Lock()       # _raw 는 한 번에 한 문장만 (NOTIFY / keepalive)
+        self._tasks: list[asyncio.Task] = []
+
+        # 통계
+        self.notifies_sent = 0
+        self.notifies_received = 0
+        self.reconnects = 0
+        self.notify_retries = 0
+        self.notify_dropped = 0
+        self.last_flush_ms = 0.0
+
+    async def _connect(self):
+        self._conn = await self.engine.connect()
+        raw = await self._conn.get_raw_connection()
+        self._raw = raw.driver_connection
+        await self._raw.add_listener(self.channel, self._on_notify)
+
+    async def _disconnect(self, broken: bool = False):
+        if self._conn is not None:
+            try:
+                if broken:
+                    await self._conn.invalidate()       # 죽은 커넥션은 풀에 돌려주지 않는다
+                else:
+                    await self._raw.remove_listener(self.channel, self._on_notify)
+                await self._conn.close()
+            except Exception:
+                log.debug("[RT] LISTEN connection close failed", exc_info=True)
+        self._conn = self._raw = None
+
+    async def _reconnect(self):
+        await self._disconnect(broken=True)
+        await self._connect()
+        self.reconnects += 1
+        log.warning("[RT] LISTEN %s reconnected", self.channel)
+        self._gap()
+        if self._pending:
+            self._wake.set()            # 실패해 남겨 둔 이벤트를 보낸다
+
+    async def start(self):
+        await self._connect()
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._keepalive_loop())]
+        log.info("[RT] LISTEN %s (origin=%s)", self.channel, self.origin)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self._flush()             # 남은 이벤트는 보내고 닫는다
+        await self._disconnect()
+
+    async def publish(self, msg: dict):
+        self._pending.append(self._fanout(msg))
+        self._wake.set()
+
+    def _on_notify(self, conn, pid, channel, payload: str):
+        try:
+            data = loads(payload)
+        except ValueError:
+            log.warning("[RT] bad NOTIFY payload on %s", channel)
+            return
+        if data.get("origin") == self.origin:
+            return
+        self.notifies_received += 1
+        for msg in data.get("events", ()):
+            self._fanout(msg)
+
+    def _payloads(self, events: list[str]):
+        # 페이로드 한도 안에서 최대한 묶는다. (페이로드, 거기까지 담은 events 개수)
+        head = f'{{"origin":"{self.origin}","events":['
+        chunk: list[str] = []
+        size = len(head) + 2
+        for i, item in enumerate(events):
+            n = len(item.encode("utf-8")) + 1
+            if chunk and size + n > self.MAX_PAYLOAD:
+                yield head + ",".join(chunk) + "]}", i
+                chunk, size = [], len(head) + 2
+            if len(head) + 2 + n > self.MAX_PAYLOAD:
+                log.warning("[RT] event too large for NOTIFY, dropped: %s", item[:80])
+                continue
+            chunk.append(item)
+            size += n
+        if chunk:
+            yield head + ",".join(chunk) + "]}", len(events)
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        events, self._pending = self._pending, []
+        started = time.perf_counter()
+        sent = 0
+        async with self._io:
+            try:
+                if self._raw is None or self._raw.is_closed():
+                    await self._reconnect()
+                for payload, upto in self._payloads(events):
+                    await self._raw.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+                    self.notifies_sent += 1
+                    sent = upto
+            except Exception:
+                # 못 보낸 것만 앞에 되돌려 두고 다시 연결한 뒤 보낸다 (그동안 새로 온 이벤트보다 먼저)
+                self._pending[:0] = events[sent:]
+                self.notify_retries += 1
+                over = len(self._pending) - self.max_pending
+                if over > 0:
+                    del self._pending[:over]
+                    self.notify_dropped += over
+                log.exception("[RT] NOTIFY failed, %d events kept for retry (%d dropped)",
+                              len(events) - sent, max(over, 0))
+                self._raw = None        # 다음 flush / keepalive 가 다시 연결한다
+        self.last_flush_ms = (time.perf_counter() - started) * 1000.0
+
+    async def _flush_loop(self):
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.flush_s)       # 그동안 들어온 이벤트를 함께 보낸다
+            self._wake.clear()
+            await self._flush()
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive_s)
+            async with self._io:
+                try:
+                    if self._raw is None or self._raw.is_closed():
+                        raise ConnectionError("LISTEN connection closed")
+                    await asyncio.wait_for(self._raw.execute("SELECT 1"), self.keepalive_s)
+                except Exception as e:
+                    log.warning("[RT] LISTEN connection lost (%s), reconnecting", e)
+                    try:
+                        await self._reconnect()
+                    except Exception:
+                        log.exception("[RT] LISTEN reconnect failed, retry in %.1fs", self.keepalive_s)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "backend": "postgres",
+            "pending": len(self._pending),
+            "notifies_sent": self.notifies_sent,
+            "notifies_received": self.notifies_received,
+            "reconnects": self.reconnects,
+            "notify_retries": self.notify_retries,
+            "notify_dropped": self.notify_dropped,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+class RecentRunLogs:
+    """/chart 스냅샷용 최근 run_log 이벤트 링 버퍼.
+
+    이벤트는 broadcaster 가 만든 JSON 문자열을 그대로 쌓아 두고, 스냅샷 메시지 문자열도
+    다음 이벤트가 올 때까지 재사용한다. 새 구독자는 DB 조회 없이 이것을 받는다.
+    """
+    def __init__(self, size: int = 100):
+        self.rows: deque[str] = deque(maxlen=size)
+        self._snapshot: str | None = None
+        self.warmed = False
+
+    def fill(self, events: list[dict]):
+        """오래된 → 최신 순 이벤트로 버퍼를 채운다 (시작 시 DB 에서 한 번)."""
+        self.rows.clear()
+        for msg in events:
+            self.rows.append(dumps_str(msg))
+        self._snapshot = None
+        self.warmed = True
+
+    def on_event(self, msg: dict, data: str):
+        if msg.get("type") != "run_log":
+            return
+        self.rows.append(data)
+        self._snapshot = None
+
+    def snapshot(self) -> str:
+        if self._snapshot is None:
+            self._snapshot = '{"type":"snapshot","rows":[' + ",".join(self.rows) + "]}"
+        return self._snapshot
+
+    def stats(self) -> dict:
+        return {"warmed": self.warmed, "rows": len(self.rows), "capacity": self.rows.maxlen}
+
+def _make_broadcaster() -> Broadcaster:
+    if settings.broadcast_backend == "postgres":
+        from Merge_app.db.session import engine
+        return PostgresBroadcaster(
+            engine,
+            channel=settings.broadcast_channel,
+            flush_ms=settings.broadcast_flush_ms,
+            queue_size=settings.broadcast_queue_size,
+            keepalive_s=settings.broadcast_keepalive_s,
+        )
+    return Broadcaster(queue_size=settings.broadcast_queue_size)
+
+broadcaster = _make_broadcaster()
+
+recent_run_logs = RecentRunLogs(size=settings.chart_snapshot_size)
+broadcaster.add_listener(recent_run_logs.on_event)
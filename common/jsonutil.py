@@ -0,0 +1,56 @@
+"""JSON 직렬화 공용 모듈 (HTTP 응답 / WebSocket / SSE / broadcaster). Merge_app, DB_app, AI_app 이 함께 쓴다.
+
+orjson 이 있으면 orjson 으로, 없으면 표준 json 으로 같은 모양을 만든다
+(공백 없는 구분자, ensure_ascii=False → starlette JSONResponse / send_json 과 같은 바이트).
+datetime 은 둘 다 isoformat 문자열, 그 밖의 모르는 타입은 dumps() 에서 str() 로 쓴다.
+ORJSONResponse 는 orjson 이 있으면 fastapi.responses 의 것을 그대로 쓴다.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from starlette.websockets import WebSocket
+
+try:
+    import orjson
+except ImportError:         # 선택 의존성: 없으면 표준 json
+    orjson = None
+
+
+def _default(obj: Any):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+if orjson is not None:
+    _OPTS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTS)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+    loads = json.loads
+
+
+def dumps_str(obj: Any) -> str:
+    """WebSocket 텍스트 프레임 / SSE data / NOTIFY 페이로드용."""
+    return dumps(obj).decode("utf-8")
+
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse      # 앱 default_response_class
+else:
+    class ORJSONResponse(JSONResponse):
+        """orjson 이 없을 때: 같은 본문을 표준 json 의 dumps() 로 만든다."""
+        def render(self, content: Any) -> bytes:
+            return dumps(content)
+
+
+async def send_json(ws: WebSocket, obj: Any):
+    """ws.send_json 대신: 같은 텍스트 프레임을 dumps() 로 만든다."""
+    await ws.send_text(dumps_str(obj))
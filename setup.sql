@@ -59,14 +59,63 @@ CREATE TABLE IF NOT EXISTS user_stage_progress (
   )
 );
 
+-- Per-stage histograms of best records (Merge_app/db/stage_stats.py).
+-- hist[i] = cleared records with width_bucket(value, edges) = i - 1.
+CREATE TABLE IF NOT EXISTS stage_stats (
+  stage_id     INT PRIMARY KEY REFERENCES stages(stage_id) ON DELETE CASCADE,
+  time_hist    BIGINT[] NOT NULL,
+  length_hist  BIGINT[] NOT NULL,
+  updated_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Deltas not yet folded into stage_stats (m = 't' time / 'l' length, i = hist position).
+CREATE TABLE IF NOT EXISTS stage_stats_delta (
+  delta_id  BIGSERIAL PRIMARY KEY,
+  stage_id  INT NOT NULL REFERENCES stages(stage_id) ON DELETE CASCADE,
+  m         VARCHAR(1) NOT NULL,
+  i         INT NOT NULL,
+  n         BIGINT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stage_stats_delta_stage ON stage_stats_delta (stage_id, m, i);
+
+-- Monthly range partitions on cleared_at (Merge_app/db/partitions.py).
+-- The partition key must be part of the primary key.
 CREATE TABLE IF NOT EXISTS run_logs (
-  record_id      BIGSERIAL PRIMARY KEY,
+  record_id      BIGSERIAL,
   user_id        TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
   stage_code     TEXT NOT NULL REFERENCES stages(code),
   prompt_length  INT  NOT NULL,
   clear_time_ms  BIGINT NOT NULL,
-  cleared_at     TIMESTAMPTZ NOT NULL DEFAULT now()
-);
+  cleared_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (record_id, cleared_at)
+) PARTITION BY RANGE (cleared_at);
+
+-- This month and the next two (the app keeps creating upcoming months at startup
+-- and every run_log_partition_check_s; see run_log_partitions_ahead), plus a
+-- DEFAULT partition for rows outside them (migrations.py v6). ensure_partitions
+-- moves a month's rows out of run_logs_default when it creates that month.
+-- An existing unpartitioned run_logs is left alone here; init_db converts it
+-- (migrations.py v2) and then creates the partitions.
+DO $$
+DECLARE
+  m DATE := date_trunc('month', now() AT TIME ZONE 'UTC')::date;
+  i INT;
+BEGIN
+  IF (SELECT c.relkind FROM pg_class c
+      WHERE c.oid = to_regclass('run_logs')) IS DISTINCT FROM 'p' THEN
+    RAISE NOTICE 'run_logs is not partitioned yet; start the app to migrate it';
+    RETURN;
+  END IF;
+  FOR i IN 0..2 LOOP
+    EXECUTE format(
+      'CREATE TABLE IF NOT EXISTS %I PARTITION OF run_logs FOR VALUES FROM (%L) TO (%L)',
+      'run_logs_' || to_char(m + make_interval(months => i), 'YYYYMM'),
+      to_char(m + make_interval(months => i), 'YYYY-MM-DD') || ' 00:00:00+00',
+      to_char(m + make_interval(months => i + 1), 'YYYY-MM-DD') || ' 00:00:00+00'
+    );
+  END LOOP;
+  CREATE TABLE IF NOT EXISTS run_logs_default PARTITION OF run_logs DEFAULT;
+END $$;
 
 CREATE INDEX IF NOT EXISTS idx_stages_code        ON stages(code);
 CREATE INDEX IF NOT EXISTS idx_progress_user      ON user_stage_progress(user_id);
@@ -75,6 +124,30 @@ CREATE INDEX IF NOT EXISTS idx_runlogs_user       ON run_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_runlogs_stage_code ON run_logs(stage_code);
 CREATE INDEX IF NOT EXISTS idx_runlogs_cleared_at ON run_logs(cleared_at);
 
+-- Run history keyset pagination (Merge_app/db/history.py, migrations.py v4)
+CREATE INDEX IF NOT EXISTS idx_runlogs_user_recent
+  ON run_logs (user_id, cleared_at DESC, record_id DESC);
+CREATE INDEX IF NOT EXISTS idx_runlogs_stage_recent
+  ON run_logs (stage_code, cleared_at DESC, record_id DESC);
+
+-- Ranking partial indexes (Merge_app/db/migrations.py v1)
+CREATE INDEX IF NOT EXISTS idx_progress_rank_time
+  ON user_stage_progress (stage_id, clear_time_ms, cleared_at, user_id)
+  WHERE cleared AND clear_time_ms IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_progress_rank_length
+  ON user_stage_progress (stage_id, prompt_length, cleared_at, user_id)
+  WHERE cleared AND prompt_length IS NOT NULL;
+
+-- Schema versions are recorded only by Merge_app init_db (migrations.py), after it
+-- has applied each step. Versions are not seeded here: on an existing database this
+-- script cannot convert run_logs or rebuild stage_stats, and every migration is safe
+-- to run again on objects this script already created.
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version    INT PRIMARY KEY,
+  name       TEXT NOT NULL,
+  applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
 -- ========== Triggers/Functions ==========
 
 CREATE OR REPLACE FUNCTION set_updated_at()
@@ -126,6 +199,79 @@ CREATE TRIGGER trg_unlock_next
 AFTER UPDATE OF cleared ON user_stage_progress
 FOR EACH ROW EXECUTE FUNCTION unlock_next_stage();
 
+-- Keeps stage_stats in step with user_stage_progress (migrations.py v3, v5).
+-- Statement-level triggers append per-bucket deltas to stage_stats_delta; the app folds
+-- them into stage_stats periodically and readers add the pending ones (stage_stats_live).
+-- Bucket edges must match TIME_EDGES_MS / LENGTH_EDGES in Merge_app/db/stage_stats.py.
+CREATE OR REPLACE FUNCTION stage_stats_time_bucket(v BIGINT) RETURNS INT LANGUAGE sql IMMUTABLE AS $$ SELECT width_bucket(v, '{1000,2000,3000,4000,5000,6000,8000,10000,12000,15000,20000,25000,30000,40000,50000,60000,75000,90000,120000,150000,180000,240000,300000,420000,600000,900000,1200000,1800000,3600000}'::bigint[]) + 1 $$;
+
+CREATE OR REPLACE FUNCTION stage_stats_length_bucket(v INT) RETURNS INT LANGUAGE sql IMMUTABLE AS $$ SELECT width_bucket(v, '{2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,39,40,45,50,60,70,80,100,150,200}'::int[]) + 1 $$;
+
+CREATE OR REPLACE FUNCTION stage_stats_live(hist BIGINT[], sid INT, metric TEXT) RETURNS BIGINT[] LANGUAGE sql STABLE AS $$
+  SELECT array_agg(h.v + COALESCE(d.n, 0) ORDER BY h.i)
+  FROM unnest(hist) WITH ORDINALITY h(v, i)
+  LEFT JOIN (SELECT i, sum(n) AS n FROM stage_stats_delta
+             WHERE stage_id = sid AND m = metric GROUP BY i) d ON d.i = h.i
+$$;
+
+CREATE OR REPLACE FUNCTION stage_stats_apply() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO stage_stats (stage_id, time_hist, length_hist)
+    SELECT DISTINCT stage_id, array_fill(0::bigint, ARRAY[30]), array_fill(0::bigint, ARRAY[48]) FROM new_rows WHERE cleared
+    ON CONFLICT (stage_id) DO NOTHING;
+    INSERT INTO stage_stats_delta (stage_id, m, i, n)
+    SELECT stage_id, m, i, sum(n) FROM (
+        SELECT stage_id, 't' AS m, stage_stats_time_bucket(clear_time_ms) AS i, 1 AS n
+        FROM new_rows WHERE cleared AND clear_time_ms IS NOT NULL
+        UNION ALL
+        SELECT stage_id, 'l', stage_stats_length_bucket(prompt_length), 1
+        FROM new_rows WHERE cleared AND prompt_length IS NOT NULL
+    ) x GROUP BY 1, 2, 3 HAVING sum(n) <> 0;
+  ELSIF TG_OP = 'UPDATE' THEN
+    INSERT INTO stage_stats (stage_id, time_hist, length_hist)
+    SELECT DISTINCT stage_id, array_fill(0::bigint, ARRAY[30]), array_fill(0::bigint, ARRAY[48]) FROM new_rows WHERE cleared
+    ON CONFLICT (stage_id) DO NOTHING;
+    INSERT INTO stage_stats_delta (stage_id, m, i, n)
+    SELECT stage_id, m, i, sum(n) FROM (
+        SELECT stage_id, 't' AS m, stage_stats_time_bucket(clear_time_ms) AS i, -1 AS n
+        FROM old_rows WHERE cleared AND clear_time_ms IS NOT NULL
+        UNION ALL
+        SELECT stage_id, 'l', stage_stats_length_bucket(prompt_length), -1
+        FROM old_rows WHERE cleared AND prompt_length IS NOT NULL
+        UNION ALL
+        SELECT stage_id, 't' AS m, stage_stats_time_bucket(clear_time_ms) AS i, 1 AS n
+        FROM new_rows WHERE cleared AND clear_time_ms IS NOT NULL
+        UNION ALL
+        SELECT stage_id, 'l', stage_stats_length_bucket(prompt_length), 1
+        FROM new_rows WHERE cleared AND prompt_length IS NOT NULL
+    ) x GROUP BY 1, 2, 3 HAVING sum(n) <> 0;
+  ELSE
+    INSERT INTO stage_stats_delta (stage_id, m, i, n)
+    SELECT stage_id, m, i, sum(n) FROM (
+        SELECT stage_id, 't' AS m, stage_stats_time_bucket(clear_time_ms) AS i, -1 AS n
+        FROM old_rows WHERE cleared AND clear_time_ms IS NOT NULL
+        UNION ALL
+        SELECT stage_id, 'l', stage_stats_length_bucket(prompt_length), -1
+        FROM old_rows WHERE cleared AND prompt_length IS NOT NULL
+    ) x GROUP BY 1, 2, 3 HAVING sum(n) <> 0;
+  END IF;
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stage_stats_ins ON user_stage_progress;
+DROP TRIGGER IF EXISTS trg_stage_stats_upd ON user_stage_progress;
+DROP TRIGGER IF EXISTS trg_stage_stats_del ON user_stage_progress;
+CREATE TRIGGER trg_stage_stats_ins AFTER INSERT ON user_stage_progress
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION stage_stats_apply();
+CREATE TRIGGER trg_stage_stats_upd AFTER UPDATE ON user_stage_progress
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION stage_stats_apply();
+CREATE TRIGGER trg_stage_stats_del AFTER DELETE ON user_stage_progress
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION stage_stats_apply();
+
 -- ========== Seed stages (A1..A5, B1..B5, ... E1..E5) ==========
 
 DO $$
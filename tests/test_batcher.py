@@ -0,0 +1,107 @@
+"""BatchScheduler: 배치 요청과 단독 작업(스트리밍)이 같은 대기열과 상한을 쓰는지, 순서가 지켜지는지,
+어떤 경우에도 (결과 수가 틀려도, 닫혀도) 기다리는 호출자가 끝나는지.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from Merge_app.llm.batcher import BatchScheduler, InferenceQueueFull, SchedulerClosed
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def gated():
+    # run_batch 가 gate 가 열릴 때까지 추론 스레드를 붙잡는다
+    gate = threading.Event()
+    calls: list = []
+
+    def run_batch(items):
+        gate.wait(5)
+        calls.append(list(items))
+        return [f"r:{i}" for i in items]
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    scheduler = BatchScheduler(run_batch, max_batch_size=8, max_wait_ms=5, executor=executor, max_queue=2)
+    yield scheduler, gate, calls
+    gate.set()
+    await scheduler.close()
+    executor.shutdown(wait=True)
+
+
+async def _started(scheduler: BatchScheduler):
+    # 첫 작업이 대기열에서 나가 추론 중이 될 때까지
+    while scheduler._queue.qsize() or scheduler._held is not None:
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.02)
+
+
+async def test_stream_and_batch_share_queue_limit(gated):
+    scheduler, gate, calls = gated
+    running = asyncio.ensure_future(scheduler.submit("a"))
+    await asyncio.sleep(0)
+    await _started(scheduler)
+
+    queued = [asyncio.ensure_future(scheduler.submit("b")), scheduler.submit_alone(lambda: "alone")]
+    await asyncio.sleep(0)
+    with pytest.raises(InferenceQueueFull):
+        scheduler.submit_alone(lambda: "too many")
+    with pytest.raises(InferenceQueueFull):
+        await scheduler.submit("too many")
+    assert scheduler.rejected == 2
+
+    gate.set()
+    assert await running == "r:a"
+    assert await asyncio.gather(*queued) == ["r:b", "alone"]
+
+
+async def test_alone_runs_between_batches_in_order(gated):
+    scheduler, gate, calls = gated
+    scheduler.max_queue = 0
+    order: list = []
+    blocker = asyncio.ensure_future(scheduler.submit("first"))
+    await asyncio.sleep(0)
+    await _started(scheduler)
+
+    futs = [asyncio.ensure_future(scheduler.submit("a")), asyncio.ensure_future(scheduler.submit("b"))]
+    await asyncio.sleep(0)
+    futs.append(scheduler.submit_alone(lambda: order.append(list(calls)) or "alone"))
+    futs.append(asyncio.ensure_future(scheduler.submit("c")))
+    skipped = scheduler.submit_alone(lambda: order.append("never"))
+    skipped.cancel()                    # 차례 전에 나간 스트림은 돌리지 않는다
+    await asyncio.sleep(0)
+
+    gate.set()
+    assert await blocker == "r:first"
+    assert await asyncio.gather(*futs) == ["r:a", "r:b", "alone", "r:c"]
+    assert calls == [["first"], ["a", "b"], ["c"]]
+    assert order == [[["first"], ["a", "b"]]]
+    assert scheduler.stats()["alone"] == 1
+
+
+@pytest.mark.parametrize("results", [["only one"], ["x", "y", "z"]])
+async def test_wrong_result_count_fails_every_request(results):
+    scheduler = BatchScheduler(lambda items: results, max_batch_size=8, max_wait_ms=20)
+    futs = [asyncio.ensure_future(scheduler.submit(i)) for i in range(2)]
+    done = await asyncio.wait_for(asyncio.gather(*futs, return_exceptions=True), 2)
+    assert all(isinstance(e, ValueError) for e in done), done
+    await scheduler.close()
+
+
+async def test_close_fails_waiting_requests(gated):
+    scheduler, gate, calls = gated
+    scheduler.max_queue = 0
+    running = asyncio.ensure_future(scheduler.submit("a"))
+    await asyncio.sleep(0)
+    await _started(scheduler)
+    waiting = [asyncio.ensure_future(scheduler.submit("b")), scheduler.submit_alone(lambda: "alone")]
+    await asyncio.sleep(0)
+
+    closing = asyncio.ensure_future(scheduler.close())
+    await asyncio.sleep(0.01)
+    gate.set()
+    await closing
+    done = await asyncio.wait_for(asyncio.gather(running, *waiting, return_exceptions=True), 2)
+    assert all(isinstance(e, SchedulerClosed) for e in done), done
@@ -0,0 +1,144 @@
+"""PostgresBroadcaster: 다른 프로세스가 publish 한 이벤트를 LISTEN 으로 받는지, LISTEN 커넥션이
+끊겨도 (보낼 이벤트가 없는 쪽에서도) keepalive 가 다시 연결하고 gap 을 알리는지,
+NOTIFY 에 실패한 이벤트를 다시 연결한 뒤 보내는지.
+
+받는 쪽은 이 테스트 프로세스, 보내는 쪽은 broadcast_backend=postgres 로 띄운 별도 파이썬 프로세스다.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from Merge_app.config import settings
+from Merge_app.realtime import PostgresBroadcaster
+
+pytestmark = pytest.mark.anyio
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PUBLISHER = """
+import asyncio, sys
+from Merge_app.realtime import broadcaster
+
+async def main():
+    await broadcaster.start()
+    for i in range(int(sys.argv[1])):
+        await broadcaster.publish({"type": "run_log", "i": i, "pad": "가" * 30})
+    await broadcaster.stop()
+
+asyncio.run(main())
+"""
+
+
+async def _publish_from_other_process(channel: str, n: int):
+    env = {**os.environ, "broadcast_backend": "postgres", "broadcast_channel": channel,
+           "database_url": settings.database_url, "PYTHONPATH": str(ROOT)}
+    proc = await asyncio.to_thread(
+        subprocess.run, [sys.executable, "-c", PUBLISHER, str(n)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+
+
+async def _drain(queue: asyncio.Queue, n: int, timeout: float = 5) -> list[int]:
+    got = []
+    try:
+        while len(got) < n:
+            got.append(json.loads(await asyncio.wait_for(queue.get(), timeout))["i"])
+    except asyncio.TimeoutError:
+        pass
+    return got
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    try:
+        async with engine.connect():
+            pass
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"database not reachable: {e}")
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def receiver(engine):
+    b = PostgresBroadcaster(engine, channel=f"test_{uuid.uuid4().hex[:8]}", flush_ms=5,
+                            queue_size=1000, keepalive_s=0.2)
+    await b.start()
+    try:
+        yield b
+    finally:
+        await b.stop()
+
+
+async def _terminate(b: PostgresBroadcaster) -> int:
+    pid = b._raw.get_server_pid()
+    async with b.engine.connect() as c:
+        await c.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+    return pid
+
+
+async def _wait_reconnect(b: PostgresBroadcaster, pid: int):
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        if b.reconnects and b._raw is not None and b._raw.get_server_pid() != pid:
+            break
+    assert b.reconnects >= 1
+
+
+async def test_receives_events_published_by_another_process(receiver):
+    queue = await receiver.subscribe()
+    await _publish_from_other_process(receiver.channel, 300)
+    assert await _drain(queue, 300) == list(range(300))
+    assert receiver.notifies_received >= 1
+
+
+async def test_keepalive_reconnects_dropped_listen_connection(receiver):
+    queue = await receiver.subscribe()
+    gaps = []
+    receiver.add_gap_listener(lambda: gaps.append(receiver._raw is not None))
+    pid = await _terminate(receiver)
+
+    # 이 프로세스는 아무것도 보내지 않는다 → keepalive 만이 끊김을 알아챌 수 있다
+    await _wait_reconnect(receiver, pid)
+    assert gaps and all(gaps)               # 다시 LISTEN 한 뒤에 알린다
+    assert receiver.gaps == len(gaps)
+
+    await _publish_from_other_process(receiver.channel, 10)
+    assert await _drain(queue, 10) == list(range(10))
+
+
+class _BrokenNotify:
+    """NOTIFY 도중 끊긴 커넥션 (is_closed 로는 아직 모른다)."""
+    def is_closed(self) -> bool:
+        return False
+
+    async def execute(self, sql, *args):
+        raise ConnectionError("connection lost during NOTIFY")
+
+
+async def test_failed_notify_is_sent_after_reconnect(engine, receiver):
+    queue = await receiver.subscribe()
+    sender = PostgresBroadcaster(engine, channel=receiver.channel, flush_ms=5, keepalive_s=0.2)
+    await sender.start()
+    try:
+        pid = sender._raw.get_server_pid()
+        sender._raw = _BrokenNotify()
+        for i in range(20):
+            await sender.publish({"type": "run_log", "i": i})
+        await _wait_reconnect(sender, pid)
+        assert await _drain(queue, 20) == list(range(20))
+        assert sender.notify_retries == 1 and sender.notify_dropped == 0
+    finally:
+        await sender.stop()
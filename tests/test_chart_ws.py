@@ -0,0 +1,47 @@
+"""/chart: 이벤트가 없어도 클라이언트가 끊으면 바로 구독을 풀고 핸들러가 끝난다."""
+import asyncio
+
+import pytest
+
+from Merge_app.api.chart_ws import chart_stream
+from Merge_app.realtime import broadcaster, recent_run_logs
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent: list[str] = []
+        self.incoming: asyncio.Queue = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.sent.append(data)
+
+    async def receive(self) -> dict:
+        return await self.incoming.get()
+
+
+async def test_disconnect_unsubscribes_without_events():
+    recent_run_logs.fill([])
+    before = len(broadcaster.subscribers)
+    ws = FakeWebSocket()
+    handler = asyncio.create_task(chart_stream(ws))
+    while not ws.sent:                              # 구독 + 스냅샷
+        await asyncio.sleep(0.01)
+
+    await broadcaster.publish({"type": "run_log", "record_id": 1})
+    for _ in range(100):
+        if len(ws.sent) == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert len(ws.sent) == 2                        # 스냅샷 + 이벤트 하나
+    assert len(broadcaster.subscribers) == before + 1
+
+    # 끊은 뒤로는 아무 이벤트도 publish 하지 않는다
+    await ws.incoming.put({"type": "websocket.receive", "text": "ping"})
+    await ws.incoming.put({"type": "websocket.disconnect", "code": 1000})
+    await asyncio.wait_for(handler, 1)
+    assert len(broadcaster.subscribers) == before
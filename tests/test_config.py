@@ -0,0 +1,23 @@
+"""Settings 시작 시 검사."""
+import pytest
+from pydantic import ValidationError
+
+from Merge_app.config import Settings
+
+
+def test_progress_cache_is_off_by_default():
+    assert Settings(_env_file=None).progress_cache_entries == 0
+
+
+def test_progress_cache_with_workers_requires_postgres_broadcast():
+    with pytest.raises(ValidationError, match="broadcast_backend=postgres"):
+        Settings(_env_file=None, progress_cache_entries=100, broadcast_backend="memory", web_concurrency=4)
+    assert Settings(_env_file=None, progress_cache_entries=100, broadcast_backend="postgres",
+                    web_concurrency=4).progress_cache_entries == 100
+
+
+def test_progress_cache_single_process_allows_memory_broadcast(monkeypatch):
+    assert Settings(_env_file=None, progress_cache_entries=100, broadcast_backend="memory").progress_cache_entries == 100
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")      # uvicorn 이 읽는 것과 같은 환경 변수
+    with pytest.raises(ValidationError, match="web_concurrency > 1"):
+        Settings(_env_file=None, progress_cache_entries=100, broadcast_backend="memory")
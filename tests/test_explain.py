@@ -0,0 +1,44 @@
+"""/run-logs 순위 문장이 랭킹 부분 인덱스를 쓰는지 (bench explain 과 같은 검사).
+
+히스토그램 경로는 구간 안 카운트 2개, 대체 경로는 4개가 index-only scan 이어야 하고,
+user_stage_progress 를 순차/비트맵 스캔하지 않는다.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from Merge_app.config import settings
+from Merge_app.db.bench import RANK_PLANS, explain, rank_params, rank_plan_failures
+from Merge_app.db.stages import stage_registry
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def vacuumed():
+    # index-only scan 은 visibility map 이 채워져 있어야 고른다 (트랜잭션 밖에서만 가능)
+    engine = create_async_engine(settings.database_url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("VACUUM ANALYZE gameapp.user_stage_progress"))
+    except Exception as e:
+        pytest.skip(f"database not reachable: {e}")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("name,stmt,counts", RANK_PLANS, ids=[p[0] for p in RANK_PLANS])
+async def test_rank_statements_use_ranking_indexes(vacuumed, db_session, name, stmt, counts):
+    conn = await db_session.connection()
+    # 테이블이 작으면 순차 스캔이 더 싸다. 끄더라도 쓸 수 있는 인덱스가 없으면 여전히 순차 스캔이
+    # 나오므로, 문장 모양이 부분 인덱스와 맞는지는 데이터 양과 무관하게 확인된다.
+    await conn.execute(text("SET LOCAL enable_seqscan = off"))
+    await conn.execute(text("SET LOCAL enable_bitmapscan = off"))
+
+    params = rank_params(stage_registry.by_code("A1").stage_id, "test_explain",
+                         5000, 10, datetime.now(timezone.utc))
+    scans, failures = rank_plan_failures(name, await explain(stmt, params, conn), counts)
+    assert not failures, scans
@@ -0,0 +1,36 @@
+"""규칙 기반 파서(parse_command)의 정확도: 정답 세트는 그대로, 부정/지원 밖 명령은 None (모델 없이)."""
+import pytest
+
+from Merge_app.llm.fastpath import parse_command
+from Merge_app.llm.grammar import is_valid_program
+from Merge_app.llm.prompt_cases import ANSWERS, PROMPT_TESTS
+
+
+@pytest.mark.parametrize("prompt, key", PROMPT_TESTS)
+def test_handled_prompts_match_answers(prompt, key):
+    code = parse_command(prompt)
+    assert code == ANSWERS[key]
+    assert is_valid_program(code)
+
+
+@pytest.mark.parametrize("prompt", [
+    # 부정
+    "오른쪽으로 세칸 가지 마",
+    "절대 오른쪽으로 세칸 가지마",
+    "부품을 줍지 마",
+    "오른쪽으로 세칸 가지 말고 부품을 주워",
+    "아래로 두칸 가면 안 돼",
+    # 지원하지 않는 방향/수/동작, 조건 일부만
+    "오른쪽으로 가",
+    "대각선으로 두칸 가",
+    "오른쪽으로 백칸 가",
+    "오른쪽으로 0칸 가",
+    "오른쪽으로 세칸 가고 춤춰",
+    "오른쪽 벽까지 가",
+    "아래가 절벽이면 멈춰",
+    "만약 앞이 막혀 있으면 돌아가",
+    "안녕",
+    "",
+])
+def test_negated_or_unsupported_prompts_go_to_model(prompt):
+    assert parse_command(prompt) is None
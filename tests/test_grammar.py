@@ -0,0 +1,218 @@
+"""제어 코드 문법 (advance / is_valid_program) 과 ControlCodeLogitsProcessor.
+
+프로세서는 가짜 토크나이저 어휘 위에서 돌린다. 점수 순위만 필요하므로 torch 없이
+begin / step / allowed 로 디코딩을 흉내 내고, torch 가 있으면 __call__ 도 본다.
+"""
+import random
+
+import pytest
+
+from Merge_app.llm.fastpath import parse_command
+from Merge_app.llm.grammar import INITIAL, STATEMENTS, ControlCodeLogitsProcessor, advance, is_valid_program
+
+VALID = [
+    "pick()",
+    "f_move(2)\n",
+    "f_move(99)\nb_move(1)\nl_move(10)\nr_move(3)",
+    "  pick()  \n\n\tdrop()\n",
+    "pick()\r\ndrop()",
+    "if(search(1)==1){\n    b_move(2)\n}\nelse{\n    r_move(3)\n}\n",
+    "if(search(4)!=0){\npick()\n}",
+    "if(search(2)==0){\nif(search(3)==1){\ndrop()\n}\nelse{\npick()\n}\n}",
+]
+
+INVALID = [
+    "",
+    "\n  \n",
+    "pick()drop()",                         # 문장 사이 줄바꿈 없음
+    "pick() drop()",
+    "pick();drop()",
+    "if(search(1)==0){}",                   # 빈 블록 + 줄바꿈 없음
+    "if(search(1)==0){\n}",                 # 빈 블록
+    "if(search(1)==0){\npick()\n}\nelse{\n}",
+    "if(search(1)==0){pick()\n}",
+    "if(search(1)==0){\npick()\n}else{\ndrop()\n}",
+    "if(search(1)==0){\npick()\n}\npick()\nelse{\ndrop()\n}",   # else 는 if 블록 바로 뒤에만
+    "if(search(1)==0){\npick()",            # 닫히지 않은 블록
+    "}",
+    "else{\npick()\n}",
+    "f_move(0)",
+    "f_move(100)",
+    "f_move( 2)",
+    "if(search(5)==0){\npick()\n}",
+    "if(search(1)==2){\npick()\n}",
+    "if(search(1)==0){\nif(search(1)==0){\nif(search(1)==0){\npick()\n}\n}\n}",   # MAX_DEPTH 초과
+]
+
+
+@pytest.mark.parametrize("code", VALID)
+def test_valid_programs(code):
+    assert is_valid_program(code)
+
+
+@pytest.mark.parametrize("code", INVALID)
+def test_invalid_programs(code):
+    assert not is_valid_program(code)
+
+
+@pytest.mark.parametrize("code", VALID + INVALID)
+def test_advance_is_split_independent(code):
+    # 토큰 경계가 어디든 한 번에 넣은 것과 같은 상태
+    rnd = random.Random(code)
+    for _ in range(20):
+        state, i = INITIAL, 0
+        while state is not None and i < len(code):
+            j = i + rnd.randint(1, 4)
+            state = advance(state, code[i:j])
+            i = j
+        assert state == advance(INITIAL, code)
+
+
+@pytest.mark.parametrize("prompt", [
+    "아래로 2칸 가", "부품을 주워", "왼쪽으로 3칸 가고 부품을 내려놔",
+    "아래가 낭떠러지면 뒤로 두칸 가고 그렇지 않으면 오른쪽으로 세번 이동해",
+])
+def test_fastpath_output_is_valid(prompt):
+    code = parse_command(prompt)
+    if code is None:
+        pytest.skip("fastpath does not handle this prompt")
+    assert is_valid_program(code)
+
+
+# ── 가짜 토크나이저 ──────────────────────────────
+VOCAB = [
+    "<eos>", "pick()", "drop()", "pick", "()", "(", ")", ")\n", "\n", "\n\n", " ", "    ",
+    "f_move", "b_move", "l_move", "r_move", "_move(", "f", "1", "2", "3", "9", "10", "99", "0",
+    "if", "(search", "(1)", "(4)", "==", "!=", "1){", "0){", "){", "}", "}\n", "else{", "else",
+    "{", ";", "hello", "가", " pick()", "pick()\n", "drop()drop()",
+]
+# 실제 어휘처럼 한 글자 토큰도 있어야 어떤 접두에서든 이어 쓸 수 있다
+VOCAB += sorted(set("".join(STATEMENTS)) - set(VOCAB))
+EOS = 0
+
+
+class FakeTokenizer:
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(VOCAB[i] for i in ids)
+
+    def __len__(self):
+        return len(VOCAB)
+
+
+def _processor(**kw) -> ControlCodeLogitsProcessor:
+    return ControlCodeLogitsProcessor(FakeTokenizer(), [EOS], **kw)
+
+
+def _decode_greedy(proc: ControlCodeLogitsProcessor, rank, max_steps: int = 200) -> tuple[str, bool]:
+    """rank(text) 가 주는 점수 순위에서 허용된 첫 토큰을 고르며 한 행을 생성한다."""
+    proc.begin(1)
+    text, last = "", None
+    for _ in range(max_steps):
+        if last is not None:
+            proc.step([last])
+        ranked = rank(text)
+        allowed = proc.allowed(0, ranked)
+        last = next(tok for tok in ranked if tok in allowed)
+        if last == EOS:
+            return text, True
+        text += VOCAB[last]
+        assert advance(INITIAL, text) is not None, text
+    return text, False
+
+
+def test_processor_blocks_missing_separator_and_empty_block():
+    proc = _processor(max_candidates=len(VOCAB))
+    proc.begin(1)
+    everything = list(range(len(VOCAB)))
+
+    proc.step([VOCAB.index("pick()")])
+    allowed = proc.allowed(0, everything)
+    assert VOCAB.index("drop()") not in allowed
+    assert VOCAB.index(";") not in allowed
+    assert VOCAB.index("\n") in allowed and VOCAB.index(")\n") not in allowed
+
+    proc.states[0] = advance(INITIAL, "if(search(1)==0){\n")
+    allowed = proc.allowed(0, everything)
+    assert VOCAB.index("}") not in allowed and VOCAB.index("}\n") not in allowed
+    assert EOS not in allowed
+    assert VOCAB.index("pick()") in allowed and VOCAB.index("    ") in allowed
+
+
+def test_processor_ends_with_eos_when_model_leaves_grammar():
+    proc = _processor()
+    proc.begin(1)
+    proc.states[0] = advance(INITIAL, "pick()\n")
+    assert proc.allowed(0, [VOCAB.index("hello"), VOCAB.index("drop()")]) == [EOS]
+    # 완성 전이면 EOS 는 가려진다
+    proc.states[0] = advance(INITIAL, "if(search(1)==0){\npick()\n")
+    assert EOS not in proc.allowed(0, [EOS, VOCAB.index("}"), VOCAB.index("hello")])
+
+
+@pytest.mark.parametrize("prefix", [
+    "if(search(1)==0){\npick()\n",        # 블록 안, 다음 문장 또는 } 가 와야 한다
+    "if(search(1)==0){\n",                 # 빈 블록 (문장이 먼저)
+    "f_move(",                              # 문장 중간
+])
+def test_processor_widens_scan_instead_of_eos_mid_program(prefix):
+    # 모델이 상위에 문법 밖 토큰만 올렸다 (scan_limit 안에 유효한 것이 없다)
+    proc = _processor()
+    proc.begin(1)
+    proc.states[0] = advance(INITIAL, prefix)
+    invalid = [VOCAB.index(t) for t in ("hello", "가", ";", "else{")]
+    allowed = proc.allowed(0, invalid)
+    assert allowed and EOS not in allowed
+    assert all(advance(proc.states[0], VOCAB[tok]) is not None for tok in allowed)
+
+    # rest 를 주면 그 순서(점수 순)대로 찾는다
+    preferred = VOCAB.index("drop()") if prefix.endswith("\n") else VOCAB.index("2")
+    assert proc.allowed(0, invalid, rest=iter([EOS, preferred, VOCAB.index("1")]))[0] == preferred
+
+
+def test_processor_follows_model_when_valid():
+    target = "if(search(1)==1){\n    b_move(2)\n}\nelse{\n    r_move(3)\n}"
+    pieces = sorted((i for i in range(1, len(VOCAB))), key=lambda i: -len(VOCAB[i]))
+
+    def rank(text):
+        # 목표 프로그램을 가장 길게 잇는 토큰이 1등, 다 쓰면 EOS, 나머지는 뒤
+        rest = target[len(text):]
+        best = [i for i in pieces if rest and rest.startswith(VOCAB[i])][:1]
+        head = best or [EOS]
+        return head + [i for i in range(len(VOCAB)) if i not in head]
+
+    text, ended = _decode_greedy(_processor(), rank)
+    assert ended and text == target and is_valid_program(text)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_processor_random_model_only_emits_valid_programs(seed):
+    rnd = random.Random(seed)
+
+    def rank(text):
+        ranked = list(range(len(VOCAB)))
+        rnd.shuffle(ranked)
+        return ranked
+
+    text, ended = _decode_greedy(_processor(max_candidates=4), rank)
+    if ended:
+        assert is_valid_program(text), text
+    else:
+        assert advance(INITIAL, text) is not None
+
+
+def test_processor_call_masks_scores():
+    torch = pytest.importorskip("torch")
+    proc = _processor(max_candidates=len(VOCAB))
+    scores = torch.zeros(2, len(VOCAB))
+    scores[:, VOCAB.index("pick()")] = 2.0
+    scores[:, VOCAB.index("drop()")] = 1.0
+
+    out = proc(torch.zeros(2, 3, dtype=torch.long), scores)
+    assert torch.isinf(out[:, EOS]).all()
+    assert out[0, VOCAB.index("pick()")] == 2.0
+
+    # 한 행은 pick(), 다른 행은 pick()\n 을 냈다 → 앞 행만 drop() 이 가려진다
+    ids = torch.tensor([[0, VOCAB.index("pick()")], [0, VOCAB.index("pick()\n")]])
+    out = proc(ids, scores.clone())
+    assert torch.isinf(out[0, VOCAB.index("drop()")])
+    assert out[1, VOCAB.index("drop()")] == 1.0
+    assert not torch.isinf(out[1, EOS])
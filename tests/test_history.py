@@ -0,0 +1,79 @@
+"""run_logs 이력 스트리밍: 쿼리 오류는 응답 전에 올라오고, 흘리는 도중 오류는 JSON 을 닫는다."""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Merge_app.db import history
+from Merge_app.db.models import RunLogORM, UserORM
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def tx_sessions(db_session, monkeypatch):
+    # open_run_history 가 여는 세션도 테스트 트랜잭션 커넥션을 쓰게 한다
+    monkeypatch.setattr(history, "async_session", lambda: AsyncSession(bind=db_session.bind))
+    return db_session
+
+
+async def _collect(chunks) -> dict:
+    return json.loads(b"".join([c async for c in chunks]))
+
+
+async def test_pages_follow_cursor(tx_sessions):
+    s = tx_sessions
+    s.add(UserORM(user_id="test_hist", profile_image=0))
+    await s.flush()
+    now = datetime.now(timezone.utc)
+    s.add_all(RunLogORM(user_id="test_hist", stage_code="A1", prompt_length=i, clear_time_ms=1000,
+                        cleared_at=now - timedelta(seconds=i)) for i in range(5))
+    await s.flush()
+
+    where = RunLogORM.user_id == "test_hist"
+    first = await _collect(await history.open_run_history(where, None, 3))
+    assert [r["prompt_length"] for r in first["items"]] == [0, 1, 2]
+    rest = await _collect(await history.open_run_history(where, history.decode_cursor(first["next_cursor"]), 3))
+    assert [r["prompt_length"] for r in rest["items"]] == [3, 4] and rest["next_cursor"] is None
+
+
+async def test_query_error_raises_before_response(tx_sessions):
+    # 서버 측 커서라 드라이버 예외(asyncpg DivisionByZeroError)가 그대로 올라온다
+    with pytest.raises(Exception, match="division by zero"):
+        await history.open_run_history(text("1 / (random() * 0)::int = 1"), None, 3)
+
+
+class _BrokenRows:
+    """한 행 뒤에 커넥션이 끊긴 스트림."""
+    def __init__(self, row):
+        self.row, self.closed = row, False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.row is None:
+            raise ConnectionError("connection lost")
+        row, self.row = self.row, None
+        return row
+
+    async def close(self):
+        self.closed = True
+
+
+class _Session:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+async def test_error_mid_stream_closes_json():
+    row = type("Row", (), {"record_id": 1, "user_id": "u", "stage_code": "A1", "prompt_length": 1,
+                           "clear_time_ms": 1, "cleared_at": datetime.now(timezone.utc)})
+    rows, s = _BrokenRows(row), _Session()
+    body = await _collect(history._chunks(s, rows, row, 10))
+    assert len(body["items"]) == 2 and body["next_cursor"] is None and body["error"] == "db_error"
+    assert rows.closed and s.closed
@@ -0,0 +1,105 @@
+"""LeaderboardCache 무효화: best 이벤트(커밋된 최고 기록)와 profile 이벤트로만 지운다.
+
+run_log 이벤트는 write-behind 면 늦거나 없을 수 있어 무효화에 쓰지 않는다.
+"""
+import pytest
+
+from Merge_app.leaderboard_cache import LeaderboardCache
+
+pytestmark = pytest.mark.anyio
+
+STAGE = 7
+
+
+class _Cache(LeaderboardCache):
+    def __init__(self, rows: dict[str, list[dict]], **kw):
+        super().__init__(**kw)
+        self.rows = rows
+
+    async def _load(self, stage_id: int, metric: str) -> list[dict]:
+        return [dict(e) for e in self.rows[metric]]
+
+
+def _entries(n: int) -> list[dict]:
+    return [{"user_id": f"u{i}", "prompt_length": 10 + i, "clear_time_ms": 1000 * (i + 1), "profile_image": 0}
+            for i in range(n)]
+
+
+def _best(user_id: str, prompt_length: int, clear_time_ms: int, stage_id: int = STAGE) -> dict:
+    return {"type": "best", "stage_id": stage_id, "user_id": user_id,
+            "prompt_length": prompt_length, "clear_time_ms": clear_time_ms, "cleared_at": None}
+
+
+async def _warm(cache: LeaderboardCache):
+    for metric in ("time", "prompt"):
+        await cache.get(STAGE, "A1", metric, 3)
+    assert cache.stats()["snapshots"] == 2
+
+
+@pytest.fixture
+def cache():
+    rows = _entries(3)
+    return _Cache({"time": rows, "prompt": rows}, max_limit=3, ttl_s=0)
+
+
+async def test_best_event_invalidates_only_boards_it_can_enter(cache):
+    await _warm(cache)
+    # 시간은 3번째(3000)보다 빠르고, 길이는 3번째(12)보다 길다 → time 만 지운다
+    cache.on_event(_best("new", 99, 2500), "")
+    assert set(cache._snapshots) == {(STAGE, "prompt")}
+    assert cache.skipped_events == 1
+
+    cache.on_event(_best("other", 12, 9000), "")
+    assert cache._snapshots == {}
+
+
+async def test_best_event_for_listed_user_or_other_stage(cache):
+    await _warm(cache)
+    cache.on_event(_best("new", 99, 99000, stage_id=STAGE + 1), "")
+    assert len(cache._snapshots) == 2
+    cache.on_event(_best("u2", 99, 99000), "")         # 이미 Top N 에 있는 유저
+    assert cache._snapshots == {}
+
+
+async def test_run_log_event_is_ignored(cache):
+    await _warm(cache)
+    cache.on_event({"type": "run_log", "stage_code": "A1", "user_id": "new",
+                    "prompt_length": 1, "clear_time_ms": 1}, "")
+    assert len(cache._snapshots) == 2
+
+
+async def test_profile_event_invalidates_snapshots_with_user(cache):
+    await _warm(cache)
+    cache.on_event({"type": "profile", "user_id": "nobody", "profile_image": 2}, "")
+    assert len(cache._snapshots) == 2
+    cache.on_event({"type": "profile", "user_id": "u1", "profile_image": 2}, "")
+    assert cache._snapshots == {}
+
+
+async def test_event_during_load_is_not_stored(cache):
+    load = cache._load
+
+    async def racing_load(stage_id, metric):
+        entries = await load(stage_id, metric)
+        cache.on_event(_best("new", 1, 1), "")         # 읽은 뒤, 저장 전에 커밋된 기록
+        return entries
+
+    cache._load = racing_load
+    await cache.get(STAGE, "A1", "time", 3)
+    assert cache._snapshots == {}
+
+
+async def test_gap_drops_all_snapshots_and_loads(cache):
+    await _warm(cache)
+    load = cache._load
+
+    async def racing_load(stage_id, metric):
+        entries = await load(stage_id, metric)
+        cache.on_gap()                                 # 읽는 동안 이벤트를 잃었을 수 있다
+        return entries
+
+    cache.on_gap()
+    assert cache._snapshots == {}
+    cache._load = racing_load
+    await cache.get(STAGE, "A1", "time", 3)
+    assert cache._snapshots == {}
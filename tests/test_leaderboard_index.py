@@ -0,0 +1,158 @@
+"""LeaderboardIndex 가 DB 와 같은 순위/Top 10 을 내는지 (무작위 기록 순서로).
+
+인덱스는 시작 경로와 같은 warm() 으로 채운다 (테스트 트랜잭션 세션을 넘긴다).
+같은 기록 열을 upsert_best_progress (DB) 와 broadcaster best 이벤트 → LeaderboardIndex 로
+흘리고, 매 단계 ranking() 이 /run-logs 의 SQL 경로 fetch_ranking (히스토그램) 및
+fetch_stage_ranks / fetch_leaderboards 와 같은지 본다.
+이벤트는 일부를 늦게 한 번 더 보내 (엇갈린 두 요청) 옛 행이 기록을 되돌리지 않는지,
+이벤트를 잃은 뒤 gap → warm 이 DB 와 다시 맞추는지도 본다.
+"""
+import random
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from Merge_app.db.ingest import BestRecord, upsert_best_progress
+from Merge_app.db.models import UserORM
+from Merge_app.db.ranking import fetch_leaderboards, fetch_ranking, fetch_stage_ranks
+from Merge_app.db.stages import stage_registry
+from common.jsonutil import dumps, loads
+from Merge_app.leaderboard import LeaderboardIndex, _SkipList
+
+pytestmark = pytest.mark.anyio
+
+RANK_KEYS = ("rank_clear_time_percent", "rank_tokens_percent", "rank_clear_time", "rank_tokens", "total_records")
+
+
+def _best_event(p) -> dict:
+    # rest.publish_best 와 같은 이벤트를 직렬화 왕복 (다른 워커가 받는 모양)
+    return loads(dumps({
+        "type": "best",
+        "stage_id": p.stage_id,
+        "user_id": p.user_id,
+        "prompt_length": p.prompt_length,
+        "clear_time_ms": p.clear_time_ms,
+        "cleared_at": p.cleared_at.isoformat() if p.cleared_at else None,
+    }))
+
+
+async def _assert_same_as_run_logs(s, index: LeaderboardIndex, row):
+    # /run-logs 가 SQL 로 계산했을 응답과 같은지 (순위, 전체 수, Top 10 모두)
+    expected = await fetch_ranking(s, stage_id=row.stage_id, user_id=row.user_id, clear_time_ms=row.clear_time_ms,
+                                   prompt_length=row.prompt_length, cleared_at=row.cleared_at)
+    assert index.ranking(row.stage_id, row.user_id) == expected, (row.stage_id, row.user_id)
+
+
+async def _assert_same(s, index: LeaderboardIndex, pairs: list[tuple[int, str]]):
+    expected = await fetch_stage_ranks(s, pairs)
+    for stage_id, user_id in pairs:
+        got = index.ranking(stage_id, user_id)
+        assert {k: got[k] for k in RANK_KEYS} == expected[(stage_id, user_id)], (stage_id, user_id)
+    boards = await fetch_leaderboards(s, {stage_id for stage_id, _ in pairs})
+    for stage_id, board in boards.items():
+        assert index.top(stage_id, "prompt") == board["prompt_top10"], stage_id
+        assert index.top(stage_id, "time") == board["time_top10"], stage_id
+
+
+@pytest.mark.parametrize("seed", range(5))
+async def test_update_matches_sql(db_session, seed: int):
+    s = db_session
+    rnd = random.Random(seed)
+    stage_ids = [stage_registry.by_code(code).stage_id for code in ("A1", "C3")]
+    users = [f"test_lb_{seed}_{i}" for i in range(8)]
+    s.add_all(UserORM(user_id=u, profile_image=rnd.randrange(3)) for u in users)
+    await s.flush()
+
+    index = LeaderboardIndex()
+    await index.warm(s)
+    assert index.warmed
+
+    clock = datetime.now(timezone.utc)
+    late: list[dict] = []
+    touched: set[tuple[int, str]] = set()
+    for _ in range(60):
+        # 값 범위를 좁게 잡아 동률(값, cleared_at 모두)이 자주 나오게 한다
+        if rnd.random() < 0.7:
+            clock += timedelta(milliseconds=rnd.choice((0, 1, 250)))
+        record = BestRecord(rnd.choice(users), rnd.choice(stage_ids),
+                            rnd.randint(3, 12), rnd.randint(1, 8) * 1000, clock)
+        row = (await upsert_best_progress(s, [record]))[0]
+        touched.add((row.stage_id, row.user_id))
+
+        event = _best_event(row)
+        if rnd.random() < 0.3:
+            late.append(event)          # 이 행은 나중에 한 번 더 (옛 행으로) 도착한다
+        index.on_event(event, "")
+        if late and rnd.random() < 0.5:
+            index.on_event(late.pop(rnd.randrange(len(late))), "")
+
+        await _assert_same_as_run_logs(s, index, row)
+        await _assert_same(s, index, sorted(touched))
+
+    for event in late:
+        index.on_event(event, "")
+    await _assert_same(s, index, sorted(touched))
+
+
+async def test_profile_event_updates_entries(db_session):
+    s = db_session
+    stage_id = stage_registry.by_code("B2").stage_id
+    s.add(UserORM(user_id="test_lb_profile", profile_image=0))
+    await s.flush()
+    index = LeaderboardIndex()
+    await index.warm(s)
+
+    row = (await upsert_best_progress(s, [BestRecord("test_lb_profile", stage_id, 1, 1, datetime.now(timezone.utc))]))[0]
+    index.on_event(_best_event(row), "")
+    index.on_event(loads(dumps({"type": "profile", "user_id": "test_lb_profile", "profile_image": 2})), "")
+    await s.execute(UserORM.__table__.update()
+                    .where(UserORM.user_id == "test_lb_profile").values(profile_image=2))
+    await _assert_same(s, index, [(stage_id, "test_lb_profile")])
+
+
+async def test_gap_falls_back_and_rewarm_catches_up(db_session):
+    s = db_session
+    stage_id = stage_registry.by_code("D4").stage_id
+    users = [f"test_lb_gap_{i}" for i in range(5)]
+    s.add_all(UserORM(user_id=u, profile_image=0) for u in users)
+    await s.flush()
+    index = LeaderboardIndex()
+    await index.warm(s)
+
+    clock = datetime.now(timezone.utc)
+    rows = []
+    for i, user_id in enumerate(users):
+        row = (await upsert_best_progress(s, [BestRecord(user_id, stage_id, 10 - i, 1000 * (i + 1), clock)]))[0]
+        rows.append(row)
+        if i % 2 == 0:
+            index.on_event(_best_event(row), "")        # 나머지 이벤트는 잃었다
+    index.on_gap()
+    assert not index.warmed
+    index._rewarm_task.cancel()     # 기본 세션 대신 테스트 트랜잭션에서 다시 읽는다
+
+    await index.warm(s)
+    assert index.warmed and index.warms == 2
+    for row in rows:
+        await _assert_same_as_run_logs(s, index, row)
+    await _assert_same(s, index, [(stage_id, u) for u in users])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_skip_list_matches_sorted_list(seed: int):
+    rnd = random.Random(seed)
+    skip, ref = _SkipList(), []
+    for step in range(3000):
+        if ref and rnd.random() < 0.45:
+            key = ref.pop(rnd.randrange(len(ref)))
+            skip.remove(key)
+        else:
+            key = (rnd.randint(0, 50), rnd.random())
+            insort(ref, key)
+            skip.insert(key)
+        probe = (rnd.randint(0, 50), rnd.random())
+        assert skip.bisect_left(probe) == bisect_left(ref, probe), step
+        if step % 100 == 0:
+            assert list(skip) == ref and len(skip) == len(ref)
+    with pytest.raises(KeyError):
+        skip.remove((99, 0.0))
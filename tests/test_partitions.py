@@ -0,0 +1,46 @@
+"""run_logs 파티션: 파티션이 없는 달의 기록은 DEFAULT 가 받고, 그 달 파티션을 만들 때 옮겨진다."""
+import logging
+from datetime import datetime, time, timezone
+
+import pytest
+from sqlalchemy import func, select, text
+
+from Merge_app.db import partitions
+from Merge_app.db.models import RunLogORM, UserORM
+
+pytestmark = pytest.mark.anyio
+
+
+async def _where(s, record_id: int) -> str:
+    return (await s.execute(text("SELECT tableoid::regclass::text FROM run_logs WHERE record_id = :r"),
+                            {"r": record_id})).scalar()
+
+
+async def test_rows_outside_partitions_go_to_default_then_move(db_session, caplog):
+    s = db_session
+    conn = await s.connection()
+    if not await partitions._has_default(conn):
+        pytest.skip("run_logs_default missing (run init_db first)")
+
+    ahead = len(await partitions.existing_partitions(conn)) + 12    # 아직 파티션이 없는 달
+    month = partitions.add_months(partitions._this_month(), ahead)
+    at = datetime.combine(month, time(12), tzinfo=timezone.utc)
+    later = datetime.combine(partitions.add_months(month, 2), time(12), tzinfo=timezone.utc)
+
+    s.add(UserORM(user_id="test_part", profile_image=0))
+    await s.flush()
+    rows = [RunLogORM(user_id="test_part", stage_code="A1", prompt_length=i, clear_time_ms=1000, cleared_at=t)
+            for i, t in enumerate((at, at, later))]
+    s.add_all(rows)
+    await s.flush()
+    assert {await _where(s, r.record_id) for r in rows} == {partitions.DEFAULT_PARTITION}
+
+    with caplog.at_level(logging.WARNING, logger=partitions.__name__):
+        created = await partitions.ensure_partitions(conn, ahead)
+    name = partitions.partition_name(month)
+    assert name in created
+    assert [await _where(s, r.record_id) for r in rows] == [name, name, partitions.DEFAULT_PARTITION]
+    assert "moved 2 run_logs rows" in caplog.text and "holds 1 run_logs rows" in caplog.text
+
+    count = select(func.count()).select_from(RunLogORM).where(RunLogORM.user_id == "test_part")
+    assert (await s.execute(count)).scalar() == 3
@@ -0,0 +1,46 @@
+"""PoolMeter: 공개 풀 이벤트로 세는 통계, 오래 쉰 커넥션이 끊겼으면 핑으로 걸러 새로 연결하는지,
+dispose 로 풀을 새로 만들어도 meter 가 따라가는지.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from Merge_app.db.session import make_engine
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def engine():
+    eng = make_engine(pool_size=2, max_overflow=0, pre_ping="idle")
+    eng.pool.meter.ping_idle_s = 0.1
+    yield eng
+    await eng.dispose()
+
+
+async def _backend_pid(eng) -> int:
+    async with eng.connect() as c:
+        return (await c.execute(text("SELECT pg_backend_pid()"))).scalar()
+
+
+async def test_idle_ping_replaces_dead_connection(engine):
+    async with engine.connect() as a, engine.connect() as b:
+        pid = (await a.execute(text("SELECT pg_backend_pid()"))).scalar()
+        await a.commit()                        # 끊긴 뒤 돌려줄 때 롤백할 트랜잭션이 없게
+        await b.execute(text("SELECT pg_terminate_backend(:p)"), {"p": pid})
+    await asyncio.sleep(0.3)                    # 둘 다 ping_idle_s 보다 오래 쉬었다
+
+    for _ in range(2):
+        assert await _backend_pid(engine) != pid
+    stats = engine.pool.stats()
+    assert stats["ping_failures"] == 1
+    assert stats["checkouts"] >= 4 and stats["timeouts"] == 0 and stats["waiters"] == 0
+
+
+async def test_meter_follows_recreated_pool(engine):
+    meter = engine.pool.meter
+    await engine.dispose()
+    assert engine.pool.meter is meter
+    await _backend_pid(engine)
+    assert engine.pool.stats()["connects"] == 1 and engine.pool.stats()["checked_in"] == 1
@@ -0,0 +1,88 @@
+"""stage_stats: 트리거가 쌓은 증감 + fold 가 처음부터 센 히스토그램과 같은지,
+같은 스테이지에 동시에 제출해도 통계 행 잠금을 기다리지 않는지.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from Merge_app.config import settings
+from Merge_app.db.ingest import BestRecord, upsert_best_progress
+from Merge_app.db.models import StageStatsORM, UserORM, UserStageProgressORM
+from Merge_app.db.stage_stats import HIST_SELECT_SQL, fold_stage_stats, live_hist
+from Merge_app.db.stages import stage_registry
+
+pytestmark = pytest.mark.anyio
+
+P = UserStageProgressORM
+S = StageStatsORM
+
+
+async def _hist(s, live: bool) -> dict:
+    cols = ((live_hist(S.time_hist, "t", S.stage_id), live_hist(S.length_hist, "l", S.stage_id))
+            if live else (S.time_hist, S.length_hist))
+    return {r[0]: (list(r[1]), list(r[2])) for r in (await s.execute(select(S.stage_id, *cols))).all()}
+
+
+async def _fresh(s) -> dict:
+    rows = (await s.execute(text(HIST_SELECT_SQL))).all()
+    return {r.stage_id: (list(r.time_hist), list(r.length_hist)) for r in rows if any(map(sum, r[1:]))}
+
+
+@pytest.mark.parametrize("seed", range(3))
+async def test_deltas_and_fold_match_recount(db_session, seed: int):
+    s = db_session
+    rnd = random.Random(seed)
+    stage_ids = [stage_registry.by_code(code).stage_id for code in ("A2", "B4", "E5")]
+    users = [f"test_ss_{seed}_{i}" for i in range(10)]
+    s.add_all(UserORM(user_id=u, profile_image=0) for u in users)
+    await s.flush()
+
+    clock = datetime.now(timezone.utc)
+    for step in range(40):
+        clock += timedelta(seconds=1)
+        records = [BestRecord(rnd.choice(users), rnd.choice(stage_ids), rnd.randint(1, 60),
+                              rnd.randint(500, 200_000), clock) for _ in range(rnd.randint(1, 4))]
+        await upsert_best_progress(s, list({(r.user_id, r.stage_id): r for r in records}.values()))
+        if rnd.random() < 0.1:
+            await s.execute(delete(UserORM).where(UserORM.user_id == users.pop(rnd.randrange(len(users)))))
+        if rnd.random() < 0.2:
+            await fold_stage_stats(await s.connection())
+
+        fresh = await _fresh(s)
+        live = await _hist(s, live=True)
+        assert {k: live[k] for k in fresh} == fresh, step
+
+    await fold_stage_stats(await s.connection())
+    fresh = await _fresh(s)
+    base = await _hist(s, live=False)
+    assert {k: base[k] for k in fresh} == fresh
+
+
+async def test_same_stage_submissions_do_not_wait_on_stats_row(db_session):
+    # 통계 행이 이미 있는 스테이지에 두 트랜잭션이 동시에 기록을 쓴다. 앞의 것이 커밋 전이어도
+    # 뒤의 것이 lock_timeout 없이 끝나야 한다 (예전에는 stage_stats 행 UPDATE 에서 기다렸다).
+    stage_id = stage_registry.by_code("A1").stage_id
+    now = datetime.now(timezone.utc)
+    if (await db_session.scalar(select(S.stage_id).where(S.stage_id == stage_id))) is None:
+        pytest.skip("no stage_stats row for A1")
+
+    engine = create_async_engine(settings.database_url, poolclass=NullPool,
+                                 connect_args={"server_settings": {"search_path": "gameapp,public"}})
+    conns = [await engine.connect() for _ in range(2)]
+    try:
+        for i, conn in enumerate(conns):
+            await conn.begin()
+            await conn.execute(text("SET LOCAL lock_timeout = '2s'"))
+            s = AsyncSession(bind=conn)
+            s.add(UserORM(user_id=f"test_ss_concurrent_{i}", profile_image=0))
+            await s.flush()
+            await upsert_best_progress(s, [BestRecord(f"test_ss_concurrent_{i}", stage_id, 5 + i, 5000, now)])
+    finally:
+        for conn in conns:
+            await conn.rollback()
+            await conn.close()
+        await engine.dispose()